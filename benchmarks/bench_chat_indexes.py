@@ -0,0 +1,200 @@
+"""
+Query plans and latencies of the hot chat queries before and after
+public/db/migrations/002_chat_composite_indexes.sql.
+
+Creates a scratch schema in a local Postgres (13+), applies
+public/db/script.sql, swaps in the original single-column indexes, seeds
+it with generate_series and measures the sidebar and chat history queries.
+It then applies migration 002 and measures them again. The scratch schema
+is dropped afterwards unless --keep is given.
+
+Requires psycopg2 (pip install psycopg2-binary), which the app itself does
+not use.
+
+Usage: python benchmarks/bench_chat_indexes.py --dsn postgresql://postgres@localhost/postgres
+           [--users 20] [--sessions 20000] [--messages 2000000] [--runs 20] [--plans]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+DB_DIR = os.path.join(os.path.dirname(__file__), "..", "public", "db")
+SCHEMA = "bench_chat_indexes"
+
+BASELINE_INDEXES = """
+    DROP INDEX IF EXISTS idx_chat_sessions_user_created;
+    DROP INDEX IF EXISTS idx_chat_messages_session_created;
+    CREATE INDEX idx_chat_sessions_user_id ON chat_sessions(user_id);
+    CREATE INDEX idx_chat_messages_session_id ON chat_messages(session_id);
+"""
+
+SEED = """
+    INSERT INTO users (id, email, name)
+    SELECT gen_random_uuid(), 'user' || g || '@bench.local', 'User ' || g
+    FROM generate_series(1, %(users)s) g;
+
+    CREATE TEMP TABLE user_numbers AS
+    SELECT id, row_number() OVER (ORDER BY id) AS n FROM users;
+
+    INSERT INTO chat_sessions (id, user_id, title, created_at)
+    SELECT gen_random_uuid(), u.id, 'Session ' || g, now() - g * interval '1 minute'
+    FROM generate_series(1, %(sessions)s) g
+    JOIN user_numbers u ON u.n = 1 + g %% %(users)s;
+
+    CREATE TEMP TABLE session_numbers AS
+    SELECT id, created_at, row_number() OVER (ORDER BY id) AS n FROM chat_sessions;
+
+    -- Messages are interleaved across sessions, as they are in production
+    INSERT INTO chat_messages (id, session_id, content, role, created_at)
+    SELECT gen_random_uuid(), s.id, repeat('x', 200),
+           CASE WHEN g %% 2 = 0 THEN 'user' ELSE 'assistant' END,
+           s.created_at + g * interval '1 millisecond'
+    FROM generate_series(1, %(messages)s) g
+    JOIN session_numbers s ON s.n = 1 + g %% %(sessions)s;
+
+    DROP TABLE user_numbers, session_numbers;
+    ANALYZE;
+"""
+
+# The queries AuthService sends through PostgREST
+QUERIES = {
+    "sessions_first_page": (
+        "SELECT id, title, created_at FROM chat_sessions WHERE user_id = %(user_id)s "
+        "ORDER BY created_at DESC, id DESC LIMIT 21"
+    ),
+    "sessions_next_page": (
+        "SELECT id, title, created_at FROM chat_sessions WHERE user_id = %(user_id)s "
+        "AND (created_at < %(before_at)s OR (created_at = %(before_at)s AND id < %(before_id)s)) "
+        "ORDER BY created_at DESC, id DESC LIMIT 21"
+    ),
+    "messages_history": (
+        "SELECT * FROM chat_messages WHERE session_id = %(session_id)s ORDER BY created_at"
+    ),
+    "messages_incremental": (
+        "SELECT * FROM chat_messages WHERE session_id = %(session_id)s "
+        "AND created_at > %(last_seen)s ORDER BY created_at"
+    ),
+}
+
+def read_sql(*parts):
+    with open(os.path.join(DB_DIR, *parts), encoding="utf-8") as f:
+        return f.read()
+
+def pick_params(cur):
+    """Pick a busy user and session and keyset cursors mid-way through them."""
+    cur.execute(
+        "SELECT user_id FROM chat_sessions GROUP BY user_id ORDER BY count(*) DESC LIMIT 1"
+    )
+    user_id = cur.fetchone()[0]
+    cur.execute(
+        "SELECT created_at, id FROM chat_sessions WHERE user_id = %s "
+        "ORDER BY created_at DESC, id DESC OFFSET 100 LIMIT 1",
+        (user_id,)
+    )
+    before_at, before_id = cur.fetchone()
+    cur.execute(
+        "SELECT session_id FROM chat_messages GROUP BY session_id ORDER BY count(*) DESC LIMIT 1"
+    )
+    session_id = cur.fetchone()[0]
+    cur.execute(
+        "SELECT created_at FROM chat_messages WHERE session_id = %s "
+        "ORDER BY created_at DESC OFFSET 2 LIMIT 1",
+        (session_id,)
+    )
+    last_seen = cur.fetchone()[0]
+    return {
+        "user_id": user_id, "before_at": before_at, "before_id": before_id,
+        "session_id": session_id, "last_seen": last_seen,
+    }
+
+def plan_nodes(plan):
+    """Flatten an EXPLAIN JSON plan into 'Node Type (index)' strings."""
+    label = plan["Node Type"]
+    if "Index Name" in plan:
+        label += f" ({plan['Index Name']})"
+    nodes = [label]
+    for child in plan.get("Plans", []):
+        nodes.extend(plan_nodes(child))
+    return nodes
+
+def measure(cur, params, runs, show_plans):
+    results = {}
+    for name, sql in QUERIES.items():
+        cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql, params)
+        explain = cur.fetchone()[0]
+        explain = json.loads(explain) if isinstance(explain, str) else explain
+        plan = explain[0]["Plan"]
+
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            cur.execute(sql, params)
+            cur.fetchall()
+            timings.append(time.perf_counter() - started)
+
+        results[name] = {
+            "plan": " > ".join(plan_nodes(plan)),
+            "buffers": plan.get("Shared Hit Blocks", 0) + plan.get("Shared Read Blocks", 0),
+            "p50_ms": statistics.median(timings) * 1000,
+        }
+        if show_plans:
+            cur.execute("EXPLAIN (ANALYZE, BUFFERS) " + sql, params)
+            print(f"\n-- {name}")
+            print("\n".join(row[0] for row in cur.fetchall()))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dsn", required=True)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--sessions", type=int, default=20000)
+    parser.add_argument("--messages", type=int, default=2000000)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--plans", action="store_true", help="print full EXPLAIN output")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch schema")
+    args = parser.parse_args()
+
+    try:
+        import psycopg2
+    except ImportError:
+        sys.exit("psycopg2 is required: pip install psycopg2-binary")
+
+    conn = psycopg2.connect(args.dsn)
+    conn.autocommit = True
+    cur = conn.cursor()
+    try:
+        cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}")
+        cur.execute(f"SET search_path TO {SCHEMA}, public")
+        cur.execute(read_sql("script.sql"))
+        cur.execute(BASELINE_INDEXES)
+
+        started = time.perf_counter()
+        cur.execute(SEED, {"users": args.users, "sessions": args.sessions, "messages": args.messages})
+        print(
+            f"seeded users={args.users} sessions={args.sessions} messages={args.messages} "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+        params = pick_params(cur)
+
+        before = measure(cur, params, args.runs, args.plans)
+        cur.execute(read_sql("migrations", "002_chat_composite_indexes.sql"))
+        cur.execute("ANALYZE")
+        after = measure(cur, params, args.runs, args.plans)
+
+        for name in QUERIES:
+            print(f"\n{name}")
+            for label, result in (("before", before[name]), ("after", after[name])):
+                print(
+                    f"  {label:<7} p50={result['p50_ms']:8.2f}ms "
+                    f"buffers={result['buffers']:<6} {result['plan']}"
+                )
+    finally:
+        if not args.keep:
+            cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+End-to-end timings of the app's main interactions.
+
+Runs src/main.py in streamlit.testing AppTest with in-process fakes for
+the Groq client and the Supabase connection (Auth and data), then drives
+one browser session per iteration through:
+
+    load -> login -> new session -> sample report -> analyze -> result -> logout
+
+"analyze" is the click on Analyze Report; "result" waits for the queued
+analysis job and its message writes, then reruns once to show it. For every step
+it reports p50/p95 wall time and the fake network round trips (Supabase
+queries and Auth calls plus Groq completions) per script run.
+
+Latency and failures are injected in the fakes, so runs are repeatable
+and need no network or secrets. Results can be saved as a JSON baseline
+and later runs compared against it, exiting non-zero on a regression.
+
+Usage:
+    python benchmarks/bench_e2e.py [--iterations 10] [--db-latency-ms 20]
+        [--llm-latency-ms 200] [--db-error-rate 0] [--llm-error-rate 0]
+        [--storage fake|sqlite] [--save-baseline PATH] [--baseline PATH]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+SRC = os.path.join(os.path.dirname(__file__), "..", "src")
+sys.path.insert(0, SRC)
+sys.path.insert(0, os.path.dirname(__file__))
+
+from streamlit.testing.v1 import AppTest
+
+import agents.analysis_agent as analysis_agent_module
+import agents.model_manager as model_manager_module
+import auth.auth_service as auth_service_module
+import components.auth_pages as auth_pages_module
+import components.footer as footer_module
+from agents.knowledge_base import MemoryKnowledgeBase
+from auth.message_writer import MessageWriter
+from fakes import FakeGroq, FakeSupabase
+from services.analysis_jobs import get_analysis_jobs
+from services.chat_store import SQLiteChatStore, SupabaseChatStore
+from services.rate_limiter import MemoryRateLimiter
+
+EMAIL = "bench@example.com"
+PASSWORD = "Bench-password-1"
+STEPS = ["load", "login", "new_session", "sample_report", "analyze", "result", "logout"]
+RESULT_TIMEOUT_SECONDS = 60
+
+class Harness:
+    """Fakes wired into the app modules, plus round-trip counting."""
+
+    def __init__(self, args, directory):
+        self.supabase = FakeSupabase(
+            latency=args.db_latency_ms / 1000, error_rate=args.db_error_rate, seed=args.seed
+        )
+        user = self.supabase.add_user(EMAIL, PASSWORD)
+        self.groq = FakeGroq(
+            latency=args.llm_latency_ms / 1000, error_rate=args.llm_error_rate, seed=args.seed
+        )
+        if args.storage == "sqlite":
+            self.store = SQLiteChatStore(os.path.join(directory, "chat.sqlite3"))
+            self.store.insert_user({"id": user.id, "email": EMAIL, "name": "Bench User"})
+        else:
+            self.store = SupabaseChatStore(self.supabase)
+        self.writer = MessageWriter(self.store)
+
+        auth_service_module.get_supabase_connection = lambda: self.supabase
+        auth_service_module.get_chat_store = lambda: self.store
+        auth_service_module.get_message_writer = lambda: self.writer
+        model_manager_module.get_groq_client = lambda: self.groq
+        # Every iteration should reach the model, not the response cache
+        model_manager_module.ANALYSIS_CACHE_ENABLED = args.use_cache
+        limiter = MemoryRateLimiter(capacity=10 ** 6, refill_per_second=1.0)
+        knowledge_base = MemoryKnowledgeBase()
+        analysis_agent_module.get_rate_limiter = lambda: limiter
+        analysis_agent_module.get_knowledge_base = lambda: knowledge_base
+        footer_module.get_github_stars = lambda: None
+        # The one-second "Redirecting..." pause after login is not work
+        auth_pages_module.time = SimpleNamespace(sleep=lambda seconds: None)
+
+    def calls(self):
+        return self.supabase.calls + len(self.groq.calls)
+
+def button(app, label):
+    for candidate in app.button:
+        if candidate.label == label:
+            return candidate
+    raise RuntimeError(f"No button labelled {label!r}")
+
+def wait_for_jobs(app, harness):
+    """
+    Wait for the session's analysis jobs and their message writes. Polling
+    with reruns instead would make the round-trip count depend on timing.
+    """
+    queue = get_analysis_jobs()
+    deadline = time.monotonic() + RESULT_TIMEOUT_SECONDS
+    for job_id in app.session_state["analysis_jobs"]:
+        job = queue.get(job_id)
+        while job and not job.finished:
+            if time.monotonic() > deadline:
+                raise RuntimeError("Timed out waiting for the analysis")
+            time.sleep(0.005)
+    harness.writer.flush(timeout=RESULT_TIMEOUT_SECONDS)
+
+def has_result(app):
+    return any("Analysis generated using" in element.value for element in app.success)
+
+def run_session(harness, record):
+    """Drive one browser session through every step, recording each one."""
+    app = AppTest.from_file(os.path.join(SRC, "main.py"), default_timeout=RESULT_TIMEOUT_SECONDS)
+
+    def step(name, action, check=None):
+        calls = harness.calls()
+        started = time.perf_counter()
+        action()
+        app.run()
+        elapsed = time.perf_counter() - started
+        if app.exception:
+            raise RuntimeError(f"Step {name} raised: {app.exception[0].message}")
+        if check and not check(app):
+            raise RuntimeError(f"Step {name} did not reach the expected page")
+        record(name, elapsed, harness.calls() - calls)
+
+    def login():
+        app.text_input(key="login_email").input(EMAIL)
+        app.text_input(key="login_password").input(PASSWORD)
+        button(app, "Login").click()
+
+    def analyze():
+        app.text_input[0].input("Bench Patient")
+        app.number_input[0].set_value(45)
+        app.selectbox[0].set_value("Female")
+        button(app, "Analyze Report").click()
+
+    step("load", lambda: None)
+    step("login", login)
+    step("new_session", lambda: button(app, "➕ Create New Analysis Session").click())
+    step("sample_report", lambda: app.radio(key="report_source").set_value("Use Sample PDF"))
+    step("analyze", analyze)
+    step("result", lambda: wait_for_jobs(app, harness), check=has_result)
+    step("logout", lambda: button(app, "Logout").click())
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def summarize(samples):
+    results = {}
+    for name in STEPS:
+        times = [elapsed for elapsed, _ in samples[name]]
+        calls = [count for _, count in samples[name]]
+        results[name] = {
+            "p50_ms": round(statistics.median(times) * 1000, 1),
+            "p95_ms": round(percentile(times, 0.95) * 1000, 1),
+            "calls_per_run": round(statistics.mean(calls), 2),
+        }
+    return results
+
+def compare(results, baseline, tolerance):
+    """Print each step against the baseline; returns the regressed steps."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline["steps"].get(name)
+        if not previous:
+            continue
+        slower = current["p50_ms"] > previous["p50_ms"] * (1 + tolerance) + 5
+        chattier = current["calls_per_run"] > previous["calls_per_run"] + 0.01
+        if slower or chattier:
+            regressions.append(name)
+        print(
+            f"{name:<14} p50 {previous['p50_ms']:>8.1f} -> {current['p50_ms']:>8.1f} ms  "
+            f"calls/run {previous['calls_per_run']:>5.2f} -> {current['calls_per_run']:>5.2f}"
+            + ("  REGRESSION" if slower or chattier else "")
+        )
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--db-latency-ms", type=float, default=20.0)
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0)
+    parser.add_argument("--db-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--storage", choices=["fake", "sqlite"], default="fake",
+                        help="Chat data in the Supabase fake or a local SQLite store")
+    parser.add_argument("--use-cache", action="store_true", help="Keep the analysis response cache on")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save-baseline", metavar="PATH", help="Write the results as a JSON baseline")
+    parser.add_argument("--baseline", metavar="PATH", help="Compare against a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed p50 slowdown before a step counts as a regression")
+    args = parser.parse_args()
+
+    samples = {name: [] for name in STEPS}
+    with tempfile.TemporaryDirectory() as directory:
+        harness = Harness(args, directory)
+        for _ in range(args.iterations):
+            run_session(harness, lambda name, *sample: samples[name].append(sample))
+
+    results = summarize(samples)
+    for name, result in results.items():
+        print(
+            f"{name:<14} p50 {result['p50_ms']:>8.1f} ms  p95 {result['p95_ms']:>8.1f} ms  "
+            f"calls/run {result['calls_per_run']:>5.2f}"
+        )
+
+    config = {key: value for key, value in vars(args).items()
+              if key not in ("iterations", "save_baseline", "baseline", "tolerance")}
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump({"config": config, "iterations": args.iterations, "steps": results}, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != config:
+            print("Warning: baseline was recorded with different settings")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"Regressed: {', '.join(regressions)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
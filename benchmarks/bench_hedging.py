@@ -0,0 +1,81 @@
+"""
+Compare sequential fallback with hedged requests when the primary tier is slow.
+
+With --stream the timings are to the first streamed chunk.
+
+Usage: python benchmarks/bench_hedging.py [--primary-latency 3.0] [--runs 10] [--stream]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from agents.async_model_manager import AsyncModelManager
+from agents.model_manager import ModelManager, ModelTier
+from agents.tier_health import TierHealthRegistry
+from config.sample_data import SAMPLE_REPORT
+from fakes import FakeAsyncGroq, FakeGroq
+
+def build_script(primary_latency):
+    config = ModelManager.MODEL_CONFIG
+    return {
+        config[ModelTier.PRIMARY]["model"]: {"latency": primary_latency},
+        config[ModelTier.SECONDARY]["model"]: {"latency": 0.3},
+        config[ModelTier.TERTIARY]["model"]: {"latency": 0.2},
+    }
+
+def first_chunk_time(result, started):
+    """Seconds until the first chunk of a streamed result; drains the rest."""
+    chunks = result["stream"]
+    next(chunks, None)
+    elapsed = time.perf_counter() - started
+    for _ in chunks:
+        pass
+    return elapsed
+
+def bench_sequential(script, runs, stream=False):
+    # No response cache, or every run after the first would be a cache hit
+    manager = ModelManager(
+        clients={"groq": FakeGroq(script)}, health=TierHealthRegistry(), cache=False
+    )
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = manager.generate_analysis({"report": SAMPLE_REPORT}, "system", stream=stream)
+        timings.append(first_chunk_time(result, started) if stream else time.perf_counter() - started)
+    return timings
+
+def bench_hedged(script, runs, hedge_delay, stream=False):
+    manager = AsyncModelManager(
+        client=FakeAsyncGroq(script), health=TierHealthRegistry(), cache=False
+    )
+    manager.DEFAULT_HEDGE_DELAY = hedge_delay
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = manager.run({"report": SAMPLE_REPORT}, "system", stream=stream)
+        timings.append(first_chunk_time(result, started) if stream else time.perf_counter() - started)
+    return timings
+
+def report(name, timings):
+    ordered = sorted(timings)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(f"{name:<12} p50={statistics.median(ordered):.3f}s p95={p95:.3f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--primary-latency", type=float, default=3.0)
+    parser.add_argument("--hedge-delay", type=float, default=0.5)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--stream", action="store_true")
+    args = parser.parse_args()
+
+    script = build_script(args.primary_latency)
+    report("sequential", bench_sequential(script, args.runs, args.stream))
+    report("hedged", bench_hedged(script, args.runs, args.hedge_delay, args.stream))
+
+if __name__ == "__main__":
+    main()
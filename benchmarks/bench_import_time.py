@@ -0,0 +1,99 @@
+"""
+Import-time budget for the login page.
+
+Collects the module-level imports of src/main.py, which is everything an
+unauthenticated visitor's script run loads, and imports them in a fresh
+interpreter under `python -X importtime`. Streamlit is imported first and
+excluded, so the measured time is the app's own share of the cold start.
+
+Fails (exit 1) when the median over --runs exceeds --budget-ms, or when a
+module that should only load on first use shows up on the login path.
+Also reports the peak RSS of the interpreter and the heaviest imports.
+
+Usage: python benchmarks/bench_import_time.py [--runs 5] [--budget-ms 150]
+"""
+import argparse
+import ast
+import os
+import statistics
+import subprocess
+import sys
+
+SRC = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+
+# Loaded by the analysis pages only, never for the login page
+DEFERRED = [
+    "groq", "pdfplumber", "pdfminer", "agents.analysis_agent", "agents.model_manager",
+    "components.sidebar", "components.analysis_form", "components.batch_form",
+    "http.server",
+]
+
+def login_imports():
+    """The modules main.py imports at module level."""
+    with open(os.path.join(SRC, "main.py")) as f:
+        tree = ast.parse(f.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            modules.append(node.module)
+    return [module for module in modules if module != "streamlit"]
+
+def measure(modules):
+    """Import the modules once; returns (app ms, peak RSS MB, {module: cumulative us})."""
+    code = "import resource, streamlit\n" + "".join(f"import {m}\n" for m in modules) + (
+        "print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=SRC, capture_output=True, text=True, check=True
+    )
+    loaded, app_us, seen_streamlit = {}, 0, False
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = len(name) - len(name.lstrip())
+        name = name.strip()
+        loaded[name] = int(cumulative)
+        if depth == 1 and seen_streamlit:
+            app_us += int(cumulative)
+        if depth == 1 and name == "streamlit":
+            seen_streamlit = True
+    rss_mb = int(result.stdout.split()[-1]) / 1024
+    return app_us / 1000, rss_mb, loaded
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=150.0,
+                        help="Allowed median import time of the app's modules")
+    args = parser.parse_args()
+
+    modules = login_imports()
+    runs = [measure(modules) for _ in range(args.runs)]
+    app_ms = statistics.median(ms for ms, _, _ in runs)
+    rss_mb = statistics.median(rss for _, rss, _ in runs)
+    loaded = runs[-1][2]
+
+    print(f"login imports: {', '.join(modules)}")
+    print(f"app import time p50 {app_ms:.1f} ms (budget {args.budget_ms:.0f} ms), peak RSS {rss_mb:.1f} MB")
+    print("heaviest:")
+    for name in [m for m in modules if m in loaded]:
+        print(f"  {name:<28} {loaded[name] / 1000:>7.1f} ms")
+
+    failures = []
+    eager = [name for name in DEFERRED if name in loaded]
+    if eager:
+        failures.append(f"loaded on the login path: {', '.join(eager)}")
+    if app_ms > args.budget_ms:
+        failures.append(f"import time {app_ms:.1f} ms exceeds the {args.budget_ms:.0f} ms budget")
+    if failures:
+        for failure in failures:
+            print(f"FAIL {failure}")
+        sys.exit(1)
+    print("OK")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Knowledge base retrieval latency with 100,000 stored insights.
+
+Seeds a SQLite knowledge base in a temporary file through the normal
+batched write path, then times KnowledgeBase.retrieve for random reports,
+which is what AnalysisAgent._build_enhanced_prompt calls per analysis.
+Also reports write throughput and free-text (FTS5) search latency.
+
+Usage: python benchmarks/bench_knowledge_base.py [--insights 100000] [--queries 500]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from agents.knowledge_base import SQLiteKnowledgeBase
+from utils.lab_parser import ANALYTE_ALIASES
+
+ANALYTES = list(ANALYTE_ALIASES)
+GENDERS = ["male", "female", "other"]
+AGE_BUCKETS = ["0-17", "18-39", "40-59", "60+"]
+FLAGS = ["", "L", "H"]
+PHRASES = [
+    "is above the reference range, consistent with",
+    "is below the reference range, which may indicate",
+    "is within normal limits; no action is needed for",
+    "is mildly elevated and should be rechecked alongside",
+]
+
+def report(rng, rows=12):
+    lines = ["Patient report"]
+    for name in rng.sample(ANALYTES, rows):
+        low = rng.randint(1, 50)
+        value = rng.choice([low - 1, low + 5, low + 20])
+        lines.append(f"{ANALYTE_ALIASES[name][0].title()} {max(value, 0)} mg/dL {low}-{low + 10}")
+    return "\n".join(lines)
+
+def seed(kb, count, rng):
+    """Store `count` insights through the buffered write path; returns seconds taken."""
+    started = time.perf_counter()
+    for i in range(count):
+        analyte = rng.choice(ANALYTES)
+        profile = (rng.choice(AGE_BUCKETS), rng.choice(GENDERS))
+        text = f"{analyte} {rng.choice(PHRASES)} condition {i}"
+        kb._store(profile, [(analyte, rng.choice(FLAGS), text)])
+    kb.flush()
+    return time.perf_counter() - started
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--insights", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--batch", type=int, default=500, help="Insights per write transaction")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as directory:
+        kb = SQLiteKnowledgeBase(
+            os.path.join(directory, "kb.sqlite3"), max_insights=args.insights,
+            write_batch=args.batch, flush_seconds=0
+        )
+        elapsed = seed(kb, args.insights, rng)
+        print(f"seeded {len(kb):,} insights in {elapsed:.1f}s "
+              f"({args.insights / elapsed:,.0f} insights/s, batch {args.batch})")
+
+        reports = [
+            {"report": report(rng), "age": rng.randint(5, 90), "gender": rng.choice(GENDERS)}
+            for _ in range(args.queries)
+        ]
+        timings, found = [], 0
+        for data in reports:
+            started = time.perf_counter()
+            found += len(kb.retrieve(data, limit=5))
+            timings.append((time.perf_counter() - started) * 1000)
+        kb.flush()
+        print(f"retrieve: p50 {statistics.median(timings):.2f} ms, "
+              f"p95 {percentile(timings, 0.95):.2f} ms, "
+              f"{found / len(reports):.1f} insights per report")
+
+        timings = []
+        for _ in range(args.queries):
+            started = time.perf_counter()
+            kb.search(f"{rng.choice(ANALYTES)} {rng.choice(PHRASES)}")
+            timings.append((time.perf_counter() - started) * 1000)
+        print(f"full-text search: p50 {statistics.median(timings):.2f} ms, "
+              f"p95 {percentile(timings, 0.95):.2f} ms")
+        kb.close()
+
+if __name__ == "__main__":
+    main()
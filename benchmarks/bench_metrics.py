@@ -0,0 +1,74 @@
+"""
+Overhead of the hot-path timing spans.
+
+Times an empty block bare, inside a disabled span and inside an enabled
+span, then a real instrumented call (validate_pdf_content on a sample
+report) with metrics off and on. Finally runs a few analyses through
+ModelManager with a fake Groq client and prints the Prometheus output.
+
+Usage: python benchmarks/bench_metrics.py [--iterations 200000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from agents.model_manager import ModelManager
+from agents.tier_health import TierHealthRegistry
+from fakes import FakeGroq
+from utils import metrics
+from utils.validators import validate_pdf_content
+
+SAMPLE_REPORT = (
+    "Laboratory report for patient. Specimen: blood. Hemoglobin 13.2 g/dL, "
+    "WBC 6.1, RBC 4.5, platelet 250, glucose 98 mg/dL, creatinine 0.9. "
+) * 20
+
+def per_call(func, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - started) / iterations * 1e9
+
+def empty():
+    pass
+
+def in_span():
+    with metrics.span("bench"):
+        pass
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200_000)
+    args = parser.parse_args()
+    n = args.iterations
+
+    metrics.enable(False)
+    bare = per_call(empty, n)
+    disabled = per_call(in_span, n)
+    validate_off = per_call(lambda: validate_pdf_content(SAMPLE_REPORT), n // 20)
+    metrics.enable(True)
+    enabled = per_call(in_span, n)
+    validate_on = per_call(lambda: validate_pdf_content(SAMPLE_REPORT), n // 20)
+
+    print(f"empty block          {bare:>9.0f} ns")
+    print(f"disabled span        {disabled:>9.0f} ns  (+{disabled - bare:.0f} ns)")
+    print(f"enabled span         {enabled:>9.0f} ns  (+{enabled - bare:.0f} ns)")
+    print(f"validate_pdf_content {validate_off:>9.0f} ns off, {validate_on:.0f} ns on")
+
+    metrics.REGISTRY.reset()
+    manager = ModelManager(
+        clients={"groq": FakeGroq({"meta-llama/llama-4-maverick-17b-128e-instruct": {"error": "boom"}})},
+        health=TierHealthRegistry(),
+        cache=False
+    )
+    for _ in range(3):
+        manager.generate_analysis({"report": SAMPLE_REPORT}, "You are a medical assistant.")
+    print()
+    print(metrics.REGISTRY.render(), end="")
+
+if __name__ == "__main__":
+    main()
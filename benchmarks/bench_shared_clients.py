@@ -0,0 +1,112 @@
+"""
+Connection count and latency of per-session vs process-wide Groq clients.
+
+A local keep-alive HTTP server stands in for the Groq API. It counts the
+TCP connections it accepts and adds a fixed delay to each new connection
+to model the TLS handshake. Every simulated session sends a few
+completions, either through its own client (as ModelManager used to) or
+through the shared pooled client.
+
+Usage: python benchmarks/bench_shared_clients.py [--sessions 100] [--requests 3]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from services.clients import build_groq_client
+
+COMPLETION = json.dumps({
+    "id": "bench",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "bench",
+    "choices": [{
+        "index": 0,
+        "message": {"role": "assistant", "content": "ok"},
+        "finish_reason": "stop"
+    }],
+    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+}).encode()
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    handshake_seconds = 0.0
+    response_seconds = 0.0
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with _Handler.lock:
+            _Handler.connections += 1
+        time.sleep(self.handshake_seconds)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.response_seconds)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(COMPLETION)))
+        self.end_headers()
+        self.wfile.write(COMPLETION)
+
+    def log_message(self, *args):
+        pass
+
+def run_sessions(base_url, sessions, requests, shared):
+    shared_client = build_groq_client("bench", base_url=base_url) if shared else None
+    latencies = []
+    lock = threading.Lock()
+
+    def session(_):
+        client = shared_client or build_groq_client("bench", base_url=base_url)
+        for _ in range(requests):
+            started = time.perf_counter()
+            client.chat.completions.create(
+                model="bench", messages=[{"role": "user", "content": "hi"}]
+            )
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    with ThreadPoolExecutor(max_workers=sessions) as executor:
+        list(executor.map(session, range(sessions)))
+    return latencies
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=3)
+    parser.add_argument("--handshake-ms", type=float, default=50.0)
+    parser.add_argument("--response-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    _Handler.handshake_seconds = args.handshake_ms / 1000
+    _Handler.response_seconds = args.response_ms / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    for name, shared in (("per-session", False), ("shared", True)):
+        _Handler.connections = 0
+        started = time.perf_counter()
+        latencies = sorted(run_sessions(base_url, args.sessions, args.requests, shared))
+        elapsed = time.perf_counter() - started
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(
+            f"{name:<12} connections={_Handler.connections:<4} "
+            f"p50={statistics.median(latencies) * 1000:.1f}ms p95={p95 * 1000:.1f}ms "
+            f"total={elapsed:.2f}s"
+        )
+
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
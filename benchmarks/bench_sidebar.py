@@ -0,0 +1,82 @@
+"""
+Sidebar render time for users with 10, 100 and 1,000 sessions.
+
+Runs components.sidebar.show_sidebar in streamlit.testing AppTest against
+an in-memory Supabase fake. "unpaginated" reproduces the old behaviour:
+every session is fetched and rendered on every rerun. "paginated" loads one
+keyset page once and reuses it on later reruns.
+
+Usage: python benchmarks/bench_sidebar.py [--reruns 5] [--latency-ms 30]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from streamlit.testing.v1 import AppTest
+
+import auth.auth_service as auth_service_module
+import components.sidebar as sidebar_module
+from fakes import FakeSupabase
+from services.chat_store import SupabaseChatStore
+
+USER = {"id": "bench-user", "email": "bench@example.com", "name": "Bench"}
+
+def sidebar_app():
+    import components.footer as footer
+    from components.sidebar import show_sidebar
+
+    # No GitHub API call for the star count during benchmarks
+    footer.get_github_stars = lambda: None
+    show_sidebar()
+
+def build_service(session_count, latency):
+    fake = FakeSupabase(latency=latency)
+    for i in range(session_count):
+        fake.table("chat_sessions").insert({"user_id": USER["id"], "title": f"Session {i}"}).execute()
+    fake.calls = 0
+    auth_service_module.get_supabase_connection = lambda: fake
+    return auth_service_module.AuthService(store=SupabaseChatStore(fake)), fake
+
+def bench(session_count, paginated, reruns, latency):
+    service, fake = build_service(session_count, latency)
+    sidebar_module.SESSION_PAGE_SIZE = 20 if paginated else session_count + 1
+
+    app = AppTest.from_function(sidebar_app, default_timeout=120)
+    app.session_state["user"] = USER
+    app.session_state["auth_service"] = service
+
+    timings = []
+    for _ in range(reruns):
+        if not paginated:
+            # The old sidebar fetched the full list on every rerun
+            app.session_state["session_list"] = None
+        started = time.perf_counter()
+        app.run()
+        timings.append(time.perf_counter() - started)
+        if app.exception:
+            raise RuntimeError(app.exception[0].message)
+    return timings, fake.calls
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--reruns", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=30.0)
+    args = parser.parse_args()
+
+    for session_count in (10, 100, 1000):
+        for paginated in (False, True):
+            timings, calls = bench(session_count, paginated, args.reruns, args.latency_ms / 1000)
+            print(
+                f"sessions={session_count:<5} {'paginated' if paginated else 'unpaginated':<12} "
+                f"first={timings[0] * 1000:8.1f}ms "
+                f"rerun_p50={statistics.median(timings[1:] or timings) * 1000:8.1f}ms "
+                f"queries={calls}"
+            )
+
+if __name__ == "__main__":
+    main()
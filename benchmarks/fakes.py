@@ -0,0 +1,357 @@
+"""
+Deterministic in-process stand-ins for external services.
+
+Each fake follows the subset of the real client API the app uses. Latency
+and failures are scripted per model, so runs are repeatable and need no
+network access.
+"""
+import asyncio
+import base64
+import json
+import random
+import time
+import uuid
+from types import SimpleNamespace
+
+DEFAULT_CONTENT = "### AI Generated Diagnosis:\n\n- **Potential Health Risks:**\n  - None detected (Low)"
+
+class FakeModelError(Exception):
+    """Raised by the fake clients for scripted failures."""
+
+class FakeDatabaseError(Exception):
+    """Raised by FakeSupabase for injected failures."""
+
+def _completion(content, prompt_tokens=0):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+        usage=SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=len(content.split()),
+            total_tokens=prompt_tokens + len(content.split())
+        )
+    )
+
+def _stream_chunks(content):
+    for word in content.split(" "):
+        yield SimpleNamespace(
+            choices=[SimpleNamespace(delta=SimpleNamespace(content=word + " "))]
+        )
+
+async def _async_stream_chunks(content):
+    for chunk in _stream_chunks(content):
+        await asyncio.sleep(0)
+        yield chunk
+
+class _Script:
+    """
+    Per-model behaviour: {model: {"latency": seconds, "error": message}}.
+    Models without an entry answer after `latency` with DEFAULT_CONTENT, and
+    any call fails with probability `error_rate` (seeded, so repeatable).
+    """
+
+    def __init__(self, script=None, content=DEFAULT_CONTENT, latency=0.0, error_rate=0.0, seed=0):
+        self.script = script or {}
+        self.content = content
+        self.latency = latency
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self.calls = []
+
+    def behaviour(self, model):
+        self.calls.append(model)
+        spec = self.script.get(model, {})
+        error = spec.get("error")
+        if not error and self.error_rate and self._random.random() < self.error_rate:
+            error = "Injected failure"
+        return spec.get("latency", self.latency), error, spec.get("content", self.content)
+
+class _FakeCompletions:
+    def __init__(self, script):
+        self._script = script
+
+    def create(self, model, messages, stream=False, **kwargs):
+        latency, error, content = self._script.behaviour(model)
+        time.sleep(latency)
+        if error:
+            raise FakeModelError(error)
+        if stream:
+            return _stream_chunks(content)
+        return _completion(content, sum(len(m["content"].split()) for m in messages))
+
+class _FakeAsyncCompletions(_FakeCompletions):
+    async def create(self, model, messages, stream=False, **kwargs):
+        latency, error, content = self._script.behaviour(model)
+        await asyncio.sleep(latency)
+        if error:
+            raise FakeModelError(error)
+        if stream:
+            return _async_stream_chunks(content)
+        return _completion(content, sum(len(m["content"].split()) for m in messages))
+
+class FakeGroq:
+    """Stand-in for groq.Groq."""
+
+    def __init__(self, script=None, content=DEFAULT_CONTENT, latency=0.0, error_rate=0.0,
+                 seed=0, **kwargs):
+        self.script = _Script(script, content, latency, error_rate, seed)
+        self.chat = SimpleNamespace(completions=_FakeCompletions(self.script))
+
+    @property
+    def calls(self):
+        return self.script.calls
+
+class FakeAsyncGroq:
+    """Stand-in for groq.AsyncGroq."""
+
+    def __init__(self, script=None, content=DEFAULT_CONTENT, latency=0.0, error_rate=0.0,
+                 seed=0, **kwargs):
+        self.script = _Script(script, content, latency, error_rate, seed)
+        self.chat = SimpleNamespace(completions=_FakeAsyncCompletions(self.script))
+
+    @property
+    def calls(self):
+        return self.script.calls
+
+class _FakeResult:
+    def __init__(self, data):
+        self.data = data
+
+def _parse_or_filter(expression):
+    """Split a PostgREST or=(...) expression into top-level conditions."""
+    parts, depth, current = [], 0, ""
+    for char in expression:
+        if char == "," and depth == 0:
+            parts.append(current)
+            current = ""
+            continue
+        depth += char == "("
+        depth -= char == ")"
+        current += char
+    parts.append(current)
+    return parts
+
+def _condition(expression):
+    """Compile a PostgREST condition such as 'created_at.lt."x"' or 'and(...)'."""
+    if expression.startswith("and(") and expression.endswith(")"):
+        conditions = [_condition(part) for part in _parse_or_filter(expression[4:-1])]
+        return lambda row: all(check(row) for check in conditions)
+    column, operator, value = expression.split(".", 2)
+    value = value.strip('"')
+    return _OPERATORS[operator](column, value)
+
+_OPERATORS = {
+    "eq": lambda column, value: lambda row: str(row.get(column)) == str(value),
+    "gt": lambda column, value: lambda row: row.get(column) is not None and str(row[column]) > str(value),
+    "lt": lambda column, value: lambda row: row.get(column) is not None and str(row[column]) < str(value),
+}
+
+class _FakeQuery:
+    def __init__(self, store, table):
+        self._store = store
+        self._table = table
+        self._filters = []
+        self._order = []
+        self._limit = None
+        self._columns = None
+        self._single = False
+        self._action = "select"
+        self._payload = None
+
+    def select(self, columns="*"):
+        self._columns = None if columns == "*" else [c.strip() for c in columns.split(",")]
+        return self
+
+    def insert(self, payload):
+        self._action, self._payload = "insert", payload
+        return self
+
+    def upsert(self, payload, ignore_duplicates=False, on_conflict=""):
+        self._action, self._payload = "upsert", payload
+        self._ignore_duplicates = ignore_duplicates
+        return self
+
+    def delete(self):
+        self._action = "delete"
+        return self
+
+    def eq(self, column, value):
+        self._filters.append(_OPERATORS["eq"](column, value))
+        return self
+
+    def gt(self, column, value):
+        self._filters.append(_OPERATORS["gt"](column, value))
+        return self
+
+    def lt(self, column, value):
+        self._filters.append(_OPERATORS["lt"](column, value))
+        return self
+
+    def in_(self, column, values):
+        allowed = {str(value) for value in values}
+        self._filters.append(lambda row: str(row.get(column)) in allowed)
+        return self
+
+    def or_(self, expression):
+        conditions = [_condition(part) for part in _parse_or_filter(expression)]
+        self._filters.append(lambda row: any(check(row) for check in conditions))
+        return self
+
+    def order(self, column, desc=False):
+        self._order.append((column, desc))
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def single(self):
+        self._single = True
+        return self
+
+    def execute(self):
+        return self._store.execute(self)
+
+    def _matches(self, row):
+        return all(check(row) for check in self._filters)
+
+class _FakeAuth:
+    """Supabase Auth subset used by AuthService; every call is one round trip."""
+
+    TOKEN_SECONDS = 3600
+
+    def __init__(self, store):
+        self._store = store
+        self._users = {}
+        self._session = None
+
+    def add_user(self, email, password, user_id=None):
+        user = SimpleNamespace(id=user_id or str(uuid.uuid4()), email=email)
+        self._users[email] = (password, user)
+        return user
+
+    def sign_up(self, credentials):
+        self._store.round_trip()
+        user = self.add_user(credentials["email"], credentials["password"])
+        return SimpleNamespace(user=user, session=None)
+
+    def sign_in_with_password(self, credentials):
+        self._store.round_trip()
+        password, user = self._users.get(credentials["email"], (None, None))
+        if user is None or password != credentials["password"]:
+            raise FakeDatabaseError("Invalid login credentials")
+        claims = {"sub": user.id, "exp": int(time.time()) + self.TOKEN_SECONDS}
+        payload = base64.urlsafe_b64encode(json.dumps(claims).encode()).decode().rstrip("=")
+        self._session = SimpleNamespace(access_token=f"header.{payload}.signature", user=user)
+        return SimpleNamespace(user=user, session=self._session)
+
+    def sign_out(self):
+        self._store.round_trip()
+        self._session = None
+
+    def get_session(self):
+        self._store.round_trip()
+        return self._session
+
+    def get_user(self):
+        self._store.round_trip()
+        return SimpleNamespace(user=self._session.user) if self._session else None
+
+class FakeSupabase:
+    """
+    In-memory stand-in for the Supabase connection used by AuthService.
+    Supports the query-builder and Auth subset the app uses and counts
+    every execute() or Auth call as one network round trip. Each round
+    trip waits `latency` seconds and fails with probability `error_rate`.
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self.tables = {"users": [], "chat_sessions": [], "chat_messages": []}
+        self.calls = 0
+        self._ids = 0
+        self._clock = 0
+        self.auth = _FakeAuth(self)
+        self.client = SimpleNamespace(rpc=self.rpc, auth=self.auth)
+
+    def add_user(self, email, password, name="Bench User"):
+        """Register a user with Auth and the users table, without counting calls."""
+        user = self.auth.add_user(email, password)
+        self.tables["users"].append({
+            "id": user.id, "email": email, "name": name, "created_at": self._timestamp()
+        })
+        return user
+
+    def round_trip(self):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.error_rate and self._random.random() < self.error_rate:
+            raise FakeDatabaseError("Injected failure")
+
+    def table(self, name):
+        return _FakeQuery(self, name)
+
+    def rpc(self, function, params):
+        """Stored procedures from public/db/script.sql, one round trip each."""
+        return SimpleNamespace(execute=lambda: self._call(function, params))
+
+    def _call(self, function, params):
+        self.round_trip()
+        if function != "delete_chat_sessions":
+            raise ValueError(f"Unknown function: {function}")
+        session_ids = set(params["p_session_ids"])
+        # ON DELETE CASCADE removes the messages with their sessions
+        sessions = self.tables["chat_sessions"]
+        deleted = sum(1 for row in sessions if row["id"] in session_ids)
+        self.tables["chat_sessions"] = [row for row in sessions if row["id"] not in session_ids]
+        self.tables["chat_messages"] = [
+            row for row in self.tables["chat_messages"] if row["session_id"] not in session_ids
+        ]
+        return _FakeResult(deleted)
+
+    def _next_id(self):
+        self._ids += 1
+        return f"00000000-0000-0000-0000-{self._ids:012d}"
+
+    def _timestamp(self):
+        # Strictly increasing timestamps so keyset pagination is deterministic
+        self._clock += 1
+        return f"2024-01-01T00:00:00.{self._clock:06d}+00:00"
+
+    def execute(self, query):
+        self.round_trip()
+        rows = self.tables.setdefault(query._table, [])
+
+        if query._action in ("insert", "upsert"):
+            payload = query._payload if isinstance(query._payload, list) else [query._payload]
+            existing = {row.get("id") for row in rows}
+            inserted = []
+            for item in payload:
+                if query._action == "upsert" and item.get("id") in existing:
+                    # Only ON CONFLICT DO NOTHING is used by the app
+                    continue
+                row = dict(item)
+                row.setdefault("id", self._next_id())
+                row["created_at"] = self._timestamp()
+                rows.append(row)
+                inserted.append(dict(row))
+            return _FakeResult(inserted)
+
+        matched = [row for row in rows if query._matches(row)]
+        if query._action == "delete":
+            self.tables[query._table] = [row for row in rows if not query._matches(row)]
+            return _FakeResult(matched)
+
+        for column, desc in reversed(query._order):
+            matched.sort(key=lambda row: str(row.get(column)), reverse=desc)
+        if query._limit is not None:
+            matched = matched[:query._limit]
+        if query._columns:
+            matched = [{c: row.get(c) for c in query._columns} for row in matched]
+        else:
+            matched = [dict(row) for row in matched]
+        if query._single:
+            return _FakeResult(matched[0] if matched else None)
+        return _FakeResult(matched)
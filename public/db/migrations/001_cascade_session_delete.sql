@@ -0,0 +1,28 @@
+-- Cascade deletes from users to sessions to messages, and delete sessions
+-- through single transactional RPC calls instead of one request per table.
+
+-- Recreate foreign keys with ON DELETE CASCADE
+ALTER TABLE chat_messages DROP CONSTRAINT IF EXISTS chat_messages_session_id_fkey;
+ALTER TABLE chat_messages
+    ADD CONSTRAINT chat_messages_session_id_fkey
+    FOREIGN KEY (session_id) REFERENCES chat_sessions(id) ON DELETE CASCADE;
+
+ALTER TABLE chat_sessions DROP CONSTRAINT IF EXISTS chat_sessions_user_id_fkey;
+ALTER TABLE chat_sessions
+    ADD CONSTRAINT chat_sessions_user_id_fkey
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE;
+
+-- Delete sessions (one or many) and their messages in one transaction,
+-- returning the number of sessions removed
+CREATE OR REPLACE FUNCTION delete_chat_sessions(p_session_ids UUID[])
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    deleted_count INTEGER;
+BEGIN
+    DELETE FROM chat_sessions WHERE id = ANY(p_session_ids);
+    GET DIAGNOSTICS deleted_count = ROW_COUNT;
+    RETURN deleted_count;
+END;
+$$;
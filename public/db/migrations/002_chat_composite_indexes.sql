@@ -0,0 +1,20 @@
+-- Composite indexes matching the hot chat queries, so they are served in
+-- index order without a separate sort step.
+--
+-- On large tables, run each statement on its own with CREATE/DROP INDEX
+-- CONCURRENTLY to avoid blocking writes (not possible inside a transaction).
+
+-- Sidebar keyset pages: WHERE user_id = ? ORDER BY created_at DESC, id DESC.
+-- INCLUDE (title) lets the page be answered by an index-only scan.
+CREATE INDEX IF NOT EXISTS idx_chat_sessions_user_created
+    ON chat_sessions (user_id, created_at DESC, id DESC) INCLUDE (title);
+
+-- Chat history and incremental fetches:
+-- WHERE session_id = ? [AND created_at > ?] ORDER BY created_at
+CREATE INDEX IF NOT EXISTS idx_chat_messages_session_created
+    ON chat_messages (session_id, created_at);
+
+-- The composite indexes share the old indexes' leading columns, so these
+-- are redundant (foreign key lookups and cascades use the new ones)
+DROP INDEX IF EXISTS idx_chat_sessions_user_id;
+DROP INDEX IF EXISTS idx_chat_messages_session_id;
@@ -12,7 +12,7 @@ CREATE TABLE chat_sessions (
     user_id UUID NOT NULL,
     title TEXT,
     created_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (user_id) REFERENCES users(id)
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 );
 
 -- Create chat_messages table
@@ -22,12 +22,144 @@ CREATE TABLE chat_messages (
     content TEXT,
     role TEXT,
     created_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (session_id) REFERENCES chat_sessions(id)
+    FOREIGN KEY (session_id) REFERENCES chat_sessions(id) ON DELETE CASCADE
 );
 
 -- Add indexes to improve query performance
-CREATE INDEX idx_chat_sessions_user_id ON chat_sessions(user_id);
-CREATE INDEX idx_chat_messages_session_id ON chat_messages(session_id);
+CREATE INDEX idx_chat_sessions_user_created
+    ON chat_sessions(user_id, created_at DESC, id DESC) INCLUDE (title);
+CREATE INDEX idx_chat_messages_session_created
+    ON chat_messages(session_id, created_at);
 
 -- Add unique constraint to prevent duplicate emails
-ALTER TABLE users ADD CONSTRAINT unique_email UNIQUE (email);
\ No newline at end of file
+ALTER TABLE users ADD CONSTRAINT unique_email UNIQUE (email);
+
+-- Delete sessions (one or many) and their messages in one transaction
+CREATE OR REPLACE FUNCTION delete_chat_sessions(p_session_ids UUID[])
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    deleted_count INTEGER;
+BEGIN
+    DELETE FROM chat_sessions WHERE id = ANY(p_session_ids);
+    GET DIAGNOSTICS deleted_count = ROW_COUNT;
+    RETURN deleted_count;
+END;
+$$;
+
+-- Token bucket rate limits shared by every app replica
+CREATE TABLE IF NOT EXISTS rate_limits (
+    key TEXT PRIMARY KEY,
+    tokens DOUBLE PRECISION NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Bucket size and refill rate per key scope (the key up to its first ':'),
+-- fixed here so callers can't choose their own limits
+CREATE TABLE IF NOT EXISTS rate_limit_policies (
+    scope TEXT PRIMARY KEY,
+    capacity DOUBLE PRECISION NOT NULL CHECK (capacity > 0),
+    refill_per_second DOUBLE PRECISION NOT NULL CHECK (refill_per_second > 0)
+);
+
+-- 15 analyses per user, refilled over 24 hours (ANALYSIS_DAILY_LIMIT)
+INSERT INTO rate_limit_policies (scope, capacity, refill_per_second)
+VALUES ('analysis', 15, 15 / 86400.0)
+ON CONFLICT (scope) DO NOTHING;
+
+-- Refill a bucket up to now and lock its row, creating it full on first use
+CREATE OR REPLACE FUNCTION refill_rate_limit(
+    p_key TEXT,
+    OUT current_tokens DOUBLE PRECISION,
+    OUT bucket_capacity DOUBLE PRECISION,
+    OUT bucket_refill DOUBLE PRECISION,
+    OUT now_ts TIMESTAMPTZ
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    now_ts := clock_timestamp();
+    SELECT p.capacity, p.refill_per_second
+    INTO bucket_capacity, bucket_refill
+    FROM rate_limit_policies p
+    WHERE p.scope = split_part(p_key, ':', 1);
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'No rate limit policy for key %', p_key;
+    END IF;
+
+    INSERT INTO rate_limits (key, tokens, updated_at)
+    VALUES (p_key, bucket_capacity, now_ts)
+    ON CONFLICT (key) DO NOTHING;
+
+    SELECT LEAST(
+        bucket_capacity,
+        r.tokens + GREATEST(0, EXTRACT(EPOCH FROM now_ts - r.updated_at)) * bucket_refill
+    )
+    INTO current_tokens
+    FROM rate_limits r
+    WHERE r.key = p_key
+    FOR UPDATE;
+END;
+$$;
+
+-- Take p_cost tokens if available
+CREATE OR REPLACE FUNCTION consume_rate_limit(p_key TEXT, p_cost DOUBLE PRECISION DEFAULT 1)
+RETURNS TABLE (allowed BOOLEAN, remaining DOUBLE PRECISION, retry_after DOUBLE PRECISION)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    bucket RECORD;
+BEGIN
+    IF p_cost IS NULL OR p_cost <= 0 THEN
+        RAISE EXCEPTION 'p_cost must be positive, got %', p_cost;
+    END IF;
+    SELECT * INTO bucket FROM refill_rate_limit(p_key);
+
+    IF bucket.current_tokens < p_cost THEN
+        RETURN QUERY SELECT FALSE, bucket.current_tokens,
+            (p_cost - bucket.current_tokens) / bucket.bucket_refill;
+        RETURN;
+    END IF;
+
+    UPDATE rate_limits r
+    SET tokens = bucket.current_tokens - p_cost, updated_at = bucket.now_ts
+    WHERE r.key = p_key;
+    RETURN QUERY SELECT TRUE, bucket.current_tokens - p_cost, 0::DOUBLE PRECISION;
+END;
+$$;
+
+-- Report whether one token is available without taking it
+CREATE OR REPLACE FUNCTION peek_rate_limit(p_key TEXT)
+RETURNS TABLE (allowed BOOLEAN, remaining DOUBLE PRECISION, retry_after DOUBLE PRECISION)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    bucket RECORD;
+BEGIN
+    SELECT * INTO bucket FROM refill_rate_limit(p_key);
+    RETURN QUERY SELECT bucket.current_tokens >= 1, bucket.current_tokens,
+        GREATEST(0, (1 - bucket.current_tokens) / bucket.bucket_refill);
+END;
+$$;
+
+-- Give back tokens for a request that did not use the quota. A refund is
+-- at most one bucket and never fills the bucket past its capacity.
+CREATE OR REPLACE FUNCTION refund_rate_limit(p_key TEXT, p_cost DOUBLE PRECISION DEFAULT 1)
+RETURNS TABLE (allowed BOOLEAN, remaining DOUBLE PRECISION, retry_after DOUBLE PRECISION)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    bucket RECORD;
+    refunded DOUBLE PRECISION;
+BEGIN
+    SELECT * INTO bucket FROM refill_rate_limit(p_key);
+    IF p_cost IS NULL OR p_cost <= 0 OR p_cost > bucket.bucket_capacity THEN
+        RAISE EXCEPTION 'p_cost must be in (0, %], got %', bucket.bucket_capacity, p_cost;
+    END IF;
+
+    refunded := LEAST(bucket.bucket_capacity, bucket.current_tokens + p_cost);
+    UPDATE rate_limits r SET tokens = refunded, updated_at = bucket.now_ts WHERE r.key = p_key;
+    RETURN QUERY SELECT TRUE, refunded, 0::DOUBLE PRECISION;
+END;
+$$;
\ No newline at end of file
@@ -1,6 +1,13 @@
-from datetime import datetime, timedelta
+import logging
 import streamlit as st
+from agents.knowledge_base import format_context, get_knowledge_base
 from agents.model_manager import ModelManager
+from config.app_config import COMPACT_LAB_REPORT, KNOWLEDGE_CONTEXT_ITEMS, MODEL_HEDGING_ENABLED
+from services.clients import get_async_model_manager
+from services.rate_limiter import get_rate_limiter
+from utils.prompt_compactor import compact_report_text, estimate_tokens
+
+logger = logging.getLogger(__name__)
 
 class AnalysisAgent:
     """
@@ -10,41 +17,49 @@ class AnalysisAgent:
     
     def __init__(self):
         self.model_manager = ModelManager()
+        self.async_model_manager = get_async_model_manager() if MODEL_HEDGING_ENABLED else None
+        self.rate_limiter = get_rate_limiter()
+        self.knowledge_base = get_knowledge_base()
         self._init_state()
         
     def _init_state(self):
         """Initialize analysis-related session state variables."""
-        if 'analysis_count' not in st.session_state:
-            st.session_state.analysis_count = 0
-        if 'last_analysis' not in st.session_state:
-            st.session_state.last_analysis = datetime.now()
-        if 'analysis_limit' not in st.session_state:
-            st.session_state.analysis_limit = 15
         if 'models_used' not in st.session_state:
             st.session_state.models_used = {}
-        if 'knowledge_base' not in st.session_state:
-            st.session_state.knowledge_base = {}
+        # Kept by reference so worker threads don't go through session_state
+        self.models_used = st.session_state.models_used
             
     def check_rate_limit(self):
         """Check if user has reached their analysis limit."""
-        # Calculate time until reset
-        time_until_reset = timedelta(days=1) - (datetime.now() - st.session_state.last_analysis)
-        hours, remainder = divmod(time_until_reset.seconds, 3600)
-        minutes, _ = divmod(remainder, 60)
-        
-        # Reset counter after 24 hours
-        if time_until_reset.days < 0:
-            st.session_state.analysis_count = 0
-            st.session_state.last_analysis = datetime.now()
-            return True, None
-        
-        # Check if limit reached
-        if st.session_state.analysis_count >= st.session_state.analysis_limit:
-            error_msg = f"Daily limit reached. Reset in {hours}h {minutes}m"
-            return False, error_msg
+        key = self.rate_limit_key()
+        if key is None:
+            return False, "Please log in to analyze reports"
+        allowed, _, retry_after = self.rate_limiter.peek(key)
+        if not allowed:
+            return False, self._limit_message(retry_after)
         return True, None
 
-    def analyze_report(self, data, system_prompt, check_only=False, chat_history=None):
+    def get_remaining_analyses(self):
+        """Number of analyses the user can run right now."""
+        key = self.rate_limit_key()
+        if key is None:
+            return 0
+        _, remaining, _ = self.rate_limiter.peek(key)
+        return int(remaining)
+
+    @staticmethod
+    def rate_limit_key():
+        user = st.session_state.get('user') or {}
+        return f"analysis:{user['id']}" if user.get('id') else None
+
+    @staticmethod
+    def _limit_message(retry_after):
+        hours, remainder = divmod(int(retry_after), 3600)
+        minutes, _ = divmod(remainder, 60)
+        return f"Daily limit reached. Next analysis in {hours}h {minutes}m"
+
+    def analyze_report(self, data, system_prompt, check_only=False, chat_history=None, stream=False,
+                       rate_limit_key=None):
         """
         Analyze report data using in-context learning from previous analyses.
         
@@ -53,81 +68,88 @@ class AnalysisAgent:
             system_prompt: Base system prompt
             check_only: If True, only check rate limit without generating analysis
             chat_history: Previous messages in the current session (optional)
+            stream: If True, return a "stream" generator of content chunks;
+                "content" is filled in once the stream is exhausted
+            rate_limit_key: Quota key, resolved from the logged-in user when
+                None; background jobs pass it since they can't read session_state
         """
-        can_analyze, error_msg = self.check_rate_limit()
-        if not can_analyze:
-            return {"success": False, "error": error_msg}
-        
         if check_only:
-            return can_analyze, error_msg
+            return self.check_rate_limit()
+        
+        # Take the quota up front so concurrent sessions can't overrun it
+        key = rate_limit_key or self.rate_limit_key()
+        if key is None:
+            return {"success": False, "error": "Please log in to analyze reports"}
+        allowed, _, retry_after = self.rate_limiter.try_acquire(key)
+        if not allowed:
+            return {"success": False, "error": self._limit_message(retry_after)}
         
         # Process data before sending to model
-        processed_data = self._preprocess_data(data)
+        processed_data = self.preprocess_data(data)
         
-        # Enhance prompt with in-context learning (only if chat_history is provided)
-        enhanced_prompt = self._build_enhanced_prompt(system_prompt, processed_data, chat_history) if chat_history else system_prompt
+        # Enhance prompt with in-context learning from earlier analyses and,
+        # when given, the session's chat history
+        enhanced_prompt = self._build_enhanced_prompt(system_prompt, processed_data, chat_history)
         
         # Generate analysis using model manager
-        result = self.model_manager.generate_analysis(processed_data, enhanced_prompt)
+        if self.async_model_manager:
+            result = self.async_model_manager.run(processed_data, enhanced_prompt, stream=stream)
+        else:
+            result = self.model_manager.generate_analysis(processed_data, enhanced_prompt, stream=stream)
+        
+        # Failed and cached analyses cost no model quota
+        if not result["success"] or result.get("cached"):
+            self.rate_limiter.refund(key)
         
         if result["success"]:
+            # Measure the saving against sending the raw data repr
+            tokens_before = estimate_tokens(enhanced_prompt) + estimate_tokens(str(data))
+            result["prompt_tokens_before"] = tokens_before
+            logger.info(
+                "Prompt tokens estimate: %s before compaction, %s sent",
+                tokens_before, result.get("prompt_tokens_estimate")
+            )
+            if stream:
+                result["stream"] = self._collect_stream(result, result["stream"], processed_data, key)
+                return result
             # Update analytics and learning systems
             self._update_analytics(result)
             self._update_knowledge_base(processed_data, result["content"])
         
         return result
     
+    def _collect_stream(self, result, stream, data, rate_limit_key):
+        """
+        Pass chunks through, then store the full content and update learning.
+        A stream that breaks off gives its quota back like a failed analysis.
+        """
+        chunks = []
+        try:
+            for chunk in stream:
+                chunks.append(chunk)
+                yield chunk
+        except Exception:
+            self.rate_limiter.refund(rate_limit_key)
+            raise
+        result["content"] = "".join(chunks)
+        self._update_analytics(result)
+        self._update_knowledge_base(data, result["content"])
+    
     def _update_analytics(self, result):
         """Update analytics after successful analysis."""
-        st.session_state.analysis_count += 1
-        st.session_state.last_analysis = datetime.now()
-        
         # Track which models are being used
         model_used = result.get("model_used", "unknown")
-        if model_used in st.session_state.models_used:
-            st.session_state.models_used[model_used] += 1
+        if model_used in self.models_used:
+            self.models_used[model_used] += 1
         else:
-            st.session_state.models_used[model_used] = 1
+            self.models_used[model_used] = 1
     
     def _update_knowledge_base(self, data, analysis):
         """
         Update knowledge base with new analysis results for in-context learning.
-        Maps key health indicators to analysis patterns.
+        Maps the report's analytes to what the analysis said about them.
         """
-        if not isinstance(data, dict) or 'report' not in data:
-            return
-            
-        # Extract key health indicators and map them to analysis outcomes
-        # This basic implementation can be expanded with more sophisticated extraction
-        report_text = data['report'].lower()
-        patient_profile = f"{data.get('age', 'unknown')}-{data.get('gender', 'unknown')}"
-        
-        # Look for key health indicators in the report
-        key_indicators = [
-            "hemoglobin", "glucose", "cholesterol", "triglycerides", 
-            "hdl", "ldl", "wbc", "rbc", "platelet", "creatinine"
-        ]
-        
-        # Store snippets of analysis associated with key health indicators
-        for indicator in key_indicators:
-            if indicator in report_text:
-                # Find any mentions of this indicator in the analysis
-                if indicator in analysis.lower():
-                    # Store this learning in knowledge base
-                    if indicator not in st.session_state.knowledge_base:
-                        st.session_state.knowledge_base[indicator] = {}
-                    
-                    if patient_profile not in st.session_state.knowledge_base[indicator]:
-                        st.session_state.knowledge_base[indicator][patient_profile] = []
-                    
-                    # Extract the relevant section from analysis (simple approach)
-                    lines = analysis.split('\n')
-                    relevant_lines = [l for l in lines if indicator in l.lower()]
-                    if relevant_lines:
-                        # Limit knowledge base size to prevent overflow
-                        if len(st.session_state.knowledge_base[indicator][patient_profile]) >= 3:
-                            st.session_state.knowledge_base[indicator][patient_profile].pop(0)
-                        st.session_state.knowledge_base[indicator][patient_profile].append(relevant_lines[0])
+        self.knowledge_base.learn(data, analysis)
     
     def _build_enhanced_prompt(self, system_prompt, data, chat_history):
         """
@@ -153,33 +175,7 @@ class AnalysisAgent:
     
     def _get_knowledge_base_context(self, data):
         """Extract relevant context from knowledge base."""
-        if 'knowledge_base' not in st.session_state or not st.session_state.knowledge_base:
-            return ""
-            
-        report_text = data.get('report', '').lower()
-        patient_profile = f"{data.get('age', 'unknown')}-{data.get('gender', 'unknown')}"
-        
-        context_items = []
-        
-        # Find relevant knowledge from previous analyses
-        for indicator, profiles in st.session_state.knowledge_base.items():
-            if indicator in report_text:
-                # Get insights from similar patient profiles first
-                if patient_profile in profiles:
-                    for insight in profiles[patient_profile]:
-                        context_items.append(f"- {indicator} (similar patient profile): {insight}")
-                
-                # Then get general insights
-                for profile, insights in profiles.items():
-                    if profile != patient_profile:
-                        for insight in insights:
-                            context_items.append(f"- {indicator} (other patient profile): {insight}")
-        
-        # Limit context size
-        if len(context_items) > 5:
-            context_items = context_items[:5]
-            
-        return "\n".join(context_items) if context_items else ""
+        return format_context(self.knowledge_base.retrieve(data, limit=KNOWLEDGE_CONTEXT_ITEMS))
     
     def _get_session_context(self, chat_history):
         """Extract relevant context from current session."""
@@ -207,7 +203,8 @@ class AnalysisAgent:
                     
         return "\n\n".join(reversed(context_items)) if context_items else ""
     
-    def _preprocess_data(self, data):
+    @staticmethod
+    def preprocess_data(data):
         """Pre-process data before sending to model."""
         if isinstance(data, dict):
             # Extract only necessary information to reduce token usage
@@ -215,7 +212,17 @@ class AnalysisAgent:
                 "patient_name": data.get("patient_name", ""),
                 "age": data.get("age", ""),
                 "gender": data.get("gender", ""),
-                "report": data.get("report", "")
+                "report": AnalysisAgent._compact_report(data.get("report", ""))
             }
             return processed
         return data
+
+    @staticmethod
+    def _compact_report(report):
+        """
+        Normalize whitespace, drop repeated headers/footers and page
+        furniture, and shorten the lab value rows.
+        """
+        if not COMPACT_LAB_REPORT or not isinstance(report, str):
+            return report
+        return compact_report_text(report)
@@ -0,0 +1,114 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import streamlit as st
+from config.app_config import (
+    ANALYSIS_CACHE_MAX_ENTRIES, ANALYSIS_CACHE_PATH, ANALYSIS_CACHE_TTL_HOURS
+)
+from utils.prompt_compactor import normalize_lines, serialize_report_data
+
+logger = logging.getLogger(__name__)
+
+class AnalysisCache:
+    """
+    Persistent cache of model analyses in a local SQLite database.
+    Entries expire after a TTL and the least recently used entries are
+    evicted once the cache grows past its entry limit.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS analysis_cache (
+            key TEXT PRIMARY KEY,
+            content TEXT NOT NULL,
+            model_used TEXT,
+            created_at REAL NOT NULL,
+            last_access REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_analysis_cache_last_access
+            ON analysis_cache(last_access);
+    """
+
+    def __init__(self, path, ttl_seconds, max_entries):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+
+    @staticmethod
+    def make_key(data, system_prompt, model):
+        """
+        Build the cache key from the data exactly as it is sent to the model
+        (patient name, age, gender and report, whitespace-normalized), the
+        prompt version and the model. The cache is shared by every user, so
+        an analysis is only reused for the same patient details.
+        """
+        sent = "\n".join(normalize_lines(serialize_report_data(data)))
+        prompt_version = hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()[:16]
+        material = "\x1f".join([sent, prompt_version, model])
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Return the cached (content, model_used) or None if missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content, model_used, created_at FROM analysis_cache WHERE key = ?",
+                (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[2] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM analysis_cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute(
+                "UPDATE analysis_cache SET last_access = ? WHERE key = ?", (now, key)
+            )
+        return row[0], row[1]
+
+    def put(self, key, content, model_used):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analysis_cache "
+                "(key, content, model_used, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, content, model_used, now, now)
+            )
+            self._evict(now)
+
+    def _evict(self, now):
+        self._conn.execute(
+            "DELETE FROM analysis_cache WHERE created_at < ?", (now - self.ttl_seconds,)
+        )
+        count = self._conn.execute("SELECT COUNT(*) FROM analysis_cache").fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM analysis_cache WHERE key IN ("
+                "SELECT key FROM analysis_cache ORDER BY last_access LIMIT ?)",
+                (count - self.max_entries,)
+            )
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM analysis_cache")
+
+@st.cache_resource
+def get_analysis_cache():
+    """Process-wide analysis cache, or None if it cannot be opened."""
+    try:
+        return AnalysisCache(
+            ANALYSIS_CACHE_PATH,
+            ttl_seconds=ANALYSIS_CACHE_TTL_HOURS * 3600,
+            max_entries=ANALYSIS_CACHE_MAX_ENTRIES
+        )
+    except sqlite3.Error as e:
+        logger.error(f"Failed to open analysis cache: {str(e)}")
+        return None
@@ -0,0 +1,272 @@
+import asyncio
+import groq
+import logging
+import streamlit as st
+import threading
+import time
+from collections import deque
+from agents.model_manager import BaseModelManager, ModelTier
+from agents.tier_health import rate_limit_info
+from utils.metrics import record_token_usage, span
+
+logger = logging.getLogger(__name__)
+
+_END_OF_STREAM = object()
+
+async def _next_chunk(completion):
+    return await anext(completion, _END_OF_STREAM)
+
+class AsyncModelManager(BaseModelManager):
+    """
+    Asyncio-based model manager that hedges slow requests.
+    The primary tier is tried first; once it has been running longer than
+    the configured latency percentile of its recent calls, a request to the
+    next tier is fired as well. The first successful response wins and the
+    remaining requests are cancelled.
+
+    Streamed requests race to their first chunk: the tier that starts
+    answering first is streamed and the other streams are closed.
+    """
+
+    # Seconds before hedging while a tier has too few samples for a percentile
+    DEFAULT_HEDGE_DELAY = 8.0
+    MIN_HEDGE_SAMPLES = 5
+    LATENCY_WINDOW = 100
+
+    TIER_TIMEOUTS = {
+        ModelTier.PRIMARY: 45.0,
+        ModelTier.SECONDARY: 45.0,
+        ModelTier.TERTIARY: 30.0,
+        ModelTier.FALLBACK: 30.0
+    }
+
+    def __init__(self, client=None, hedge_percentile=0.95, tier_timeouts=None, health=None, cache=None):
+        super().__init__(health, cache)
+        self.client = client
+        self.hedge_percentile = hedge_percentile
+        self.tier_timeouts = {**self.TIER_TIMEOUTS, **(tier_timeouts or {})}
+        # Time to the full response and time to the first chunk, per tier
+        self._latencies = {
+            (tier, stream): deque(maxlen=self.LATENCY_WINDOW)
+            for tier in self.TIER_ORDER for stream in (False, True)
+        }
+        self._loop = None
+        self._loop_lock = threading.Lock()
+
+    def _get_client(self):
+        if self.client is None:
+            self.client = groq.AsyncGroq(api_key=st.secrets["GROQ_API_KEY"])
+        return self.client
+
+    def hedge_delay(self, tier, stream=False):
+        """Seconds to wait on tier before hedging to the next one."""
+        samples = sorted(self._latencies[(tier, stream)])
+        if len(samples) < self.MIN_HEDGE_SAMPLES:
+            return self.DEFAULT_HEDGE_DELAY
+        index = min(len(samples) - 1, int(len(samples) * self.hedge_percentile))
+        return samples[index]
+
+    async def _request(self, model, messages, model_config, stream):
+        """
+        Request a completion; for streams, wait for the first chunk too so
+        a tier only wins the race once it is actually answering.
+        """
+        completion = await self._get_client().chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=model_config["temperature"],
+            max_tokens=model_config["max_tokens"],
+            stream=stream
+        )
+        if not stream:
+            return completion, None
+        try:
+            return completion, await anext(completion, None)
+        except BaseException:
+            # Timed out, cancelled or failed before the first chunk
+            await self._close_stream(completion)
+            raise
+
+    @staticmethod
+    async def _close_stream(completion):
+        """Close a streamed completion, releasing its connection."""
+        close = getattr(completion, "aclose", None) or getattr(completion, "close", None)
+        if close:
+            await close()
+
+    async def _attempt(self, tier, data, system_prompt, stream=False):
+        """
+        Run one tier's request, raising on failure or timeout. Streamed
+        results hold the first chunk and the open completion in "chunks".
+        """
+        model_config = self.MODEL_CONFIG[tier]
+        provider = model_config["provider"]
+        model = model_config["model"]
+        messages, prompt_tokens = self.build_messages(data, system_prompt, model_config)
+
+        logger.info(f"Attempting generation with {provider} model: {model}")
+        health = self.health.get(tier)
+        started = time.perf_counter()
+        with span("model_tier_attempt", tier=tier.value, model=model) as timer:
+            try:
+                completion, first_chunk = await asyncio.wait_for(
+                    self._request(model, messages, model_config, stream),
+                    timeout=self.tier_timeouts[tier]
+                )
+            except asyncio.CancelledError:
+                # The hedged request that lost the race
+                health.release_probe()
+                timer.set(outcome="cancelled")
+                raise
+            except Exception as e:
+                rate_limited, retry_after = rate_limit_info(e)
+                health.record_failure(time.perf_counter() - started, retry_after, rate_limited)
+                timer.set(outcome="rate_limited" if rate_limited else "error")
+                raise
+        latency = time.perf_counter() - started
+        self._latencies[(tier, stream)].append(latency)
+        health.record_success(latency)
+
+        result = {
+            "success": True,
+            "model_used": f"{provider}/{model}",
+            "prompt_tokens_estimate": prompt_tokens
+        }
+        if stream:
+            result["first_chunk"] = first_chunk
+            result["chunks"] = completion
+        else:
+            result["content"] = completion.choices[0].message.content
+            record_token_usage(model, getattr(completion, "usage", None))
+        return result
+
+    async def generate_analysis(self, data, system_prompt, stream=False):
+        """
+        Generate analysis, hedging to the next tier when the current one is
+        slower than its latency threshold and falling through on errors.
+        Cached analyses are served first; the path taken is reported in
+        "routing" like ModelManager does.
+
+        With stream=True a fresh result holds the winner's "first_chunk" and
+        its open completion in "chunks"; run() turns them into a "stream".
+        """
+        # The SQLite lookup would block every other request on the loop
+        cached = await asyncio.to_thread(self._get_cached, data, system_prompt, stream)
+        if cached:
+            return cached
+
+        remaining = list(self.TIER_ORDER)
+        running = {}
+        routing = []
+
+        def launch():
+            while remaining:
+                tier = remaining.pop(0)
+                reason = self._skip_reason(tier)
+                if reason:
+                    routing.append(f"{tier.value} skipped ({reason})")
+                    continue
+                task = asyncio.ensure_future(self._attempt(tier, data, system_prompt, stream))
+                running[task] = tier
+                return tier
+            return None
+
+        newest = launch()
+        if newest is None:
+            return {
+                "success": False,
+                "error": "All models are temporarily unavailable",
+                "routing": " -> ".join(routing)
+            }
+        try:
+            while running:
+                timeout = self.hedge_delay(newest, stream) if remaining else None
+                done, _ = await asyncio.wait(
+                    running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+
+                if not done:
+                    logger.info(f"Tier {newest.value} exceeded hedge threshold, hedging")
+                    routing.append(f"{newest.value} slow")
+                    newest = launch() or newest
+                    continue
+
+                for task in done:
+                    tier = running.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        logger.warning(f"Tier {tier.value} failed: {str(e).lower()}")
+                        routing.append(f"{tier.value} failed")
+                        continue
+                    routing.append(tier.value)
+                    result["model_tier"] = tier.value
+                    result["routing"] = " -> ".join(routing)
+                    if not stream:
+                        cache_key = self._cache_key(data, system_prompt, self.MODEL_CONFIG[tier]["model"])
+                        await asyncio.to_thread(
+                            self._store_cached, cache_key, result["content"], result["model_used"]
+                        )
+                    return result
+
+                # Every finished request failed, fall through immediately
+                if not running and remaining:
+                    newest = launch() or newest
+        finally:
+            for task in running:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled() and task.exception() is None and "chunks" in task.result():
+                    # A stream that started in the same step as the winner
+                    await self._close_stream(task.result()["chunks"])
+
+        return {
+            "success": False,
+            "error": "Analysis failed with all available models",
+            "routing": " -> ".join(routing)
+        }
+
+    def run(self, data, system_prompt, stream=False):
+        """
+        Blocking entry point for synchronous callers such as Streamlit scripts.
+        Requests run on a long-lived background event loop so the async HTTP
+        client keeps its connections between calls.
+
+        With stream=True the result holds a "stream" generator of content
+        chunks, like ModelManager.generate_analysis; it pulls each chunk
+        from the event loop and caches the full content at the end.
+        """
+        future = asyncio.run_coroutine_threadsafe(
+            self.generate_analysis(data, system_prompt, stream), self._ensure_loop()
+        )
+        result = future.result()
+        if "chunks" in result:
+            model = self.MODEL_CONFIG[ModelTier(result["model_tier"])]["model"]
+            chunks = self._sync_chunks(result.pop("chunks"))
+            result["stream"] = self._cache_stream(
+                self._stream_content(result.pop("first_chunk"), chunks, model),
+                self._cache_key(data, system_prompt, model), result["model_used"]
+            )
+        return result
+
+    def _sync_chunks(self, completion):
+        """Iterate an async completion stream from a synchronous thread."""
+        loop = self._ensure_loop()
+        try:
+            while True:
+                chunk = asyncio.run_coroutine_threadsafe(_next_chunk(completion), loop).result()
+                if chunk is _END_OF_STREAM:
+                    return
+                yield chunk
+        finally:
+            # Also runs when the reader stops early, so the connection is released
+            asyncio.run_coroutine_threadsafe(self._close_stream(completion), loop).result()
+
+    def _ensure_loop(self):
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=self._loop.run_forever, name="model-manager-loop", daemon=True
+                ).start()
+            return self._loop
@@ -0,0 +1,493 @@
+import atexit
+import hashlib
+import heapq
+import itertools
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+import streamlit as st
+from config.app_config import (
+    KNOWLEDGE_AGE_BUCKETS, KNOWLEDGE_BASE_BACKEND, KNOWLEDGE_BASE_MAX_INSIGHTS,
+    KNOWLEDGE_BASE_MAX_PER_ANALYTE, KNOWLEDGE_STORE_FLUSH_SECONDS, KNOWLEDGE_STORE_MAX_AGE_DAYS,
+    KNOWLEDGE_STORE_MAX_INSIGHTS, KNOWLEDGE_STORE_MAX_PENDING, KNOWLEDGE_STORE_PATH,
+    KNOWLEDGE_STORE_WRITE_BATCH
+)
+from utils.lab_parser import ANALYTE_INDEX, parse_lab_report
+
+logger = logging.getLogger(__name__)
+
+# Aliases of 1-2 letters ("k", "na", "hb") match too much ordinary text,
+# so only canonical keys and longer aliases are looked for in analyses
+_MENTION_ALIASES = sorted(
+    {alias for alias, canonical in ANALYTE_INDEX.items() if len(alias) >= 3 or alias == canonical},
+    key=len, reverse=True
+)
+MENTION_PATTERN = re.compile(
+    r"(?<![a-z0-9])(?:" + "|".join(re.escape(alias) for alias in _MENTION_ALIASES) + r")(?![a-z0-9])"
+)
+
+MAX_INSIGHT_CHARS = 300
+
+def age_bucket(age):
+    """Map an age onto a range label such as '40-59', or 'unknown'."""
+    try:
+        age = int(age)
+    except (TypeError, ValueError):
+        return "unknown"
+    low = 0
+    for high in KNOWLEDGE_AGE_BUCKETS:
+        if age < high:
+            return f"{low}-{high - 1}"
+        low = high
+    return f"{low}+"
+
+def patient_profile(data):
+    """Return the (age bucket, gender) profile of report data."""
+    return age_bucket(data.get("age")), str(data.get("gender") or "unknown").lower()
+
+def extract_insights(table, analysis):
+    """
+    Return {analyte: line} with the first analysis line mentioning each
+    analyte of the report, in a single pass over the analysis lines.
+    """
+    wanted = set(table.analytes)
+    found = {}
+    for line in analysis.splitlines():
+        if len(found) == len(wanted):
+            break
+        lowered = line.lower()
+        for match in MENTION_PATTERN.finditer(lowered):
+            analyte = ANALYTE_INDEX[match.group(0)]
+            if analyte in wanted and analyte not in found:
+                found[analyte] = line.strip()[:MAX_INSIGHT_CHARS]
+    return found
+
+def observe(data, analysis):
+    """
+    Return the report's lab table, its profile and the (analyte, flag, text)
+    insights an analysis gives about it. The patient's name is removed,
+    since insights are shared between patients.
+    """
+    table = parse_lab_report(data["report"])
+    patient_name = str(data.get("patient_name") or "").strip()
+    observations = []
+    for analyte, text in extract_insights(table, analysis).items():
+        if patient_name:
+            text = re.sub(re.escape(patient_name), "the patient", text, flags=re.IGNORECASE)
+        observations.append((analyte, table.flags[table.index[analyte]], text))
+    return table, patient_profile(data), observations
+
+class Insight:
+    __slots__ = ("id", "analyte", "age_bucket", "gender", "flag", "text", "created_at", "uses")
+
+    def __init__(self, insight_id, analyte, profile, flag, text, created_at=None, uses=0):
+        self.id = insight_id
+        self.analyte = analyte
+        self.age_bucket, self.gender = profile
+        self.flag = flag
+        self.text = text
+        self.created_at = created_at or time.time()
+        self.uses = uses
+
+def score_insight(insight, profile, flag):
+    """
+    Relevance of an insight for a report analyte: matching abnormal flag
+    counts most, then age bucket, then gender, with a small bonus for
+    insights that were useful before.
+    """
+    score = 1.0
+    if insight.flag == flag:
+        score += 3.0 if flag else 1.0
+    if insight.age_bucket == profile[0]:
+        score += 2.0
+    if insight.gender == profile[1]:
+        score += 1.0
+    return score + min(insight.uses, 10) * 0.05
+
+class KnowledgeBase(ABC):
+    """
+    Knowledge base of insights from previous analyses, keyed by the
+    canonical analytes they are about. Backends implement
+    _store(profile, observations), _search(table, profile, limit),
+    clear() and __len__.
+    """
+
+    def learn(self, data, analysis):
+        """Store what an analysis said about each analyte in the report."""
+        if not isinstance(data, dict) or not data.get("report") or not analysis:
+            return 0
+        _, profile, observations = observe(data, analysis)
+        if observations:
+            self._store(profile, observations)
+        return len(observations)
+
+    def retrieve(self, data, limit=5):
+        """
+        Return up to `limit` (insight, similar_profile) pairs most relevant
+        to the report, best first.
+        """
+        if not isinstance(data, dict) or not data.get("report"):
+            return []
+        profile = patient_profile(data)
+        insights = self._search(parse_lab_report(data["report"]), profile, limit)
+        return [
+            (insight, (insight.age_bucket, insight.gender) == profile)
+            for insight in insights
+        ]
+
+    def flush(self):
+        """Write buffered insights, for backends that batch writes."""
+
+    @abstractmethod
+    def _store(self, profile, observations):
+        """Save the (analyte, flag, text) observations for a patient profile."""
+
+    @abstractmethod
+    def _search(self, table, profile, limit):
+        """The `limit` insights most relevant to a parsed lab table, best first."""
+
+    @abstractmethod
+    def clear(self):
+        """Forget every insight."""
+
+    @abstractmethod
+    def __len__(self):
+        """Number of stored insights."""
+
+class MemoryKnowledgeBase(KnowledgeBase):
+    """
+    In-memory knowledge base for a single process.
+    Insights are indexed by canonical analyte, so retrieval only looks at
+    the analytes present in a report. Memory is bounded per analyte and in
+    total; the least recently used insights are evicted first.
+    """
+
+    def __init__(self, max_insights=KNOWLEDGE_BASE_MAX_INSIGHTS,
+                 max_per_analyte=KNOWLEDGE_BASE_MAX_PER_ANALYTE):
+        self.max_insights = max_insights
+        self.max_per_analyte = max_per_analyte
+        self._insights = OrderedDict()
+        self._index = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._insights)
+
+    def _store(self, profile, observations):
+        with self._lock:
+            for analyte, flag, text in observations:
+                self._add(Insight(next(self._ids), analyte, profile, flag, text))
+
+    def _search(self, table, profile, limit):
+        with self._lock:
+            candidates = (
+                (score_insight(self._insights[insight_id], profile, flag), insight_id)
+                for analyte, flag in zip(table.analytes, table.flags)
+                for insight_id in self._index.get(analyte, ())
+            )
+            results = []
+            for _, insight_id in heapq.nlargest(limit, candidates):
+                insight = self._insights[insight_id]
+                insight.uses += 1
+                self._insights.move_to_end(insight_id)
+                self._index[insight.analyte].move_to_end(insight_id)
+                results.append(insight)
+        return results
+
+    def clear(self):
+        with self._lock:
+            self._insights.clear()
+            self._index.clear()
+
+    def _add(self, insight):
+        bucket = self._index.setdefault(insight.analyte, OrderedDict())
+        for existing_id in bucket:
+            existing = self._insights[existing_id]
+            if existing.text == insight.text and existing.flag == insight.flag:
+                # Same lesson again, refresh it instead of storing a copy
+                self._insights.move_to_end(existing_id)
+                bucket.move_to_end(existing_id)
+                return
+        self._insights[insight.id] = insight
+        bucket[insight.id] = None
+        if len(bucket) > self.max_per_analyte:
+            self._remove(next(iter(bucket)))
+        while len(self._insights) > self.max_insights:
+            self._remove(next(iter(self._insights)))
+
+    def _remove(self, insight_id):
+        insight = self._insights.pop(insight_id)
+        bucket = self._index[insight.analyte]
+        del bucket[insight_id]
+        if not bucket:
+            del self._index[insight.analyte]
+
+class SQLiteKnowledgeBase(KnowledgeBase):
+    """
+    Persistent knowledge base in a local SQLite database, shared by every
+    session and kept across restarts.
+
+    Retrieval looks up each report analyte through B-tree indexes: insights
+    from the same flag and profile first, then the analyte's most recently
+    used ones, so its cost depends on the report rather than the store
+    size. Reports without parsed lab rows fall back to an FTS5 full-text
+    search of the insight text. Reads use a pool of WAL connections and
+    don't block each other; new insights and usage counts are buffered
+    and written in batches, followed by age and size eviction.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS insights (
+            id INTEGER PRIMARY KEY,
+            analyte TEXT NOT NULL,
+            flag TEXT NOT NULL,
+            age_bucket TEXT NOT NULL,
+            gender TEXT NOT NULL,
+            text TEXT NOT NULL,
+            text_hash TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_used REAL NOT NULL,
+            uses INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_insights_profile
+            ON insights(analyte, flag, age_bucket, gender, text_hash);
+        CREATE INDEX IF NOT EXISTS idx_insights_recent ON insights(analyte, last_used);
+        CREATE INDEX IF NOT EXISTS idx_insights_last_used ON insights(last_used);
+        CREATE INDEX IF NOT EXISTS idx_insights_created_at ON insights(created_at);
+        CREATE VIRTUAL TABLE IF NOT EXISTS insights_fts USING fts5(
+            text, content='insights', content_rowid='id'
+        );
+        CREATE TRIGGER IF NOT EXISTS insights_fts_insert AFTER INSERT ON insights BEGIN
+            INSERT INTO insights_fts(rowid, text) VALUES (new.id, new.text);
+        END;
+        CREATE TRIGGER IF NOT EXISTS insights_fts_delete AFTER DELETE ON insights BEGIN
+            INSERT INTO insights_fts(insights_fts, rowid, text) VALUES ('delete', old.id, old.text);
+        END;
+    """
+
+    COLUMNS = "id, analyte, flag, age_bucket, gender, text, created_at, uses"
+    FTS_TERMS = 16
+
+    def __init__(self, path, max_insights=KNOWLEDGE_STORE_MAX_INSIGHTS,
+                 max_age_days=KNOWLEDGE_STORE_MAX_AGE_DAYS,
+                 write_batch=KNOWLEDGE_STORE_WRITE_BATCH,
+                 flush_seconds=KNOWLEDGE_STORE_FLUSH_SECONDS,
+                 max_pending=KNOWLEDGE_STORE_MAX_PENDING):
+        self.path = path
+        self.max_insights = max_insights
+        self.max_age_seconds = max_age_days * 86400
+        self.write_batch = write_batch
+        self.max_pending = max_pending
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._writer = self._connect()
+        self._writer.executescript(self.SCHEMA)
+        self._write_lock = threading.Lock()
+        self._readers = queue.LifoQueue()
+        self._pending_lock = threading.Lock()
+        self._pending = []
+        self._pending_uses = Counter()
+        self._stopped = threading.Event()
+        if flush_seconds:
+            threading.Thread(
+                target=self._flush_periodically, args=(flush_seconds,),
+                name="knowledge-base-flush", daemon=True
+            ).start()
+        atexit.register(self.close)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def _reader(self):
+        """Borrow a read connection; WAL readers run concurrently with the writer."""
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+            conn.execute("PRAGMA query_only=ON")
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    def __len__(self):
+        with self._reader() as conn:
+            return conn.execute("SELECT COUNT(*) FROM insights").fetchone()[0]
+
+    def _store(self, profile, observations):
+        now = time.time()
+        rows = [
+            (analyte, flag, profile[0], profile[1], text,
+             hashlib.sha1(text.encode("utf-8")).hexdigest(), now, now)
+            for analyte, flag, text in observations
+        ]
+        with self._pending_lock:
+            self._pending.extend(rows)
+            full = len(self._pending) >= self.write_batch
+        if full:
+            self.flush()
+
+    def _search(self, table, profile, limit):
+        if not len(table):
+            return []
+        candidates = {}
+        with self._reader() as conn:
+            for analyte, flag in zip(table.analytes, table.flags):
+                for row in conn.execute(
+                    f"SELECT {self.COLUMNS} FROM insights "
+                    "WHERE analyte = ? AND flag = ? AND age_bucket = ? AND gender = ? "
+                    "ORDER BY last_used DESC LIMIT ?",
+                    (analyte, flag, profile[0], profile[1], limit)
+                ):
+                    candidates[row[0]] = (row, flag)
+                for row in conn.execute(
+                    f"SELECT {self.COLUMNS} FROM insights "
+                    "WHERE analyte = ? ORDER BY last_used DESC LIMIT ?",
+                    (analyte, limit)
+                ):
+                    candidates.setdefault(row[0], (row, flag))
+
+        insights = [(self._insight(row), flag) for row, flag in candidates.values()]
+        best = heapq.nlargest(
+            limit, insights, key=lambda item: score_insight(item[0], profile, item[1])
+        )
+        self._record_uses(insight.id for insight, _ in best)
+        return [insight for insight, _ in best]
+
+    def search(self, text, limit=5):
+        """Full-text search of stored insights, best match first."""
+        terms = list(dict.fromkeys(re.findall(r"[a-z][a-z0-9]{3,}", text.lower())))
+        if not terms:
+            return []
+        query = " OR ".join(f'"{term}"' for term in terms[:self.FTS_TERMS])
+        with self._reader() as conn:
+            rows = conn.execute(
+                f"SELECT {', '.join('i.' + c.strip() for c in self.COLUMNS.split(','))} "
+                "FROM insights_fts JOIN insights i ON i.id = insights_fts.rowid "
+                "WHERE insights_fts MATCH ? ORDER BY rank LIMIT ?",
+                (query, limit)
+            ).fetchall()
+        insights = [self._insight(row) for row in rows]
+        self._record_uses(insight.id for insight in insights)
+        return insights
+
+    def retrieve(self, data, limit=5):
+        results = super().retrieve(data, limit)
+        if results or not isinstance(data, dict) or not data.get("report"):
+            return results
+        # No lab rows were parsed, search the insight text instead
+        profile = patient_profile(data)
+        return [
+            (insight, (insight.age_bucket, insight.gender) == profile)
+            for insight in self.search(data["report"], limit)
+        ]
+
+    @staticmethod
+    def _insight(row):
+        insight_id, analyte, flag, age, gender, text, created_at, uses = row
+        return Insight(insight_id, analyte, (age, gender), flag, text, created_at, uses)
+
+    def _record_uses(self, insight_ids):
+        with self._pending_lock:
+            self._pending_uses.update(insight_ids)
+
+    def flush(self):
+        """
+        Write buffered insights and usage counts in one transaction, then
+        evict. When the write fails, e.g. on a locked database, the batch
+        goes back into the buffer for the next flush.
+        """
+        with self._pending_lock:
+            rows, self._pending = self._pending, []
+            uses, self._pending_uses = self._pending_uses, Counter()
+        if not rows and not uses:
+            return
+        now = time.time()
+        with self._write_lock:
+            try:
+                self._writer.execute("BEGIN IMMEDIATE")
+                self._writer.executemany(
+                    "INSERT INTO insights "
+                    "(analyte, flag, age_bucket, gender, text, text_hash, created_at, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(analyte, flag, age_bucket, gender, text_hash) "
+                    "DO UPDATE SET last_used = excluded.last_used",
+                    rows
+                )
+                self._writer.executemany(
+                    "UPDATE insights SET uses = uses + ?, last_used = ? WHERE id = ?",
+                    [(count, now, insight_id) for insight_id, count in uses.items()]
+                )
+                self._evict(now)
+                self._writer.execute("COMMIT")
+            except sqlite3.Error as e:
+                # BEGIN IMMEDIATE itself fails when the database is busy
+                if self._writer.in_transaction:
+                    self._writer.execute("ROLLBACK")
+                logger.error(f"Failed to write knowledge base, keeping {len(rows)} insights buffered: {str(e)}")
+                self._requeue(rows, uses)
+
+    def _requeue(self, rows, uses):
+        """Put a failed batch back in front of what was buffered since."""
+        with self._pending_lock:
+            pending = rows + self._pending
+            dropped = len(pending) - self.max_pending
+            if dropped > 0:
+                logger.warning(f"Knowledge base buffer full, dropping the {dropped} oldest insights")
+                pending = pending[dropped:]
+            self._pending = pending
+            self._pending_uses.update(uses)
+
+    def _evict(self, now):
+        self._writer.execute(
+            "DELETE FROM insights WHERE created_at < ?", (now - self.max_age_seconds,)
+        )
+        count = self._writer.execute("SELECT COUNT(*) FROM insights").fetchone()[0]
+        if count > self.max_insights:
+            self._writer.execute(
+                "DELETE FROM insights WHERE id IN ("
+                "SELECT id FROM insights ORDER BY last_used LIMIT ?)",
+                (count - self.max_insights,)
+            )
+
+    def _flush_periodically(self, interval):
+        while not self._stopped.wait(interval):
+            self.flush()
+
+    def clear(self):
+        with self._pending_lock:
+            self._pending, self._pending_uses = [], Counter()
+        with self._write_lock:
+            self._writer.execute("DELETE FROM insights")
+
+    def close(self):
+        self._stopped.set()
+        self.flush()
+
+@st.cache_resource
+def get_knowledge_base():
+    """Knowledge base shared by every session in the process."""
+    if KNOWLEDGE_BASE_BACKEND == "sqlite":
+        try:
+            return SQLiteKnowledgeBase(KNOWLEDGE_STORE_PATH)
+        except sqlite3.Error as e:
+            logger.error(f"Failed to open knowledge base store, using memory: {str(e)}")
+    return MemoryKnowledgeBase()
+
+def format_context(results):
+    """Render retrieved insights as prompt lines."""
+    return "\n".join(
+        f"- {insight.analyte} ({'similar' if similar else 'other'} patient profile): {insight.text}"
+        for insight, similar in results
+    )
@@ -1,8 +1,13 @@
-import groq
-import streamlit as st
 from enum import Enum
+from itertools import chain
 import logging
 import time
+from agents.analysis_cache import get_analysis_cache
+from config.app_config import ANALYSIS_CACHE_ENABLED
+from services.clients import get_groq_client
+from agents.tier_health import get_tier_health_registry, rate_limit_info
+from utils.metrics import record_token_usage, span
+from utils.prompt_compactor import estimate_tokens, fit_to_budget, serialize_report_data
 
 logger = logging.getLogger(__name__)
 
@@ -12,10 +17,11 @@ class ModelTier(Enum):
     TERTIARY = "tertiary"
     FALLBACK = "fallback"
 
-class ModelManager:
+class BaseModelManager:
     """
-    Manages AI model selection, fallback, and rate limits.
-    Implements an agent-based approach for model management.
+    Model tiers, response cache and tier health shared by the sequential and
+    the hedged model managers, so both skip the same unhealthy tiers, serve
+    the same cached analyses and report the same routing trail.
     """
     
     MODEL_CONFIG = {
@@ -23,57 +29,189 @@ class ModelManager:
             "provider": "groq",
             "model": "meta-llama/llama-4-maverick-17b-128e-instruct",
             "max_tokens": 2000,
-            "temperature": 0.7
+            "temperature": 0.7,
+            "input_token_budget": 6000
         },
         ModelTier.SECONDARY: {
             "provider": "groq", 
             "model": "llama-3.3-70b-versatile",
             "max_tokens": 2000,
-            "temperature": 0.7
+            "temperature": 0.7,
+            "input_token_budget": 6000
         },
         ModelTier.TERTIARY: {
             "provider": "groq",
             "model": "llama-3.1-8b-instant",
             "max_tokens": 2000, 
-            "temperature": 0.7
+            "temperature": 0.7,
+            "input_token_budget": 4000
         },
         ModelTier.FALLBACK: {
             "provider": "groq",
             "model": "llama3-70b-8192",
             "max_tokens": 2000,
-            "temperature": 0.7
+            "temperature": 0.7,
+            "input_token_budget": 4000
         }
     }
     
-    def __init__(self):
-        self.clients = {}
-        self._initialize_clients()
+    TIER_ORDER = [ModelTier.PRIMARY, ModelTier.SECONDARY, ModelTier.TERTIARY, ModelTier.FALLBACK]
+    
+    def __init__(self, health=None, cache=None):
+        """
+        Args:
+            health: Tier health registry; the process-wide one when None
+            cache: Analysis cache; the shared one when None (if enabled), or
+                False to disable caching, e.g. in benchmarks and tests
+        """
+        self.health = health or get_tier_health_registry()
+        if cache is None:
+            cache = get_analysis_cache() if ANALYSIS_CACHE_ENABLED else False
+        self.cache = cache or None
+
+    @staticmethod
+    def build_messages(data, system_prompt, model_config):
+        """
+        Serialize data compactly, trim it to the tier's input token budget and
+        return the chat messages with their estimated token count.
+        """
+        budget = model_config["input_token_budget"] - estimate_tokens(system_prompt)
+        user_content = fit_to_budget(serialize_report_data(data), budget)
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_content}
+        ]
+        return messages, estimate_tokens(system_prompt) + estimate_tokens(user_content)
+
+    def _skip_reason(self, tier):
+        """
+        Why a tier should be skipped, or None when it may be tried. Tiers
+        whose circuit breaker is open or that are cooling down after a rate
+        limit are skipped instead of paying their latency again.
+        """
+        health = self.health.get(tier)
+        if health.allow_request():
+            return None
+        snapshot = health.snapshot()
+        reason = "rate limit cooldown" if snapshot["cooldown_remaining"] > 0 else f"circuit {snapshot['state']}"
+        logger.info(f"Skipping {tier.value} tier: {reason}")
+        return reason
+
+    def _cache_key(self, data, system_prompt, model):
+        if not self.cache:
+            return None
+        return self.cache.make_key(data, system_prompt, model)
+
+    def _get_cached(self, data, system_prompt, stream):
+        """Return a cached result for the first tier model that has one."""
+        if not self.cache:
+            return None
+        for tier in self.TIER_ORDER:
+            model_config = self.MODEL_CONFIG[tier]
+            try:
+                hit = self.cache.get(self._cache_key(data, system_prompt, model_config["model"]))
+            except Exception as e:
+                logger.warning(f"Analysis cache lookup failed: {str(e)}")
+                return None
+            if hit:
+                content, model_used = hit
+                logger.info(f"Serving cached analysis from {model_used}")
+                result = {
+                    "success": True,
+                    "model_used": model_used,
+                    "model_tier": tier.value,
+                    "routing": "cache",
+                    "cached": True
+                }
+                if stream:
+                    result["stream"] = iter([content])
+                else:
+                    result["content"] = content
+                return result
+        return None
+
+    def _store_cached(self, cache_key, content, model_used):
+        if not self.cache or not cache_key or not content:
+            return
+        try:
+            self.cache.put(cache_key, content, model_used)
+        except Exception as e:
+            logger.warning(f"Analysis cache store failed: {str(e)}")
+
+    def _cache_stream(self, chunks, cache_key, model_used):
+        """Pass streamed chunks through and cache the full content at the end."""
+        collected = []
+        for chunk in chunks:
+            collected.append(chunk)
+            yield chunk
+        self._store_cached(cache_key, "".join(collected), model_used)
+
+    @staticmethod
+    def _stream_content(first_chunk, chunks, model=None):
+        """Yield the text content of streamed completion chunks."""
+        if first_chunk is None:
+            return
+        for chunk in chain((first_chunk,), chunks):
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+            # Groq reports the token usage on the last chunk of a stream
+            usage = getattr(getattr(chunk, "x_groq", None), "usage", None)
+            if usage:
+                record_token_usage(model, usage)
+
+class ModelManager(BaseModelManager):
+    """
+    Manages AI model selection, fallback, and rate limits.
+    Implements an agent-based approach for model management.
+    """
+    
+    def __init__(self, clients=None, health=None, cache=None):
+        """
+        Args:
+            clients: {provider: client}; the process-wide clients when None
+            health: Tier health registry; the process-wide one when None
+            cache: Analysis cache; the shared one when None (if enabled), or
+                False to disable caching, e.g. in benchmarks and tests
+        """
+        super().__init__(health, cache)
+        self.clients = dict(clients) if clients else {}
+        if not clients:
+            self._initialize_clients()
 
     def _initialize_clients(self):
-        """Initialize API clients for each provider."""
+        """Attach the process-wide API clients for each provider."""
         try:
-            self.clients["groq"] = groq.Groq(api_key=st.secrets["GROQ_API_KEY"])
+            self.clients["groq"] = get_groq_client()
         except Exception as e:
             logger.error(f"Failed to initialize Groq client: {str(e)}")
 
-    def generate_analysis(self, data, system_prompt, retry_count=0):
+    def generate_analysis(self, data, system_prompt, retry_count=0, stream=False, routing=None):
         """
         Generate analysis using the best available model with automatic fallback.
         Implements agent-based decision making for model selection.
+        
+        Tiers whose circuit breaker is open or that are cooling down after a
+        rate limit are skipped; the path taken is reported in "routing".
+        
+        With stream=True the result holds a "stream" generator of content
+        chunks instead of "content". Fallback only happens before the first
+        chunk arrives.
         """
+        if retry_count == 0 and routing is None:
+            cached = self._get_cached(data, system_prompt, stream)
+            if cached:
+                return cached
+        
+        routing = routing if routing is not None else []
         if retry_count > 3:
-            return {"success": False, "error": "All models failed after multiple retries"}
+            return {
+                "success": False,
+                "error": "All models failed after multiple retries",
+                "routing": " -> ".join(routing)
+            }
 
         # Determine which model tier to use based on retry count
-        if retry_count == 0:
-            tier = ModelTier.PRIMARY
-        elif retry_count == 1:
-            tier = ModelTier.SECONDARY
-        elif retry_count == 2:
-            tier = ModelTier.TERTIARY
-        else:
-            tier = ModelTier.FALLBACK
-            
+        tier = self.TIER_ORDER[retry_count]
         model_config = self.MODEL_CONFIG[tier]
         provider = model_config["provider"]
         model = model_config["model"]
@@ -81,39 +219,73 @@ class ModelManager:
         # Check if we have a client for this provider
         if provider not in self.clients:
             logger.error(f"No client available for provider: {provider}")
-            return self.generate_analysis(data, system_prompt, retry_count + 1)
-            
-        try:
-            client = self.clients[provider]
-            logger.info(f"Attempting generation with {provider} model: {model}")
+            routing.append(f"{tier.value} unavailable")
+            return self.generate_analysis(data, system_prompt, retry_count + 1, stream, routing)
+        
+        # Skip tiers that are known to be failing instead of paying their latency again
+        reason = self._skip_reason(tier)
+        if reason:
+            routing.append(f"{tier.value} skipped ({reason})")
+            return self.generate_analysis(data, system_prompt, retry_count + 1, stream, routing)
+        health = self.health.get(tier)
             
-            if provider == "groq":
-                completion = client.chat.completions.create(
-                    model=model,
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": str(data)}
-                    ],
-                    temperature=model_config["temperature"],
-                    max_tokens=model_config["max_tokens"]
-                )
+        # Each tier attempt is timed on its own; fallback happens outside the span
+        failed = False
+        with span("model_tier_attempt", tier=tier.value, model=model) as timer:
+            started = time.perf_counter()
+            try:
+                client = self.clients[provider]
+                logger.info(f"Attempting generation with {provider} model: {model}")
                 
-                return {
-                    "success": True,
-                    "content": completion.choices[0].message.content,
-                    "model_used": f"{provider}/{model}"
-                }
+                messages, prompt_tokens = self.build_messages(data, system_prompt, model_config)
                 
-        except Exception as e:
-            error_message = str(e).lower()
-            logger.warning(f"Model {model} failed: {error_message}")
-            
-            # Check for rate limit errors
-            if "rate limit" in error_message or "quota" in error_message:
-                # Wait briefly before retrying with a different model
-                time.sleep(2)
-            
+                if provider == "groq":
+                    completion = client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        temperature=model_config["temperature"],
+                        max_tokens=model_config["max_tokens"],
+                        stream=stream
+                    )
+                    
+                    result = {
+                        "success": True,
+                        "model_used": f"{provider}/{model}",
+                        "model_tier": tier.value,
+                        "prompt_tokens_estimate": prompt_tokens
+                    }
+                    cache_key = self._cache_key(data, system_prompt, model)
+                    if stream:
+                        # Wait for the first chunk so errors still trigger fallback
+                        chunks = iter(completion)
+                        first_chunk = next(chunks, None)
+                        result["stream"] = self._cache_stream(
+                            self._stream_content(first_chunk, chunks, model),
+                            cache_key, result["model_used"]
+                        )
+                    else:
+                        result["content"] = completion.choices[0].message.content
+                        record_token_usage(model, getattr(completion, "usage", None))
+                        self._store_cached(cache_key, result["content"], result["model_used"])
+                    
+                    health.record_success(time.perf_counter() - started)
+                    routing.append(tier.value)
+                    result["routing"] = " -> ".join(routing)
+                    return result
+                    
+            except Exception as e:
+                error_message = str(e).lower()
+                logger.warning(f"Model {model} failed: {error_message}")
+                
+                # Rate limited tiers cool down for the window the API asked for
+                rate_limited, retry_after = rate_limit_info(e)
+                health.record_failure(time.perf_counter() - started, retry_after, rate_limited)
+                routing.append(f"{tier.value} failed")
+                timer.set(outcome="rate_limited" if rate_limited else "error")
+                failed = True
+        
+        if failed:
             # Try next model in hierarchy
-            return self.generate_analysis(data, system_prompt, retry_count + 1)
+            return self.generate_analysis(data, system_prompt, retry_count + 1, stream, routing)
             
         return {"success": False, "error": "Analysis failed with all available models"}
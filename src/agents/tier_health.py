@@ -0,0 +1,168 @@
+import re
+import threading
+import time
+from collections import deque
+from enum import Enum
+import streamlit as st
+
+class CircuitState(Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+class TierHealth:
+    """
+    Rolling health statistics and circuit breaker for a single model tier.
+    The breaker opens after repeated failures or a high error rate, lets a
+    single probe through once the open window has passed, and closes again
+    when that probe succeeds.
+    """
+
+    WINDOW = 50
+    MIN_SAMPLES = 5
+    ERROR_RATE_THRESHOLD = 0.5
+    CONSECUTIVE_FAILURE_THRESHOLD = 3
+    OPEN_SECONDS = 30.0
+    DEFAULT_RATE_LIMIT_COOLDOWN = 10.0
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=self.WINDOW)
+        self._latencies = deque(maxlen=self.WINDOW)
+        self.consecutive_failures = 0
+        self.state = CircuitState.CLOSED
+        self.opened_at = 0.0
+        self.cooldown_until = 0.0
+        self._probe_in_flight = False
+
+    def allow_request(self, now=None):
+        """Return True if a request may be sent to this tier now."""
+        now = now or time.monotonic()
+        with self._lock:
+            if now < self.cooldown_until:
+                return False
+            if self.state == CircuitState.CLOSED:
+                return True
+            if self.state == CircuitState.OPEN and now - self.opened_at >= self.OPEN_SECONDS:
+                self.state = CircuitState.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == CircuitState.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def release_probe(self):
+        """Give up a half-open probe slot without recording an outcome."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_success(self, latency):
+        with self._lock:
+            self._outcomes.append(True)
+            self._latencies.append(latency)
+            self.consecutive_failures = 0
+            self.state = CircuitState.CLOSED
+            self._probe_in_flight = False
+
+    def record_failure(self, latency=None, retry_after=None, rate_limited=False):
+        with self._lock:
+            self._outcomes.append(False)
+            if latency is not None:
+                self._latencies.append(latency)
+            self.consecutive_failures += 1
+            now = time.monotonic()
+            if rate_limited:
+                cooldown = retry_after if retry_after is not None else self.DEFAULT_RATE_LIMIT_COOLDOWN
+                self.cooldown_until = max(self.cooldown_until, now + cooldown)
+            if self.state == CircuitState.HALF_OPEN or self._should_trip():
+                self.state = CircuitState.OPEN
+                self.opened_at = now
+            self._probe_in_flight = False
+
+    def _should_trip(self):
+        if self.consecutive_failures >= self.CONSECUTIVE_FAILURE_THRESHOLD:
+            return True
+        if len(self._outcomes) < self.MIN_SAMPLES:
+            return False
+        return self._error_rate() >= self.ERROR_RATE_THRESHOLD
+
+    def _error_rate(self):
+        if not self._outcomes:
+            return 0.0
+        return self._outcomes.count(False) / len(self._outcomes)
+
+    def _percentile(self, percentile):
+        if not self._latencies:
+            return None
+        samples = sorted(self._latencies)
+        return samples[min(len(samples) - 1, int(len(samples) * percentile))]
+
+    def snapshot(self):
+        """Return a dict of the tier's current health for display and logging."""
+        with self._lock:
+            return {
+                "state": self.state.value,
+                "error_rate": self._error_rate(),
+                "samples": len(self._outcomes),
+                "p50_latency": self._percentile(0.5),
+                "p95_latency": self._percentile(0.95),
+                "cooldown_remaining": max(0.0, self.cooldown_until - time.monotonic())
+            }
+
+class TierHealthRegistry:
+    """Health state for every model tier, shared by all sessions in the process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tiers = {}
+
+    def get(self, tier):
+        with self._lock:
+            if tier not in self._tiers:
+                self._tiers[tier] = TierHealth()
+            return self._tiers[tier]
+
+    def snapshot(self):
+        with self._lock:
+            tiers = dict(self._tiers)
+        return {getattr(tier, "value", tier): health.snapshot() for tier, health in tiers.items()}
+
+@st.cache_resource
+def get_tier_health_registry():
+    """Process-wide tier health registry."""
+    return TierHealthRegistry()
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+def _parse_duration(value):
+    """Parse Retry-After style values: plain seconds or Groq's '1m2.5s' form."""
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    scale = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    return sum(float(amount) * scale[unit] for amount, unit in parts)
+
+def rate_limit_info(error):
+    """
+    Return (is_rate_limited, retry_after_seconds) for a failed model call,
+    reading the cooldown from the error's response headers when present.
+    """
+    message = str(error).lower()
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    rate_limited = status == 429 or "rate limit" in message or "quota" in message
+    if not rate_limited:
+        return False, None
+
+    headers = getattr(response, "headers", None) or {}
+    for header in ("retry-after", "x-ratelimit-reset-requests", "x-ratelimit-reset-tokens"):
+        if header in headers:
+            retry_after = _parse_duration(headers[header])
+            if retry_after is not None:
+                return True, retry_after
+    return True, None
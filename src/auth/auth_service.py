@@ -1,24 +1,44 @@
 import streamlit as st
-from st_supabase_connection import SupabaseConnection
+from auth.message_cache import MessageCache
+from auth.message_writer import MessageWriter, get_message_writer
+from services.chat_store import get_chat_store
+from services.clients import get_supabase_connection
+from utils.metrics import span
+from config.app_config import (
+    AUTH_EXPIRY_MARGIN_SECONDS, AUTH_REVALIDATE_SECONDS, SESSION_DELETE_BATCH_SIZE,
+    USER_DATA_CACHE_SECONDS
+)
 from datetime import datetime
+import base64
+import json
+import logging
+import threading
 import time
 import re
+import uuid
+
+logger = logging.getLogger(__name__)
 
 class AuthService:
-    def __init__(self):
+    def __init__(self, store=None):
+        """
+        Args:
+            store: Chat data store; the shared configured store when None
+        """
+        self._user_data_cache = {}
+        self.message_cache = MessageCache()
+        self._unsynced_sessions = set()
+        # Analysis workers save their answers from their own threads
+        self._unsynced_lock = threading.Lock()
         try:
-            # Custom connection parameters
-            self.supabase = st.connection(
-                "supabase",
-                type=SupabaseConnection,
-                ttl=None,
-                url=st.secrets["SUPABASE_URL"],
-                key=st.secrets["SUPABASE_KEY"],
-                client_options={
-                    "timeout": 30,  # 30 seconds timeout
-                    "retries": 3,   # 3 retries
-                }
-            )
+            # Shared, process-wide connection for Supabase Auth
+            self.supabase = get_supabase_connection()
+            if store is None:
+                self.store = get_chat_store()
+                self.message_writer = get_message_writer()
+            else:
+                self.store = store
+                self.message_writer = MessageWriter(store)
         except Exception as e:
             st.error(f"Failed to initialize services: {str(e)}")
             raise e
@@ -36,25 +56,23 @@ class AuthService:
     def check_existing_user(self, email):
         """Check if user already exists."""
         try:
-            result = self.supabase.table('users')\
-                .select('id')\
-                .eq('email', email)\
-                .execute()
-            return len(result.data) > 0
+            with span("auth_query", query="user_exists"):
+                return self.store.user_exists(email)
         except Exception:
             return False
 
     def sign_up(self, email, password, name):
         try:
-            auth_response = self.supabase.client.auth.sign_up({
-                "email": email,
-                "password": password,
-                "options": {
-                    "data": {
-                        "name": name
+            with span("auth_query", query="sign_up"):
+                auth_response = self.supabase.client.auth.sign_up({
+                    "email": email,
+                    "password": password,
+                    "options": {
+                        "data": {
+                            "name": name
+                        }
                     }
-                }
-            })
+                })
             
             if not auth_response.user:
                 return False, "Failed to create user account"
@@ -67,7 +85,8 @@ class AuthService:
             }
             
             # Insert user data into users table
-            self.supabase.table('users').insert(user_data).execute()
+            with span("auth_query", query="insert_user"):
+                self.store.insert_user(user_data)
             
             return True, user_data
                 
@@ -82,14 +101,15 @@ class AuthService:
             # Clear any existing session data first
             self.sign_out()
             
-            auth_response = self.supabase.client.auth.sign_in_with_password({
-                "email": email,
-                "password": password
-            })
+            with span("auth_query", query="sign_in"):
+                auth_response = self.supabase.client.auth.sign_in_with_password({
+                    "email": email,
+                    "password": password
+                })
             
             if auth_response and auth_response.user:
                 # Get user data
-                user_data = self.get_user_data(auth_response.user.id)
+                user_data = self.get_user_data(auth_response.user.id, use_cache=False)
                 if not user_data:
                     return False, "User data not found"
                     
@@ -104,8 +124,12 @@ class AuthService:
     
     def sign_out(self):
         """Sign out and clear all session data."""
+        self.flush_messages()
+        self._user_data_cache.clear()
+        self.message_cache.invalidate()
         try:
-            self.supabase.client.auth.sign_out()
+            with span("auth_query", query="sign_out"):
+                self.supabase.client.auth.sign_out()
             from auth.session_manager import SessionManager
             SessionManager.clear_session_state()
             return True, None
@@ -114,7 +138,8 @@ class AuthService:
     
     def get_user(self):
         try:
-            return self.supabase.client.auth.get_user()
+            with span("auth_query", query="get_user"):
+                return self.supabase.client.auth.get_user()
         except Exception:
             return None
 
@@ -128,74 +153,162 @@ class AuthService:
                 'title': title or default_title,
                 'created_at': current_time.isoformat()
             }
-            result = self.supabase.table('chat_sessions').insert(session_data).execute()
-            if result.data and isinstance(result.data, list) and len(result.data) > 0:
-                print("Insert succeeded but returned no data. Raw result:", result)
-                st.write("Insert succeeded but returned no data. Raw result:",result)
-
-                return True, result.data[0]
-            else:
+            with span("auth_query", query="create_session"):
+                session = self.store.create_session(session_data)
+            if not session:
+                logger.error(f"Session insert succeeded but returned no data. Raw result: {session!r}")
                 return False, "Session insert succeeded but returned no data"
+            return True, session
         except Exception as e:
             return False, str(e)
 
-    def get_user_sessions(self, user_id):
+    def get_user_sessions(self, user_id, limit=None, before=None):
+        """
+        Get a user's sessions, newest first.
+        With limit, returns one keyset page; pass the (created_at, id) of the
+        last session of the previous page as before to get the next one.
+        """
         try:
-            result = self.supabase.table('chat_sessions')\
-                .select('*')\
-                .eq('user_id', user_id)\
-                .order('created_at', desc=True)\
-                .execute()
-            return True, result.data
+            with span("auth_query", query="list_sessions"):
+                return True, self.store.list_sessions(user_id, limit=limit, before=before)
         except Exception as e:
             st.error(f"Error fetching sessions: {str(e)}")
             return False, []
 
     def save_chat_message(self, session_id, content, role='user'):
+        """
+        Save a message without waiting for the database. The message is
+        added to the cache right away and written by the shared message
+        writer in the background; flush_messages waits for the write.
+        """
         try:
             message_data = {
+                'id': str(uuid.uuid4()),
                 'session_id': session_id,
                 'content': content,
                 'role': role,
                 'created_at': datetime.now().isoformat()
             }
-            result = self.supabase.table('chat_messages').insert(message_data).execute()
-            return True, result.data[0] if result.data else None
+            self.message_writer.submit(message_data)
+            with self._unsynced_lock:
+                self._unsynced_sessions.add(session_id)
+            self.message_cache.extend(session_id, [dict(message_data)])
+            return True, message_data
         except Exception as e:
             return False, str(e)
 
+    def flush_messages(self, session_id=None):
+        """
+        Wait until this service's queued messages, or one session's, are
+        written. Returns False if the flush timed out.
+        """
+        with self._unsynced_lock:
+            session_ids = {session_id} if session_id else set(self._unsynced_sessions)
+            if not session_ids or not self._unsynced_sessions & session_ids:
+                return True
+        flushed = self.message_writer.flush(session_ids)
+        if flushed:
+            with self._unsynced_lock:
+                self._unsynced_sessions -= session_ids
+        return flushed
+
     def get_session_messages(self, session_id):
+        """
+        Get a session's messages. The full history is fetched once, later
+        calls only fetch messages newer than the last one seen.
+        """
         try:
-            result = self.supabase.table('chat_messages')\
-                .select('*')\
-                .eq('session_id', session_id)\
-                .order('created_at')\
-                .execute()
-            return True, result.data
+            cached = self.message_cache.has(session_id)
+            after = self.message_cache.last_seen(session_id) if cached else None
+            with span("auth_query", query="get_messages", incremental=cached):
+                messages = self.store.get_messages(session_id, after=after)
+
+            if cached:
+                self.message_cache.extend(session_id, messages)
+            else:
+                self.message_cache.load(session_id, messages)
+                # Messages still queued for writing are not in the result yet
+                self.message_cache.extend(session_id, self.message_writer.pending(session_id))
+            return True, self.message_cache.get(session_id)
         except Exception as e:
             return False, str(e)
 
     def delete_session(self, session_id):
+        """Delete a session and its messages in a single transactional call."""
         try:
-            messages_delete = self.supabase.table('chat_messages')\
-                .delete()\
-                .eq('session_id', session_id)\
-                .execute()
-
-            session_delete = self.supabase.table('chat_sessions')\
-                .delete()\
-                .eq('id', session_id)\
-                .execute()
+            self.message_writer.discard([session_id])
+            with self._unsynced_lock:
+                self._unsynced_sessions.discard(session_id)
+            with span("auth_query", query="delete_sessions"):
+                self.store.delete_sessions([session_id])
 
+            self.message_cache.invalidate(session_id)
             return True, None
         except Exception as e:
             st.error(f"Failed to delete session: {str(e)}")
             return False, str(e)
+
+    def delete_sessions(self, session_ids):
+        """
+        Delete many sessions and their messages, one transactional call per
+        SESSION_DELETE_BATCH_SIZE sessions. Returns (success, deleted count).
+        """
+        deleted = 0
+        try:
+            session_ids = list(session_ids)
+            for start in range(0, len(session_ids), SESSION_DELETE_BATCH_SIZE):
+                batch = session_ids[start:start + SESSION_DELETE_BATCH_SIZE]
+                self.message_writer.discard(batch)
+                with self._unsynced_lock:
+                    self._unsynced_sessions.difference_update(batch)
+                with span("auth_query", query="delete_sessions"):
+                    deleted += self.store.delete_sessions(batch)
+                for session_id in batch:
+                    self.message_cache.invalidate(session_id)
+            return True, deleted
+        except Exception as e:
+            return False, str(e)
     
-    def validate_session_token(self):
-        """Validate existing session token on startup."""
+    @staticmethod
+    def decode_token_expiry(token):
+        """Read the exp claim from a JWT without verifying it, or None."""
+        try:
+            payload = token.split('.')[1]
+            payload += '=' * (-len(payload) % 4)
+            claims = json.loads(base64.urlsafe_b64decode(payload))
+            return float(claims['exp'])
+        except Exception:
+            return None
+
+    def _cached_validation(self):
+        """Return the cached user if the last remote validation is still fresh."""
+        token = st.session_state.get('auth_token')
+        validated = st.session_state.get('auth_validation')
+        if not token or not validated or validated['token'] != token:
+            return None
+
+        now = time.time()
+        if now - validated['at'] > AUTH_REVALIDATE_SECONDS:
+            return None
+        expires_at = validated['expires_at']
+        if expires_at is None or expires_at - now <= AUTH_EXPIRY_MARGIN_SECONDS:
+            return None
+        return st.session_state.get('user')
+
+    def validate_session_token(self, force=False):
+        """
+        Validate the stored session token.
+        The JWT expiry is checked locally and Supabase is only asked again
+        after AUTH_REVALIDATE_SECONDS or when the token is about to expire.
+        """
+        if not force:
+            cached_user = self._cached_validation()
+            if cached_user:
+                return cached_user
+
         try:
-            session = self.supabase.client.auth.get_session()
+            with span("auth_query", query="get_session"):
+                session = self.supabase.client.auth.get_session()
             if not session or not session.access_token:
                 return None
                 
@@ -203,22 +316,32 @@ class AuthService:
             if session.access_token != st.session_state.get('auth_token'):
                 return None
                 
-            user = self.supabase.client.auth.get_user()
+            with span("auth_query", query="get_user"):
+                user = self.supabase.client.auth.get_user()
             if not user or not user.user:
                 return None
                 
-            return self.get_user_data(user.user.id)
+            user_data = self.get_user_data(user.user.id)
+            if user_data:
+                st.session_state.auth_validation = {
+                    'token': session.access_token,
+                    'at': time.time(),
+                    'expires_at': self.decode_token_expiry(session.access_token)
+                }
+            return user_data
         except Exception:
             return None
     
-    def get_user_data(self, user_id):
+    def get_user_data(self, user_id, use_cache=True):
         """Get user data from database."""
+        cached = self._user_data_cache.get(user_id)
+        if use_cache and cached and time.time() - cached[1] < USER_DATA_CACHE_SECONDS:
+            return cached[0]
         try:
-            response = self.supabase.table('users')\
-                .select('*')\
-                .eq('id', user_id)\
-                .single()\
-                .execute()
-            return response.data if response else None
+            with span("auth_query", query="get_user_data"):
+                user_data = self.store.get_user(user_id)
+            if user_data:
+                self._user_data_cache[user_id] = (user_data, time.time())
+            return user_data
         except Exception:
             return None
@@ -0,0 +1,60 @@
+import threading
+
+class MessageCache:
+    """
+    Per-browser-session cache of chat messages.
+    History is loaded once per chat session; afterwards only rows newer
+    than the last seen created_at are fetched and appended. Analysis
+    workers append their answers from their own threads, so every
+    access is locked.
+    """
+
+    def __init__(self):
+        self._sessions = {}
+        self._lock = threading.RLock()
+
+    def has(self, session_id):
+        with self._lock:
+            return session_id in self._sessions
+
+    def last_seen(self, session_id):
+        """Return the created_at of the newest cached message, or None."""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            return entry["last_seen"] if entry else None
+
+    def get(self, session_id):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            return list(entry["messages"]) if entry else None
+
+    def load(self, session_id, messages):
+        """Replace the cached history of a session."""
+        with self._lock:
+            self._sessions[session_id] = {"messages": [], "ids": set(), "last_seen": None}
+            self.extend(session_id, messages)
+
+    def extend(self, session_id, messages):
+        """Append messages not already cached, keeping created_at order."""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return
+            for message in messages:
+                message_id = message.get("id")
+                if message_id is not None and message_id in entry["ids"]:
+                    continue
+                if message_id is not None:
+                    entry["ids"].add(message_id)
+                entry["messages"].append(message)
+                created_at = message.get("created_at")
+                if created_at and (entry["last_seen"] is None or created_at > entry["last_seen"]):
+                    entry["last_seen"] = created_at
+
+    def invalidate(self, session_id=None):
+        """Drop one session's history, or every session's when session_id is None."""
+        with self._lock:
+            if session_id is None:
+                self._sessions.clear()
+            else:
+                self._sessions.pop(session_id, None)
@@ -0,0 +1,203 @@
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+import streamlit as st
+from config.app_config import (
+    MESSAGE_FLUSH_TIMEOUT_SECONDS, MESSAGE_WRITE_BATCH_SIZE, MESSAGE_WRITE_LINGER_SECONDS,
+    MESSAGE_WRITE_MAX_RETRIES, MESSAGE_WRITE_RETRY_SECONDS
+)
+from services.chat_store import get_chat_store
+from utils.metrics import span
+
+logger = logging.getLogger(__name__)
+
+class MessageWriter:
+    """
+    Write-behind buffer for chat messages.
+
+    Messages are queued by the script thread and written by a background
+    thread in multi-row inserts of up to `batch_size` rows, so saving a
+    message costs no round trip on the caller's side. Rows are written in
+    submission order; a failed write is put back at the front of the queue
+    and retried with exponential backoff, so a session's messages never
+    overtake each other. Rows carry their primary key and are written with
+    ON CONFLICT DO NOTHING, which makes retries after a lost response safe.
+    """
+
+    def __init__(self, store, batch_size=MESSAGE_WRITE_BATCH_SIZE,
+                 linger_seconds=MESSAGE_WRITE_LINGER_SECONDS,
+                 max_retries=MESSAGE_WRITE_MAX_RETRIES,
+                 retry_seconds=MESSAGE_WRITE_RETRY_SECONDS):
+        self.store = store
+        self.batch_size = batch_size
+        self.linger_seconds = linger_seconds
+        self.max_retries = max_retries
+        self.retry_seconds = retry_seconds
+        self._queue = deque()
+        self._in_flight = []
+        self._attempts = {}
+        self._retry_at = {}
+        self._flushing = 0
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="message-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush, timeout=MESSAGE_FLUSH_TIMEOUT_SECONDS)
+
+    def submit(self, message):
+        """Queue a message row for writing."""
+        with self._cond:
+            self._queue.append(message)
+            self._cond.notify_all()
+
+    def pending(self, session_id):
+        """Messages of a session that are not written yet, oldest first."""
+        with self._cond:
+            return [
+                dict(message) for message in (*self._in_flight, *self._queue)
+                if message['session_id'] == session_id
+            ]
+
+    def discard(self, session_ids):
+        """
+        Drop the queued messages of sessions that are being deleted and wait
+        for any of their rows already being written.
+        """
+        session_ids = set(session_ids)
+        with self._cond:
+            self._queue = deque(
+                message for message in self._queue if message['session_id'] not in session_ids
+            )
+        self.flush(session_ids)
+
+    def flush(self, session_ids=None, timeout=MESSAGE_FLUSH_TIMEOUT_SECONDS):
+        """
+        Block until the messages of `session_ids` (every message when None)
+        are written or dropped. Returns False if the timeout expired first.
+        """
+        if session_ids is not None:
+            session_ids = set(session_ids)
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._flushing += 1
+            self._cond.notify_all()
+            try:
+                while self._has_pending(session_ids):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        logger.warning("Timed out flushing chat messages")
+                        return False
+                    self._cond.wait(remaining)
+                return True
+            finally:
+                self._flushing -= 1
+
+    def _has_pending(self, session_ids):
+        messages = (*self._in_flight, *self._queue)
+        if session_ids is None:
+            return bool(messages)
+        return any(message['session_id'] in session_ids for message in messages)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                batch = self._next_batch()
+                while not batch:
+                    self._cond.wait(self._next_retry())
+                    batch = self._next_batch()
+                self._in_flight = batch
+
+            failed = self._write(batch)
+
+            with self._cond:
+                failed_ids = {message['id'] for message in failed}
+                retry = []
+                for message in batch:
+                    if message['id'] not in failed_ids:
+                        self._attempts.pop(message['id'], None)
+                        continue
+                    attempts = self._attempts.pop(message['id'], 0) + 1
+                    if attempts > self.max_retries:
+                        logger.error(
+                            f"Dropping chat message {message['id']} of session "
+                            f"{message['session_id']} after {attempts} failed writes"
+                        )
+                        continue
+                    self._attempts[message['id']] = attempts
+                    retry.append(message)
+                    # Back off this session only, the others keep flowing
+                    self._retry_at[message['session_id']] = (
+                        time.monotonic() + self.retry_seconds * 2 ** (attempts - 1)
+                    )
+                self._queue.extendleft(reversed(retry))
+                self._in_flight = []
+                self._cond.notify_all()
+
+    def _next_batch(self):
+        """
+        Take up to batch_size queued messages, in order, from sessions that
+        are not backing off. Waits up to linger_seconds for a batch to fill
+        unless a flush is waiting. Called with the lock held.
+        """
+        if not self._queue:
+            return []
+        deadline = time.monotonic() + self.linger_seconds
+        while len(self._queue) < self.batch_size and not self._flushing:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self._cond.wait(remaining)
+
+        now = time.monotonic()
+        self._retry_at = {
+            session_id: retry_at for session_id, retry_at in self._retry_at.items()
+            if retry_at > now
+        }
+        batch, kept = [], deque()
+        for message in self._queue:
+            if len(batch) < self.batch_size and message['session_id'] not in self._retry_at:
+                batch.append(message)
+            else:
+                kept.append(message)
+        self._queue = kept
+        return batch
+
+    def _next_retry(self):
+        """Seconds until the earliest session backoff ends, or None."""
+        if not self._queue or not self._retry_at:
+            return None
+        return max(0.0, min(self._retry_at.values()) - time.monotonic())
+
+    def _write(self, batch):
+        """Insert a batch, returning the rows that could not be written."""
+        try:
+            self._insert(batch)
+            return []
+        except Exception as e:
+            logger.warning(f"Failed to write {len(batch)} chat messages: {str(e)}")
+
+        # One bad session (e.g. deleted meanwhile) must not hold back the others
+        sessions = {}
+        for message in batch:
+            sessions.setdefault(message['session_id'], []).append(message)
+        if len(sessions) == 1:
+            return batch
+        failed = []
+        for session_id, messages in sessions.items():
+            try:
+                self._insert(messages)
+            except Exception as e:
+                logger.warning(f"Failed to write chat messages of session {session_id}: {str(e)}")
+                failed.extend(messages)
+        return failed
+
+    def _insert(self, messages):
+        # Timed with AuthService's queries, whose message inserts happen here
+        with span("auth_query", query="insert_messages"):
+            self.store.insert_messages(messages)
+
+@st.cache_resource
+def get_message_writer():
+    """Chat message writer shared by every session in the process."""
+    return MessageWriter(get_chat_store())
@@ -1,9 +1,11 @@
 import streamlit as st
 from datetime import datetime, timedelta
 from config.app_config import SESSION_TIMEOUT_MINUTES
+from utils.metrics import timed
 
 class SessionManager:
     @staticmethod
+    @timed("init_session")
     def init_session():
         """Initialize or validate session."""
         # Clear all session state if it's a new browser session
@@ -62,16 +64,28 @@ class SessionManager:
             return False, "Missing auth service"
         
         success, session = auth_service.create_session(st.session_state.user['id'])
+        if success and st.session_state.get('session_list'):
+            # Newest first, so the new session goes to the top of the loaded pages
+            st.session_state.session_list['items'].insert(0, session)
         
         return success, session
     
     @staticmethod
-    def get_user_sessions():
-        """Get user's chat sessions."""
+    def switch_session(session):
+        """Make `session` current, first writing the previous session's queued messages."""
+        current = st.session_state.get('current_session')
+        if isinstance(current, dict) and 'auth_service' in st.session_state:
+            if not isinstance(session, dict) or session.get('id') != current.get('id'):
+                st.session_state.auth_service.flush_messages(current.get('id'))
+        st.session_state.current_session = session
+    
+    @staticmethod
+    def get_user_sessions(limit=None, before=None):
+        """Get user's chat sessions, optionally one keyset page at a time."""
         if not SessionManager.is_authenticated():
             return False, []
         return st.session_state.auth_service.get_user_sessions(
-            st.session_state.user['id']
+            st.session_state.user['id'], limit=limit, before=before
         )
     
     @staticmethod
@@ -79,7 +93,23 @@ class SessionManager:
         """Delete a chat session."""
         if not SessionManager.is_authenticated():
             return False, "Not authenticated"
-        return st.session_state.auth_service.delete_session(session_id)
+        success, error = st.session_state.auth_service.delete_session(session_id)
+        if success and st.session_state.get('session_list'):
+            items = st.session_state.session_list['items']
+            items[:] = [s for s in items if s.get('id') != session_id]
+        return success, error
+    
+    @staticmethod
+    def delete_sessions(session_ids):
+        """Delete many chat sessions at once."""
+        if not SessionManager.is_authenticated():
+            return False, "Not authenticated"
+        success, result = st.session_state.auth_service.delete_sessions(session_ids)
+        if success and st.session_state.get('session_list'):
+            deleted = set(session_ids)
+            items = st.session_state.session_list['items']
+            items[:] = [s for s in items if s.get('id') not in deleted]
+        return success, result
     
     @staticmethod
     def logout():
@@ -0,0 +1,68 @@
+"""
+Analyze a batch of blood report PDFs from the command line.
+
+Usage (from the repository root):
+    python src/batch.py REPORTS --metadata patients.csv --output results.jsonl
+
+REPORTS is a directory or zip archive of PDFs. The metadata CSV has the
+columns file, patient_name, age and gender. One JSON line is written per
+report as soon as it finishes. The Groq API key is read from GROQ_API_KEY,
+or from .streamlit/secrets.toml like the app.
+"""
+import argparse
+import logging
+import os
+import sys
+from config.app_config import BATCH_CONCURRENCY, BATCH_REQUESTS_PER_MINUTE
+from config.prompts import SPECIALIST_PROMPTS
+from services.batch_analysis import BatchRunner, load_batch
+
+def print_progress(progress):
+    print(
+        f"\r[{progress['stage']}] {progress['done']}/{progress['total']} done, "
+        f"{progress['failed']} failed, {progress['duplicates']} duplicates, "
+        f"{progress['cached']} cached, {progress.get('per_minute', 0):.1f} reports/min",
+        end="", file=sys.stderr, flush=True
+    )
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("reports", help="directory or zip archive of PDFs")
+    parser.add_argument("--metadata", required=True, help="CSV of patient metadata")
+    parser.add_argument("--output", required=True, help="JSONL file for the results")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument("--rpm", type=int, default=BATCH_REQUESTS_PER_MINUTE,
+                        help="maximum model requests per minute")
+    parser.add_argument("--extract-workers", type=int, default=None)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    model_manager = None
+    if os.environ.get("GROQ_API_KEY"):
+        from agents.model_manager import ModelManager
+        from services.clients import build_groq_client
+        model_manager = ModelManager(clients={"groq": build_groq_client(os.environ["GROQ_API_KEY"])})
+
+    items, errors = load_batch(args.reports, args.metadata)
+    runner = BatchRunner(
+        SPECIALIST_PROMPTS["comprehensive_analyst"],
+        model_manager=model_manager,
+        concurrency=args.concurrency,
+        requests_per_minute=args.rpm
+    )
+    with open(args.output, "w", encoding="utf-8") as output:
+        progress = runner.run(
+            items, output, errors=errors,
+            extract_workers=args.extract_workers, on_progress=print_progress
+        )
+    print(
+        f"\n{progress['succeeded']} analyzed, {progress['failed']} failed "
+        f"in {progress['elapsed']:.1f}s ({progress['per_minute']:.1f} reports/min)",
+        file=sys.stderr
+    )
+    return 1 if progress["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
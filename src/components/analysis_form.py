@@ -1,9 +1,13 @@
 import streamlit as st
-from services.ai_service import generate_analysis
+from services.ai_service import generate_analysis, init_analysis_state
+from services.analysis_jobs import (
+    DONE, FAILED, QUEUED, forget_job, get_analysis_jobs, get_session_jobs, submit_analysis
+)
 from config.prompts import SPECIALIST_PROMPTS
-from utils.pdf_extractor import extract_text_from_pdf
+from utils.pdf_extractor import extract_text_from_pdf_cached
+from utils.pdf_pages import PAGE_BREAK
 from config.sample_data import SAMPLE_REPORT
-from config.app_config import MAX_UPLOAD_SIZE_MB
+from config.app_config import ANALYSIS_JOB_POLL_SECONDS, MAX_UPLOAD_SIZE_MB
 
 def show_analysis_form():
     # Initialize report source in session state for new sessions
@@ -12,12 +16,17 @@ def show_analysis_form():
     
     report_source = st.radio(
         "Choose report source",
-        ["Upload PDF", "Use Sample PDF"],
-        index=0 if st.session_state.get('report_source') == "Upload PDF" else 1,
+        ["Upload PDF", "Use Sample PDF", "Batch Upload"],
         horizontal=True,
         key='report_source'
     )
 
+    if report_source == "Batch Upload":
+        from components.batch_form import show_batch_form
+        init_analysis_state()
+        show_batch_form()
+        return
+
     pdf_contents = get_report_contents(report_source)
             
     if pdf_contents:  # Only show form if we have report content
@@ -41,7 +50,7 @@ def get_report_contents(report_source):
                 st.error("Please upload a valid PDF file.")
                 return None
                 
-            pdf_contents = extract_text_from_pdf(uploaded_file)
+            pdf_contents = extract_text_from_pdf_cached(uploaded_file)
             if isinstance(pdf_contents, str) and (
                 pdf_contents.startswith(("File size exceeds", "Invalid file type", "Error validating")) or
                 pdf_contents.startswith("The uploaded file") or
@@ -50,7 +59,7 @@ def get_report_contents(report_source):
                 st.error(pdf_contents)
                 return None
             with st.expander("View Extracted Report"):
-                st.text(pdf_contents)
+                st.text(pdf_contents.replace(PAGE_BREAK, "\n"))
             return pdf_contents
     else:
         with st.expander("View Sample Report"):
@@ -75,45 +84,60 @@ def handle_form_submission(patient_name, age, gender, pdf_contents):
         st.error("Please fill in all fields")
         return
 
-    # Check rate limit first, outside of spinner
+    # Check rate limit before queueing
     can_analyze, error_msg = generate_analysis(None, None, check_only=True)
     if not can_analyze:
         st.error(error_msg)
         st.stop()
         return
 
-    with st.spinner("Analyzing report..."):
-        # Save user message and proceed with analysis
-        st.session_state.auth_service.save_chat_message(
-            st.session_state.current_session['id'],
-            f"Analyzing report for patient: {patient_name}"
-        )
-        
-        # Generate analysis
-        result = generate_analysis({
-            "patient_name": patient_name,
-            "age": age,
-            "gender": gender,
-            "report": pdf_contents
-        }, SPECIALIST_PROMPTS["comprehensive_analyst"])
-        
-        if result["success"]:
-            # st.write("result:", result)
-            st.session_state.analysis_result = result
+    # Queue the analysis, saving the user message once it is accepted; it
+    # runs in the background pool and is saved to the session even if the
+    # user navigates away
+    session_id = st.session_state.current_session['id']
+    init_analysis_state()
+    success, job_id = submit_analysis({
+        "patient_name": patient_name,
+        "age": age,
+        "gender": gender,
+        "report": pdf_contents
+    }, SPECIALIST_PROMPTS["comprehensive_analyst"], session_id,
+        user_message=f"Analyzing report for patient: {patient_name}")
+    if not success:
+        st.error(job_id)
+        st.stop()
+    st.session_state.pop("analysis_result", None)
+    st.rerun()
 
-            # Add model used information if available
-            content = result["content"]
-            if "model_used" in result:
-                model_info = f"\n\n*Analysis generated using {result['model_used']}*"
-                content += model_info
-                
-            st.session_state.auth_service.save_chat_message(
-                st.session_state.current_session['id'],
-                content,
-                role='assistant'
+def show_analysis_jobs():
+    """Show the current session's queued and running analyses, if any."""
+    session_id = st.session_state.current_session['id']
+    if get_session_jobs(session_id):
+        poll_analysis_jobs(session_id)
+
+@st.fragment(run_every=ANALYSIS_JOB_POLL_SECONDS)
+def poll_analysis_jobs(session_id):
+    queue = get_analysis_jobs()
+    finished = False
+    for job in get_session_jobs(session_id):
+        if job.status == DONE:
+            forget_job(job.id)
+            finished = True
+        elif job.status == FAILED:
+            st.session_state.analysis_result = {"error": job.error}
+            forget_job(job.id)
+            finished = True
+        elif job.status == QUEUED:
+            wait = queue.metrics()["wait_p50"]
+            st.info(
+                f"⏳ Waiting for an analysis slot (position {queue.queue_position(job)}"
+                + (f", typical wait {wait:.0f}s)" if wait >= 1 else ")")
             )
-            # st.rerun()
+        elif job.partial:
+            st.success(job.partial)
         else:
-            # st.write("result:", result)
-            st.error(result["error"])
-            st.stop()
+            st.info("🔬 Analyzing report...")
+
+    if finished:
+        # Rerun the whole page so the saved answer shows in the chat history
+        st.rerun()
@@ -0,0 +1,114 @@
+import io
+import streamlit as st
+from agents.analysis_agent import AnalysisAgent
+from config.app_config import ANALYSIS_JOB_POLL_SECONDS, BATCH_MAX_FILES
+from config.prompts import SPECIALIST_PROMPTS
+from services.ai_service import get_remaining_analyses
+from services.analysis_jobs import (
+    DONE, FAILED, QUEUED, forget_job, get_analysis_jobs, get_session_jobs, submit_job
+)
+from services.batch_analysis import BatchRunner, load_batch
+from services.rate_limiter import get_rate_limiter
+
+# Job key of batches in this browser session's job list
+BATCH_JOBS = "batch"
+
+def show_batch_form():
+    st.caption(
+        f"Upload a ZIP of up to {BATCH_MAX_FILES} PDF reports and a CSV with the columns "
+        "file, patient_name, age and gender."
+    )
+    archive = st.file_uploader("Reports (ZIP)", type=['zip'], key='batch_archive')
+    metadata = st.file_uploader("Patient metadata (CSV)", type=['csv'], key='batch_metadata')
+
+    running = bool(get_session_jobs(BATCH_JOBS))
+    if archive and metadata and st.button("Analyze Batch", type="primary", disabled=running):
+        submit_batch(archive, metadata)
+
+    if running:
+        poll_batch_jobs()
+    if st.session_state.get('batch_error'):
+        st.error(st.session_state.batch_error)
+    if st.session_state.get('batch_summary'):
+        st.success(st.session_state.batch_summary)
+    if st.session_state.get('batch_results'):
+        st.download_button(
+            "Download results (JSONL)",
+            st.session_state.batch_results,
+            file_name="batch_results.jsonl",
+            mime="application/jsonl"
+        )
+
+def submit_batch(archive, metadata):
+    """
+    Queue a batch on the background analysis pool, so the page stays
+    responsive and the batch survives reruns while it is paced.
+    """
+    try:
+        items, errors = load_batch(archive, metadata)
+    except Exception as e:
+        st.error(f"Could not read batch: {str(e)}")
+        return
+
+    remaining = get_remaining_analyses()
+    distinct = len({(item['sha256'], item['age'], item['gender'].lower()) for item in items})
+    if distinct > remaining:
+        st.error(f"This batch needs {distinct} analyses but only {remaining} remain today.")
+        return
+
+    # Resolved here: the worker thread must not read session_state
+    runner = BatchRunner(
+        SPECIALIST_PROMPTS["comprehensive_analyst"],
+        model_manager=st.session_state.analysis_agent.model_manager,
+        quota=(get_rate_limiter(), AnalysisAgent.rate_limit_key())
+    )
+
+    def work(job):
+        def on_progress(progress):
+            job.progress = dict(progress)
+
+        output = io.StringIO()
+        runner.run(items, output, errors=errors, on_progress=on_progress)
+        return output.getvalue()
+
+    success, job_id = submit_job(BATCH_JOBS, work)
+    if not success:
+        st.error(job_id)
+        return
+    for key in ('batch_results', 'batch_summary', 'batch_error'):
+        st.session_state.pop(key, None)
+    st.rerun()
+
+@st.fragment(run_every=ANALYSIS_JOB_POLL_SECONDS)
+def poll_batch_jobs():
+    queue = get_analysis_jobs()
+    finished = False
+    for job in get_session_jobs(BATCH_JOBS):
+        progress = job.progress or {}
+        if job.status == DONE:
+            st.session_state.batch_results = job.content
+            st.session_state.batch_summary = (
+                f"Analyzed {progress['succeeded']} reports ({progress['duplicates']} duplicates, "
+                f"{progress['cached']} cached), {progress['failed']} failed, "
+                f"in {progress['elapsed']:.0f}s"
+            )
+            forget_job(job.id)
+            finished = True
+        elif job.status == FAILED:
+            st.session_state.batch_error = f"Batch failed: {job.error}"
+            forget_job(job.id)
+            finished = True
+        elif job.status == QUEUED:
+            st.info(f"⏳ Waiting for an analysis slot (position {queue.queue_position(job)})")
+        elif progress.get('stage', 'extracting') == 'extracting' or not progress.get('total'):
+            st.progress(0.0, text="Extracting reports...")
+        else:
+            st.progress(
+                progress['done'] / progress['total'],
+                text=f"{progress['done']}/{progress['total']} reports, "
+                     f"{progress['failed']} failed, {progress.get('per_minute', 0):.1f}/min"
+            )
+
+    if finished:
+        # Rerun the whole page so the results and download button show
+        st.rerun()
@@ -1,7 +1,8 @@
 import streamlit as st
 from auth.session_manager import SessionManager
 from components.footer import show_footer
-from config.app_config import ANALYSIS_DAILY_LIMIT
+from config.app_config import ANALYSIS_DAILY_LIMIT, SESSION_PAGE_SIZE
+from services.ai_service import get_remaining_analyses
 
 def show_sidebar():
     with st.sidebar:
@@ -11,7 +12,7 @@ def show_sidebar():
             if st.session_state.user and 'id' in st.session_state.user:
                 success, session = SessionManager.create_chat_session()
                 if success:
-                    st.session_state.current_session = session
+                    SessionManager.switch_session(session)
                     st.rerun()
                 else:
                     st.error("Failed to create session")
@@ -21,10 +22,7 @@ def show_sidebar():
                 st.rerun()
 
         # Add analysis counter
-        if 'analysis_count' not in st.session_state:
-            st.session_state.analysis_count = 0
-        
-        remaining = ANALYSIS_DAILY_LIMIT - st.session_state.analysis_count
+        remaining = get_remaining_analyses()
         st.markdown(
             f"""
             <div style='
@@ -62,13 +60,45 @@ def show_sidebar():
 
 def show_session_list():
     if st.session_state.user and 'id' in st.session_state.user:
-        success, sessions = SessionManager.get_user_sessions()
-        if success:
-            if sessions:
-                st.subheader("Previous Sessions")
-                render_session_list(sessions)
-            else:
-                st.info("No previous sessions")
+        session_list = get_session_list()
+        if session_list is None:
+            return
+        if session_list['items']:
+            st.subheader("Previous Sessions")
+            render_session_list(session_list['items'])
+            if session_list['has_more']:
+                if st.button("Load more", key="load_more_sessions", use_container_width=True):
+                    load_session_page(session_list)
+                    st.rerun()
+        else:
+            st.info("No previous sessions")
+
+def get_session_list():
+    """Return the loaded session pages, fetching the first page once."""
+    session_list = st.session_state.get('session_list')
+    if session_list is None:
+        session_list = {'items': [], 'has_more': False}
+        if not load_session_page(session_list):
+            return None
+        st.session_state.session_list = session_list
+    return session_list
+
+def load_session_page(session_list):
+    """Append the next keyset page of sessions to the loaded list."""
+    before = None
+    if session_list['items']:
+        last = session_list['items'][-1]
+        before = (last['created_at'], last['id'])
+
+    # Fetch one extra row to know whether another page exists
+    success, sessions = SessionManager.get_user_sessions(
+        limit=SESSION_PAGE_SIZE + 1, before=before
+    )
+    if not success:
+        return False
+    session_list['items'].extend(sessions[:SESSION_PAGE_SIZE])
+    session_list['has_more'] = len(sessions) > SESSION_PAGE_SIZE
+    return True
 
 def render_session_list(sessions):
     # Store deletion state
@@ -93,7 +123,7 @@ def render_session_item(session):
         
         with title_col:
             if st.button(f"📝 {session['title']}", key=f"session_{session_id}", use_container_width=True):
-                st.session_state.current_session = session
+                SessionManager.switch_session(session)
                 st.rerun()
         
         with delete_col:
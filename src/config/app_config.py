@@ -8,6 +8,85 @@ MAX_UPLOAD_SIZE_MB = 20
 MAX_PDF_PAGES = 50
 SESSION_TIMEOUT_MINUTES = 30
 ANALYSIS_DAILY_LIMIT = 15
+AUTH_REVALIDATE_SECONDS = 300  # Re-check the session with Supabase at most this often
+AUTH_EXPIRY_MARGIN_SECONDS = 60  # Always re-check when the token expires within this window
+USER_DATA_CACHE_SECONDS = 300
+SESSION_PAGE_SIZE = 20  # Sessions loaded per page in the sidebar
+SESSION_DELETE_BATCH_SIZE = 1000  # Session ids per bulk delete call
+
+# Chat data storage: "supabase" or "sqlite" (local file, single node)
+STORAGE_BACKEND = "supabase"
+STORAGE_PATH = ".cache/chat.sqlite3"
+STORAGE_POOL_SIZE = 8  # Pooled SQLite connections
+
+# Chat message write-behind buffer
+MESSAGE_WRITE_BATCH_SIZE = 100  # Rows per multi-row insert
+MESSAGE_WRITE_LINGER_SECONDS = 0.05  # Wait for more rows before writing a partial batch
+MESSAGE_WRITE_MAX_RETRIES = 5
+MESSAGE_WRITE_RETRY_SECONDS = 0.5  # First retry delay, doubled on each attempt
+MESSAGE_FLUSH_TIMEOUT_SECONDS = 5.0  # Longest wait on logout or session switch
+
+# Hot-path timing metrics, exported in the Prometheus text format
+METRICS_ENABLED = False
+METRICS_EXPORT = "http"  # "http" (GET /metrics) or "file" (textfile collector)
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9464
+METRICS_FILE = ".cache/metrics.prom"
+METRICS_FILE_INTERVAL_SECONDS = 15
+METRICS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)  # Seconds
+
+# PDF processing settings
+PDF_CACHE_MAX_MB = 64  # Extracted text kept across reruns, LRU evicted
+PDF_EXTRACT_WORKERS = 4  # Process pool size for page extraction, 0 = CPU count
+PDF_EXTRACT_START_METHOD = "forkserver"  # Or "spawn"; never fork the threaded server
+PDF_PARALLEL_MIN_PAGES = 8  # Smaller documents are extracted serially
+PDF_STREAM_PAGES = 3  # Leading pages read one at a time, failing scanned uploads before the rest
+
+# Analysis settings
+COMPACT_LAB_REPORT = True  # Shorten lab value rows; other report lines are kept
+LAB_TABLE_MIN_ROWS = 3  # Leave the text as is when fewer values are parsed
+PAGE_FURNITURE_LINES = 6  # Lines from the top and bottom of a page checked for repeated headers/footers
+MODEL_HEDGING_ENABLED = False  # Race the next tier when the current one is slow
+ANALYSIS_WORKERS = 4  # Analyses run concurrently by the background pool
+ANALYSIS_QUEUE_MAX = 100  # Reject new analyses beyond this many waiting
+ANALYSIS_JOB_POLL_SECONDS = 1.0  # How often the UI checks a running analysis
+ANALYSIS_JOB_RETENTION_SECONDS = 3600  # Finished jobs are forgotten after this
+
+# In-context learning knowledge base: "sqlite" (persistent, shared) or "memory"
+KNOWLEDGE_BASE_BACKEND = "sqlite"
+KNOWLEDGE_BASE_MAX_INSIGHTS = 500  # Memory backend limits
+KNOWLEDGE_BASE_MAX_PER_ANALYTE = 20
+KNOWLEDGE_STORE_PATH = ".cache/knowledge_base.sqlite3"
+KNOWLEDGE_STORE_MAX_INSIGHTS = 100_000
+KNOWLEDGE_STORE_MAX_AGE_DAYS = 180
+KNOWLEDGE_STORE_WRITE_BATCH = 50  # Insights buffered before a write
+KNOWLEDGE_STORE_FLUSH_SECONDS = 2.0  # Buffered insights are written at least this often
+KNOWLEDGE_STORE_MAX_PENDING = 5000  # Insights kept buffered while writes fail; the oldest are dropped
+KNOWLEDGE_AGE_BUCKETS = (18, 40, 60)  # Upper bounds of the age ranges insights are grouped by
+KNOWLEDGE_CONTEXT_ITEMS = 5  # Insights added to the prompt
+
+# Batch analysis settings
+BATCH_CONCURRENCY = 4  # Model calls in flight at once
+BATCH_REQUESTS_PER_MINUTE = 30  # Pace model calls below the provider's limits
+BATCH_MAX_RETRIES = 3  # Retries per report when every model tier fails
+BATCH_MAX_FILES = 500
+
+# Analysis response cache
+ANALYSIS_CACHE_ENABLED = True
+ANALYSIS_CACHE_PATH = ".cache/analysis_cache.sqlite3"
+ANALYSIS_CACHE_TTL_HOURS = 24 * 7
+ANALYSIS_CACHE_MAX_ENTRIES = 5000
+
+# Daily analysis rate limit: "memory", "sqlite" (shared on the host)
+# or "supabase" (shared by replicas, needs migration 003)
+RATE_LIMIT_BACKEND = "sqlite"
+RATE_LIMIT_PATH = ".cache/rate_limits.sqlite3"
+
+# Shared LLM client connection pool
+LLM_MAX_CONNECTIONS = 50
+LLM_MAX_KEEPALIVE_CONNECTIONS = 50
+LLM_KEEPALIVE_SECONDS = 60
+LLM_TIMEOUT_SECONDS = 60
 
 # UI Settings
 PRIMARY_COLOR = "#64B5F6"
@@ -1,10 +1,9 @@
 import streamlit as st
 from auth.session_manager import SessionManager
 from components.auth_pages import show_login_page
-from components.sidebar import show_sidebar
-from components.analysis_form import show_analysis_form
 from components.footer import show_footer
 from config.app_config import APP_NAME, APP_TAGLINE, APP_DESCRIPTION, APP_ICON
+from utils.metrics import start_metrics_export
 
 # Must be the first Streamlit command
 st.set_page_config(
@@ -13,6 +12,9 @@ st.set_page_config(
     layout="wide"
 )
 
+# Serve /metrics once per process when METRICS_ENABLED
+start_metrics_export()
+
 # Initialize session state
 SessionManager.init_session()
 
@@ -44,7 +46,7 @@ def show_welcome_screen():
         if st.button("➕ Create New Analysis Session", use_container_width=True, type="primary"):
             success, session = SessionManager.create_chat_session()
             if success:
-                st.session_state.current_session = session
+                SessionManager.switch_session(session)
                 st.rerun()
             else:
                 st.error("Failed to create session")
@@ -72,13 +74,17 @@ def show_user_greeting():
         """, unsafe_allow_html=True)
 
 def main():
-    SessionManager.init_session()
-
+    # Session is already initialized at module level for this rerun
     if not SessionManager.is_authenticated():
         show_login_page()
         show_footer()
         return
 
+    # The analysis pages pull in the model clients and PDF parsing; load
+    # them on the first authenticated run so the login page stays light
+    from components.sidebar import show_sidebar
+    from components.analysis_form import show_analysis_form, show_analysis_jobs
+
     # Show user greeting at the top
     show_user_greeting()
     
@@ -89,6 +95,7 @@ def main():
     if st.session_state.get('current_session'):
         st.title(f"📊 {st.session_state.current_session['title']}")
         show_chat_history()
+        show_analysis_jobs()
         show_analysis_form()
         
         if st.session_state.get("analysis_result"):
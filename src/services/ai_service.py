@@ -1,9 +1,9 @@
 import streamlit as st
-from agents.analysis_agent import AnalysisAgent
 
 def init_analysis_state():
     """Initialize analysis-related session state variables."""
     if 'analysis_agent' not in st.session_state:
+        from agents.analysis_agent import AnalysisAgent
         st.session_state.analysis_agent = AnalysisAgent()
 
 def check_rate_limit():
@@ -11,7 +11,12 @@ def check_rate_limit():
     init_analysis_state()
     return st.session_state.analysis_agent.check_rate_limit()
 
-def generate_analysis(data, system_prompt, check_only=False, session_id=None):
+def get_remaining_analyses():
+    """Analyses left in the user's daily allowance."""
+    init_analysis_state()
+    return st.session_state.analysis_agent.get_remaining_analyses()
+
+def generate_analysis(data, system_prompt, check_only=False, session_id=None, stream=False):
     """Generate analysis if within rate limits."""
     # Ensure analysis agent is initialized
     init_analysis_state()
@@ -32,5 +37,6 @@ def generate_analysis(data, system_prompt, check_only=False, session_id=None):
     return st.session_state.analysis_agent.analyze_report(
         data=data,
         system_prompt=system_prompt,
-        check_only=False
+        check_only=False,
+        stream=stream
     )
\ No newline at end of file
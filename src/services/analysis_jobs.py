@@ -0,0 +1,234 @@
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from config.app_config import (
+    ANALYSIS_JOB_RETENTION_SECONDS, ANALYSIS_QUEUE_MAX, ANALYSIS_WORKERS
+)
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+class AnalysisJob:
+    """State of one queued analysis, updated by the worker thread."""
+
+    def __init__(self, session_id):
+        self.id = uuid.uuid4().hex
+        self.session_id = session_id
+        self.status = QUEUED
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.chunks = []
+        self.content = None
+        self.error = None
+        # Latest progress dict of a batch job
+        self.progress = None
+
+    @property
+    def partial(self):
+        """Content streamed so far."""
+        return "".join(self.chunks)
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED)
+
+class AnalysisJobQueue:
+    """
+    Bounded worker pool for analyses. Jobs run outside the Streamlit script
+    thread with the submitting session's script run context attached, and
+    persist their result themselves. Work functions should not read
+    session_state: while the session's script is stopping or rerunning,
+    Streamlit raises its StopException from any session_state access.
+    """
+
+    def __init__(self, max_workers, max_queue, retention_seconds=ANALYSIS_JOB_RETENTION_SECONDS):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retention_seconds = retention_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis")
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._wait_times = deque(maxlen=200)
+        self._run_times = deque(maxlen=200)
+
+    def submit(self, session_id, work):
+        """
+        Queue work(job) and return (success, job or error). The work
+        function fills in job.chunks and returns the final content.
+        """
+        ctx = get_script_run_ctx()
+        with self._lock:
+            self._prune()
+            if self.queue_depth() >= self.max_queue:
+                return False, "Too many analyses are queued, please try again shortly"
+            job = AnalysisJob(session_id)
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, work, ctx)
+        return True, job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def queue_position(self, job):
+        """1-based position among queued jobs, or 0 once running."""
+        if job.status != QUEUED:
+            return 0
+        with self._lock:
+            return sum(
+                1 for other in self._jobs.values()
+                if other.status == QUEUED and other.submitted_at <= job.submitted_at
+            )
+
+    def queue_depth(self):
+        return sum(1 for job in self._jobs.values() if job.status == QUEUED)
+
+    def metrics(self):
+        """Queue depth, busy workers and wait/run time percentiles in seconds."""
+        with self._lock:
+            running = sum(1 for job in self._jobs.values() if job.status == RUNNING)
+            waits = sorted(self._wait_times)
+            runs = sorted(self._run_times)
+            return {
+                "queue_depth": self.queue_depth(),
+                "running": running,
+                "workers": self.max_workers,
+                "wait_p50": _percentile(waits, 0.5),
+                "wait_p95": _percentile(waits, 0.95),
+                "run_p50": _percentile(runs, 0.5),
+                "run_p95": _percentile(runs, 0.95),
+            }
+
+    def _run(self, job, work, ctx):
+        thread = threading.current_thread()
+        add_script_run_ctx(thread, ctx)
+        job.started_at = time.time()
+        job.status = RUNNING
+        try:
+            job.content = work(job)
+            job.status = DONE
+        except Exception as e:
+            logger.error(f"Analysis job {job.id} failed: {e!r}")
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            if job.status == RUNNING:
+                # Interrupted by a BaseException, which still propagates
+                job.error = "Analysis was interrupted"
+                job.status = FAILED
+            job.finished_at = time.time()
+            # Pool threads are reused by other sessions
+            thread.streamlit_script_run_ctx = None
+            with self._lock:
+                self._wait_times.append(job.started_at - job.submitted_at)
+                self._run_times.append(job.finished_at - job.started_at)
+            logger.info(
+                f"Analysis job {job.id} {job.status}: "
+                f"waited {job.started_at - job.submitted_at:.2f}s, "
+                f"ran {job.finished_at - job.started_at:.2f}s, "
+                f"queue depth {self.queue_depth()}"
+            )
+
+    def _prune(self):
+        """Forget finished jobs after the retention period."""
+        cutoff = time.time() - self.retention_seconds
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+@st.cache_resource
+def get_analysis_jobs():
+    """Analysis worker pool shared by every session in the process."""
+    return AnalysisJobQueue(ANALYSIS_WORKERS, ANALYSIS_QUEUE_MAX)
+
+def format_model_info(result):
+    """Footer naming the model, plus the route when tiers were skipped or failed."""
+    if "model_used" not in result:
+        return ""
+    model_info = f"\n\n*Analysis generated using {result['model_used']}"
+    if " -> " in result.get("routing", ""):
+        model_info += f" (route: {result['routing']})"
+    return model_info + "*"
+
+def submit_analysis(data, system_prompt, session_id, user_message=None):
+    """
+    Queue an analysis for a chat session. The worker streams the answer
+    into the job and saves it with save_chat_message when done, so the
+    result survives reruns and navigation; AuthService locks the message
+    state it shares with the script thread. user_message is saved only
+    once the queue accepts the job, and always before the answer.
+    Returns (success, job_id or error).
+    """
+    agent = st.session_state.analysis_agent
+    auth_service = st.session_state.auth_service
+    rate_limit_key = agent.rate_limit_key()
+    accepted = threading.Event()
+
+    def work(job):
+        result = agent.analyze_report(
+            data=data, system_prompt=system_prompt, stream=True, rate_limit_key=rate_limit_key
+        )
+        if not result["success"]:
+            raise RuntimeError(result["error"])
+        for chunk in result["stream"]:
+            job.chunks.append(chunk)
+        content = job.partial + format_model_info(result)
+        accepted.wait()
+        success, error = auth_service.save_chat_message(session_id, content, role='assistant')
+        if not success:
+            raise RuntimeError(f"Failed to save analysis: {error}")
+        return content
+
+    try:
+        success, job_id = submit_job(session_id, work)
+        if success and user_message:
+            auth_service.save_chat_message(session_id, user_message)
+    finally:
+        accepted.set()
+    return success, job_id
+
+def submit_job(session_id, work):
+    """
+    Queue work(job) for this browser session under session_id, a chat
+    session or another key such as the batch form's, and remember it for
+    get_session_jobs. Returns (success, job_id or error).
+    """
+    success, job = get_analysis_jobs().submit(session_id, work)
+    if not success:
+        return False, job
+    if 'analysis_jobs' not in st.session_state:
+        st.session_state.analysis_jobs = {}
+    st.session_state.analysis_jobs[job.id] = session_id
+    return True, job.id
+
+def get_session_jobs(session_id):
+    """This browser session's jobs for a chat session, oldest first."""
+    queue = get_analysis_jobs()
+    jobs = []
+    for job_id, job_session in list(st.session_state.get('analysis_jobs', {}).items()):
+        job = queue.get(job_id)
+        if job is None:
+            st.session_state.analysis_jobs.pop(job_id, None)
+        elif job_session == session_id:
+            jobs.append(job)
+    return sorted(jobs, key=lambda job: job.submitted_at)
+
+def forget_job(job_id):
+    st.session_state.get('analysis_jobs', {}).pop(job_id, None)
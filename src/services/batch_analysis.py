@@ -0,0 +1,324 @@
+import csv
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from agents.analysis_agent import AnalysisAgent
+from agents.model_manager import ModelManager
+from config.app_config import (
+    BATCH_CONCURRENCY, BATCH_MAX_FILES, BATCH_MAX_RETRIES, BATCH_REQUESTS_PER_MINUTE,
+    MAX_PDF_PAGES, MAX_UPLOAD_SIZE_MB
+)
+from services.rate_limiter import MemoryRateLimiter
+from utils.pdf_extractor import build_pdf_pool, extract_text_from_bytes, get_pdf_pool, validate_pages
+from utils.pdf_pages import extract_document
+
+logger = logging.getLogger(__name__)
+
+METADATA_COLUMNS = ("file", "patient_name", "age", "gender")
+
+def load_batch(source, metadata):
+    """
+    Read the PDFs of a batch and match them to their patient metadata.
+
+    Args:
+        source: Directory path, zip file path or zip file object
+        metadata: CSV path or file object with columns file, patient_name,
+            age and gender; `file` is the PDF's name without directories
+
+    Returns (items, errors). Each item is a dict of the metadata plus
+    pdf_bytes and sha256; each error is a result record for the JSONL output.
+    """
+    pdfs = _read_pdfs(source)
+    rows, errors = _read_metadata(metadata)
+
+    items = []
+    for name, pdf_bytes in pdfs.items():
+        row = rows.pop(name, None)
+        if row is None:
+            errors.append(_error_record(name, "No metadata row for this file"))
+        elif pdf_bytes is None or len(pdf_bytes) > MAX_UPLOAD_SIZE_MB * 1024 * 1024:
+            errors.append(_error_record(name, f"File exceeds the {MAX_UPLOAD_SIZE_MB}MB limit", row))
+        elif not pdf_bytes.startswith(b"%PDF-"):
+            errors.append(_error_record(name, "Invalid file type. Please upload a PDF file", row))
+        else:
+            items.append(dict(row, pdf_bytes=pdf_bytes, sha256=hashlib.sha256(pdf_bytes).hexdigest()))
+
+    for name, row in rows.items():
+        errors.append(_error_record(name, "File not found in batch", row))
+
+    if len(items) > BATCH_MAX_FILES:
+        for item in items[BATCH_MAX_FILES:]:
+            errors.append(_error_record(item["file"], f"Batch exceeds {BATCH_MAX_FILES} files", item))
+        items = items[:BATCH_MAX_FILES]
+    return items, errors
+
+def _read_pdfs(source):
+    """
+    Return {file name: bytes} for every PDF in a directory or zip archive,
+    with None for zip members over the size limit.
+    """
+    pdfs = {}
+    if isinstance(source, (str, os.PathLike)) and os.path.isdir(source):
+        for root, _, files in os.walk(source):
+            for name in sorted(files):
+                if name.lower().endswith(".pdf"):
+                    with open(os.path.join(root, name), "rb") as f:
+                        pdfs[name] = f.read()
+        return pdfs
+
+    with zipfile.ZipFile(source) as archive:
+        for info in archive.infolist():
+            name = os.path.basename(info.filename)
+            if info.is_dir() or not name.lower().endswith(".pdf") or name.startswith("._"):
+                continue
+            # Oversized members are not inflated, load_batch rejects them
+            oversized = info.file_size > MAX_UPLOAD_SIZE_MB * 1024 * 1024
+            pdfs[name] = None if oversized else archive.read(info)
+    return pdfs
+
+def _read_metadata(metadata):
+    """Return ({file name: row}, errors) from the metadata CSV."""
+    if isinstance(metadata, (str, os.PathLike)):
+        with open(metadata, newline="", encoding="utf-8-sig") as f:
+            return _read_metadata(io.StringIO(f.read()))
+    if hasattr(metadata, "getvalue"):
+        content = metadata.getvalue()
+        if isinstance(content, bytes):
+            content = content.decode("utf-8-sig")
+        metadata = io.StringIO(content)
+
+    reader = csv.DictReader(metadata)
+    missing = [column for column in METADATA_COLUMNS if column not in (reader.fieldnames or [])]
+    if missing:
+        raise ValueError(f"Metadata CSV is missing columns: {', '.join(missing)}")
+
+    rows, errors = {}, []
+    for row in reader:
+        row = {column: (row.get(column) or "").strip() for column in METADATA_COLUMNS}
+        name = os.path.basename(row["file"])
+        if not all(row.values()):
+            errors.append(_error_record(name, "Incomplete metadata row", row))
+        elif name in rows:
+            errors.append(_error_record(name, "Duplicate metadata row", row))
+        else:
+            rows[name] = dict(row, file=name)
+    return rows, errors
+
+def _error_record(name, error, row=None):
+    record = {"file": name, "status": "error", "error": error}
+    if row:
+        record.update({column: row.get(column) for column in METADATA_COLUMNS[1:]})
+    return record
+
+def extract_batch(items, workers=None):
+    """
+    Extract every distinct PDF once, in parallel processes.
+    Without `workers` the shared page extraction pool is used; with it a
+    pool of that size is started for this batch. The workers only parse
+    pages; validation runs here. Falls back to serial extraction if no pool
+    can run. Returns {sha256: (is_valid, text or error)}.
+    """
+    unique = {}
+    for item in items:
+        unique.setdefault(item["sha256"], item["pdf_bytes"])
+
+    if len(unique) > 1 and (workers is None or workers > 1):
+        pool = get_pdf_pool() if workers is None else build_pdf_pool(workers)
+        if pool is not None:
+            try:
+                futures = {
+                    sha: pool.submit(extract_document, pdf_bytes, MAX_PDF_PAGES)
+                    for sha, pdf_bytes in unique.items()
+                }
+                return {sha: _extracted(future) for sha, future in futures.items()}
+            except (BrokenProcessPool, OSError, RuntimeError) as e:
+                logger.warning(f"Extraction pool failed, extracting serially: {str(e)}")
+                if workers is None:
+                    get_pdf_pool.clear()
+            finally:
+                if workers is not None:
+                    pool.shutdown()
+
+    return {sha: extract_text_from_bytes(pdf_bytes, 1) for sha, pdf_bytes in unique.items()}
+
+def _extracted(future):
+    """Validate a worker's pages; errors reading one PDF fail only that PDF."""
+    try:
+        return validate_pages(*future.result())
+    except BrokenProcessPool:
+        raise
+    except Exception as e:
+        return False, f"Error extracting text from PDF: {str(e)}"
+
+class BatchRunner:
+    """
+    Analyze a batch of reports with bounded concurrency.
+
+    Identical reports for the same age and gender are analyzed once. Model
+    calls are paced by a token bucket and wait out tier cooldowns from the
+    shared tier health registry, so a batch backs off instead of burning
+    through every tier when the provider rate limits it. Results are
+    written to the output as JSON lines as soon as each report finishes.
+    """
+
+    def __init__(self, system_prompt, model_manager=None, concurrency=BATCH_CONCURRENCY,
+                 requests_per_minute=BATCH_REQUESTS_PER_MINUTE, max_retries=BATCH_MAX_RETRIES,
+                 quota=None):
+        """
+        Args:
+            quota: Optional (rate limiter, key) pair charged one token per
+                model analysis, e.g. the user's daily analysis allowance
+        """
+        self.system_prompt = system_prompt
+        self.model_manager = model_manager or ModelManager()
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.pacer = MemoryRateLimiter(
+            capacity=max(1, concurrency), refill_per_second=requests_per_minute / 60
+        )
+        self.quota = quota
+        self._pace_lock = threading.Lock()
+
+    def run(self, items, output, errors=(), extract_workers=None, on_progress=None):
+        """
+        Extract and analyze `items`, writing one JSON line per report to
+        `output`. on_progress(progress) is called from the calling thread
+        after every report. Returns the final progress dict.
+        """
+        progress = {
+            "total": len(items) + len(errors), "done": 0, "succeeded": 0, "failed": 0,
+            "duplicates": 0, "cached": 0, "started_at": time.time(), "stage": "extracting"
+        }
+
+        def emit(record):
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+            progress["done"] += 1
+            if record["status"] == "error":
+                progress["failed"] += 1
+            else:
+                progress["succeeded"] += 1
+            if record.get("duplicate_of"):
+                progress["duplicates"] += 1
+            if record.get("cached"):
+                progress["cached"] += 1
+            _update_rates(progress)
+            if on_progress:
+                on_progress(progress)
+
+        for record in errors:
+            emit(record)
+        if on_progress:
+            on_progress(progress)
+
+        texts = extract_batch(items, extract_workers)
+        progress["stage"] = "analyzing"
+
+        # Group identical reports so each is analyzed once
+        groups = {}
+        for item in items:
+            is_valid, text = texts[item["sha256"]]
+            if not is_valid:
+                emit(self._record(item, {"success": False, "error": text}))
+                continue
+            key = (item["sha256"], item["age"], item["gender"].lower())
+            groups.setdefault(key, []).append(item)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="batch") as executor:
+            pending = {
+                executor.submit(self._analyze, group[0], texts[group[0]["sha256"]][1]): group
+                for group in groups.values()
+            }
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    group = pending.pop(future)
+                    result = future.result()
+                    emit(self._record(group[0], result))
+                    for duplicate in group[1:]:
+                        emit(self._record(duplicate, result, duplicate_of=group[0]["file"]))
+
+        progress["stage"] = "done"
+        _update_rates(progress)
+        return progress
+
+    def _analyze(self, item, text):
+        """Analyze one report, retrying while every tier is rate limited or failing."""
+        data = AnalysisAgent.preprocess_data({
+            "patient_name": item["patient_name"],
+            "age": item["age"],
+            "gender": item["gender"],
+            "report": text
+        })
+        started = time.perf_counter()
+        result = {"success": False, "error": "Analysis was not attempted"}
+        for attempt in range(self.max_retries + 1):
+            if self.quota:
+                limiter, key = self.quota
+                allowed, _, _ = limiter.try_acquire(key)
+                if not allowed:
+                    result = {"success": False, "error": "Daily analysis limit reached"}
+                    break
+            self._wait_for_capacity()
+            try:
+                result = self.model_manager.generate_analysis(data, self.system_prompt)
+            except Exception as e:
+                result = {"success": False, "error": str(e)}
+            if self.quota and (not result["success"] or result.get("cached")):
+                limiter.refund(key)
+            if result["success"]:
+                break
+            logger.warning(
+                f"Batch analysis of {item['file']} failed (attempt {attempt + 1}): {result['error']}"
+            )
+        result["elapsed"] = round(time.perf_counter() - started, 3)
+        return result
+
+    def _wait_for_capacity(self):
+        """Block until the pacer has a token and at least one tier is out of cooldown."""
+        with self._pace_lock:
+            while True:
+                allowed, _, retry_after = self.pacer.try_acquire("batch")
+                if allowed:
+                    break
+                time.sleep(retry_after)
+
+        snapshot = self.model_manager.health.snapshot()
+        cooldowns = [
+            snapshot.get(tier.value, {}).get("cooldown_remaining", 0.0)
+            for tier in ModelManager.TIER_ORDER
+        ]
+        if cooldowns and min(cooldowns) > 0:
+            time.sleep(min(cooldowns))
+
+    @staticmethod
+    def _record(item, result, duplicate_of=None):
+        record = {column: item[column] for column in METADATA_COLUMNS}
+        record["sha256"] = item["sha256"]
+        if result["success"]:
+            record.update({
+                "status": "ok",
+                "model_used": result.get("model_used"),
+                "routing": result.get("routing"),
+                "cached": bool(result.get("cached")),
+                "content": result.get("content"),
+            })
+        else:
+            record.update({"status": "error", "error": result["error"]})
+        if duplicate_of:
+            record["duplicate_of"] = duplicate_of
+        if "elapsed" in result and not duplicate_of:
+            record["elapsed"] = result["elapsed"]
+        return record
+
+def _update_rates(progress):
+    elapsed = time.time() - progress["started_at"]
+    progress["elapsed"] = elapsed
+    progress["per_minute"] = progress["done"] / elapsed * 60 if elapsed > 0 else 0.0
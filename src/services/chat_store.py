@@ -0,0 +1,289 @@
+import json
+import os
+import queue
+import sqlite3
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+import streamlit as st
+from config.app_config import STORAGE_BACKEND, STORAGE_PATH, STORAGE_POOL_SIZE
+
+class ChatStore(ABC):
+    """
+    Data layer for users, chat sessions and chat messages.
+    Rows are plain dicts with the columns of public/db/script.sql.
+    """
+
+    @abstractmethod
+    def user_exists(self, email):
+        """Whether a user with this email exists."""
+
+    @abstractmethod
+    def get_user(self, user_id):
+        """Return the user row, or None."""
+
+    @abstractmethod
+    def insert_user(self, user_data):
+        """Insert a user row."""
+
+    @abstractmethod
+    def create_session(self, session_data):
+        """Insert a session and return the stored row, or None."""
+
+    @abstractmethod
+    def list_sessions(self, user_id, limit=None, before=None):
+        """
+        A user's sessions (id, title, created_at), newest first. `before` is
+        the (created_at, id) keyset of the last session of the previous page.
+        """
+
+    @abstractmethod
+    def insert_messages(self, messages):
+        """Insert message rows, ignoring rows whose id already exists."""
+
+    @abstractmethod
+    def get_messages(self, session_id, after=None):
+        """A session's messages oldest first, optionally only those newer than `after`."""
+
+    @abstractmethod
+    def delete_sessions(self, session_ids):
+        """Delete sessions and their messages. Returns the number of sessions deleted."""
+
+class SupabaseChatStore(ChatStore):
+    """Tables in Supabase, reached through PostgREST."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def user_exists(self, email):
+        result = self.connection.table('users')\
+            .select('id')\
+            .eq('email', email)\
+            .execute()
+        return len(result.data) > 0
+
+    def get_user(self, user_id):
+        response = self.connection.table('users')\
+            .select('*')\
+            .eq('id', user_id)\
+            .single()\
+            .execute()
+        return response.data if response else None
+
+    def insert_user(self, user_data):
+        self.connection.table('users').insert(user_data).execute()
+
+    def create_session(self, session_data):
+        result = self.connection.table('chat_sessions').insert(session_data).execute()
+        if result.data and isinstance(result.data, list):
+            return result.data[0]
+        return None
+
+    def list_sessions(self, user_id, limit=None, before=None):
+        query = self.connection.table('chat_sessions')\
+            .select('id,title,created_at')\
+            .eq('user_id', user_id)
+        if before:
+            created_at, session_id = before
+            query = query.or_(
+                f'created_at.lt."{created_at}",'
+                f'and(created_at.eq."{created_at}",id.lt.{session_id})'
+            )
+        query = query.order('created_at', desc=True).order('id', desc=True)
+        if limit:
+            query = query.limit(limit)
+        return query.execute().data
+
+    def insert_messages(self, messages):
+        self.connection.table('chat_messages')\
+            .upsert(messages, ignore_duplicates=True)\
+            .execute()
+
+    def get_messages(self, session_id, after=None):
+        query = self.connection.table('chat_messages')\
+            .select('*')\
+            .eq('session_id', session_id)
+        if after:
+            query = query.gt('created_at', after)
+        return query.order('created_at').execute().data
+
+    def delete_sessions(self, session_ids):
+        result = self.connection.client.rpc(
+            'delete_chat_sessions', {'p_session_ids': list(session_ids)}
+        ).execute()
+        return result.data or 0
+
+class SQLiteChatStore(ChatStore):
+    """
+    Tables in a local SQLite database mirroring public/db/script.sql, for
+    single-node deployments and load tests without a network service.
+
+    Connections are pooled and opened in WAL mode, so reads don't wait for
+    writers. Every query is a constant SQL string, so each pooled
+    connection compiles it once and reuses the prepared statement.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (
+            id TEXT PRIMARY KEY,
+            email TEXT NOT NULL UNIQUE,
+            name TEXT,
+            created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+        );
+        CREATE TABLE IF NOT EXISTS chat_sessions (
+            id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            title TEXT,
+            created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+        );
+        CREATE TABLE IF NOT EXISTS chat_messages (
+            id TEXT PRIMARY KEY,
+            session_id TEXT NOT NULL REFERENCES chat_sessions(id) ON DELETE CASCADE,
+            content TEXT,
+            role TEXT,
+            created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+        );
+        CREATE INDEX IF NOT EXISTS idx_chat_sessions_user_created
+            ON chat_sessions(user_id, created_at DESC, id DESC, title);
+        CREATE INDEX IF NOT EXISTS idx_chat_messages_session_created
+            ON chat_messages(session_id, created_at);
+    """
+
+    NOW = "strftime('%Y-%m-%dT%H:%M:%f', 'now')"
+
+    def __init__(self, path, pool_size=STORAGE_POOL_SIZE):
+        self.path = path
+        self.pool_size = pool_size
+        self._pool = queue.LifoQueue()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connection() as conn:
+            conn.executescript(self.SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path, check_same_thread=False, isolation_level=None, timeout=10
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        """Borrow a pooled connection, opening one when the pool is empty."""
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            yield conn
+        finally:
+            if self._pool.qsize() < self.pool_size:
+                self._pool.put(conn)
+            else:
+                conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        """A pooled connection inside a BEGIN IMMEDIATE write transaction."""
+        with self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _query(self, sql, params=()):
+        with self._connection() as conn:
+            return [dict(row) for row in conn.execute(sql, params)]
+
+    def user_exists(self, email):
+        return bool(self._query("SELECT 1 FROM users WHERE email = ? LIMIT 1", (email,)))
+
+    def get_user(self, user_id):
+        rows = self._query("SELECT * FROM users WHERE id = ?", (user_id,))
+        return rows[0] if rows else None
+
+    def insert_user(self, user_data):
+        with self._transaction() as conn:
+            conn.execute(
+                f"INSERT INTO users (id, email, name, created_at) VALUES (?, ?, ?, COALESCE(?, {self.NOW}))",
+                (user_data['id'], user_data['email'], user_data.get('name'),
+                 user_data.get('created_at'))
+            )
+
+    def create_session(self, session_data):
+        row = dict(session_data)
+        row.setdefault('id', str(uuid.uuid4()))
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO chat_sessions (id, user_id, title, created_at) "
+                f"VALUES (?, ?, ?, COALESCE(?, {self.NOW}))",
+                (row['id'], row['user_id'], row.get('title'), row.get('created_at'))
+            )
+        return row
+
+    def list_sessions(self, user_id, limit=None, before=None):
+        # Constant statements per shape, so each one is prepared once per connection
+        limit = -1 if not limit else limit
+        if before:
+            created_at, session_id = before
+            return self._query(
+                "SELECT id, title, created_at FROM chat_sessions "
+                "WHERE user_id = ? AND (created_at < ? OR (created_at = ? AND id < ?)) "
+                "ORDER BY created_at DESC, id DESC LIMIT ?",
+                (user_id, created_at, created_at, session_id, limit)
+            )
+        return self._query(
+            "SELECT id, title, created_at FROM chat_sessions WHERE user_id = ? "
+            "ORDER BY created_at DESC, id DESC LIMIT ?",
+            (user_id, limit)
+        )
+
+    def insert_messages(self, messages):
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT INTO chat_messages (id, session_id, content, role, created_at) "
+                f"VALUES (?, ?, ?, ?, COALESCE(?, {self.NOW})) ON CONFLICT(id) DO NOTHING",
+                [
+                    (m['id'], m['session_id'], m.get('content'), m.get('role'), m.get('created_at'))
+                    for m in messages
+                ]
+            )
+
+    def get_messages(self, session_id, after=None):
+        if after:
+            return self._query(
+                "SELECT * FROM chat_messages WHERE session_id = ? AND created_at > ? "
+                "ORDER BY created_at",
+                (session_id, after)
+            )
+        return self._query(
+            "SELECT * FROM chat_messages WHERE session_id = ? ORDER BY created_at",
+            (session_id,)
+        )
+
+    def delete_sessions(self, session_ids):
+        # One bound JSON array instead of a variable-length IN list
+        with self._transaction() as conn:
+            return conn.execute(
+                "DELETE FROM chat_sessions WHERE id IN (SELECT value FROM json_each(?))",
+                (json.dumps(list(session_ids)),)
+            ).rowcount
+
+def build_chat_store(backend, path=None):
+    """Create a chat store for the configured backend."""
+    if backend == "sqlite":
+        return SQLiteChatStore(path)
+    if backend == "supabase":
+        from services.clients import get_supabase_connection
+        return SupabaseChatStore(get_supabase_connection())
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+@st.cache_resource
+def get_chat_store():
+    """Chat data store shared by every session in the process."""
+    return build_chat_store(STORAGE_BACKEND, STORAGE_PATH)
@@ -0,0 +1,67 @@
+import httpx
+import streamlit as st
+from st_supabase_connection import SupabaseConnection
+from config.app_config import (
+    LLM_KEEPALIVE_SECONDS, LLM_MAX_CONNECTIONS, LLM_MAX_KEEPALIVE_CONNECTIONS,
+    LLM_TIMEOUT_SECONDS
+)
+
+def _pool_limits(max_connections, max_keepalive, keepalive_seconds):
+    return httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive,
+        keepalive_expiry=keepalive_seconds
+    )
+
+def build_groq_client(api_key, base_url=None, max_connections=LLM_MAX_CONNECTIONS,
+                      max_keepalive=LLM_MAX_KEEPALIVE_CONNECTIONS,
+                      keepalive_seconds=LLM_KEEPALIVE_SECONDS):
+    """Create a Groq client on a keep-alive HTTP connection pool."""
+    # Imported on first use; the login page only needs the Supabase client
+    import groq
+    http_client = httpx.Client(
+        limits=_pool_limits(max_connections, max_keepalive, keepalive_seconds),
+        timeout=LLM_TIMEOUT_SECONDS
+    )
+    return groq.Groq(api_key=api_key, base_url=base_url, http_client=http_client)
+
+def build_async_groq_client(api_key, base_url=None, max_connections=LLM_MAX_CONNECTIONS,
+                            max_keepalive=LLM_MAX_KEEPALIVE_CONNECTIONS,
+                            keepalive_seconds=LLM_KEEPALIVE_SECONDS):
+    """Create an async Groq client on a keep-alive HTTP connection pool."""
+    import groq
+    http_client = httpx.AsyncClient(
+        limits=_pool_limits(max_connections, max_keepalive, keepalive_seconds),
+        timeout=LLM_TIMEOUT_SECONDS
+    )
+    return groq.AsyncGroq(api_key=api_key, base_url=base_url, http_client=http_client)
+
+@st.cache_resource
+def get_groq_client():
+    """Groq client shared by every session in the process."""
+    return build_groq_client(st.secrets["GROQ_API_KEY"])
+
+@st.cache_resource
+def get_async_model_manager():
+    """
+    Hedging model manager shared by every session in the process.
+    Its async client is bound to the manager's own event loop, so the two
+    are shared together.
+    """
+    from agents.async_model_manager import AsyncModelManager
+    return AsyncModelManager(client=build_async_groq_client(st.secrets["GROQ_API_KEY"]))
+
+@st.cache_resource
+def get_supabase_connection():
+    """Supabase connection shared by every session in the process."""
+    return st.connection(
+        "supabase",
+        type=SupabaseConnection,
+        ttl=None,
+        url=st.secrets["SUPABASE_URL"],
+        key=st.secrets["SUPABASE_KEY"],
+        client_options={
+            "timeout": 30,  # 30 seconds timeout
+            "retries": 3,   # 3 retries
+        }
+    )
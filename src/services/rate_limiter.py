@@ -0,0 +1,183 @@
+import logging
+import os
+from abc import ABC, abstractmethod
+import sqlite3
+import threading
+import time
+import streamlit as st
+from config.app_config import (
+    ANALYSIS_DAILY_LIMIT, RATE_LIMIT_BACKEND, RATE_LIMIT_PATH
+)
+
+logger = logging.getLogger(__name__)
+
+class RateLimiter(ABC):
+    """
+    Token bucket rate limiter. Each key holds up to `capacity` tokens that
+    refill continuously at `refill_per_second`; every check-and-consume is a
+    single O(1) atomic update of (tokens, updated_at) in the backend.
+
+    All methods return (allowed, remaining, retry_after_seconds).
+    """
+
+    def __init__(self, capacity, refill_per_second):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+
+    def try_acquire(self, key, cost=1):
+        """Consume `cost` tokens if available."""
+        return self._consume(key, cost)
+
+    def peek(self, key):
+        """Report whether one token is available without consuming it."""
+        _, remaining, _ = self._consume(key, 0)
+        if remaining >= 1:
+            return True, remaining, 0.0
+        return False, remaining, (1 - remaining) / self.refill_per_second
+
+    def refund(self, key, cost=1):
+        """Give back tokens for a request that did not use the quota."""
+        return self._consume(key, -cost)
+
+    @abstractmethod
+    def _consume(self, key, cost):
+        """
+        Atomically refill the key's bucket and take `cost` tokens; a zero
+        cost only reports the bucket and a negative one refunds tokens.
+        """
+
+    def _apply(self, state, cost, now):
+        """
+        Refill a (tokens, updated_at) state up to now and try to take `cost`.
+        Returns (allowed, tokens_after, retry_after).
+        """
+        if state is None:
+            tokens = float(self.capacity)
+        else:
+            tokens, updated_at = state
+            tokens = min(self.capacity, tokens + max(0.0, now - updated_at) * self.refill_per_second)
+        if tokens >= cost:
+            return True, min(self.capacity, tokens - cost), 0.0
+        return False, tokens, (cost - tokens) / self.refill_per_second
+
+class MemoryRateLimiter(RateLimiter):
+    """Per-process buckets; limits are shared by sessions but not replicas."""
+
+    def __init__(self, capacity, refill_per_second):
+        super().__init__(capacity, refill_per_second)
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _consume(self, key, cost):
+        now = time.time()
+        with self._lock:
+            allowed, tokens, retry_after = self._apply(self._buckets.get(key), cost, now)
+            if allowed and cost:
+                self._buckets[key] = (tokens, now)
+        return allowed, tokens, retry_after
+
+class SQLiteRateLimiter(RateLimiter):
+    """
+    Buckets in a local SQLite database, shared by every process on the host.
+    Each update runs in a BEGIN IMMEDIATE transaction, so concurrent
+    check-and-consume calls are serialized by SQLite's write lock.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS rate_limits (
+            key TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            updated_at REAL NOT NULL
+        );
+    """
+
+    def __init__(self, capacity, refill_per_second, path):
+        super().__init__(capacity, refill_per_second)
+        self.path = path
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None, timeout=10
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+
+    def _consume(self, key, cost):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                state = self._conn.execute(
+                    "SELECT tokens, updated_at FROM rate_limits WHERE key = ?", (key,)
+                ).fetchone()
+                allowed, tokens, retry_after = self._apply(state, cost, now)
+                if allowed and cost:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO rate_limits (key, tokens, updated_at) "
+                        "VALUES (?, ?, ?)",
+                        (key, tokens, now)
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return allowed, tokens, retry_after
+
+class SupabaseRateLimiter(RateLimiter):
+    """
+    Buckets in Postgres, shared by every app replica. The refill and
+    consume run inside the consume_rate_limit function (migration 003)
+    under a row lock, so each check is one round trip.
+
+    The database's rate_limit_policies table fixes each key scope's
+    capacity and refill rate; the constructor arguments must match it.
+    Peeks and refunds go through their own functions, since
+    consume_rate_limit only takes a positive cost.
+    """
+
+    def __init__(self, capacity, refill_per_second, connection):
+        super().__init__(capacity, refill_per_second)
+        self.connection = connection
+
+    def peek(self, key):
+        return self._call('peek_rate_limit', {'p_key': key})
+
+    def refund(self, key, cost=1):
+        return self._call('refund_rate_limit', {'p_key': key, 'p_cost': cost})
+
+    def _consume(self, key, cost):
+        return self._call('consume_rate_limit', {'p_key': key, 'p_cost': cost})
+
+    def _call(self, function, params):
+        row = self.connection.client.rpc(function, params).execute().data[0]
+        return row['allowed'], row['remaining'], row['retry_after']
+
+def build_rate_limiter(backend, capacity, refill_per_second, path=None):
+    """Create a rate limiter for the configured backend."""
+    if backend == "memory":
+        return MemoryRateLimiter(capacity, refill_per_second)
+    if backend == "sqlite":
+        return SQLiteRateLimiter(capacity, refill_per_second, path)
+    if backend == "supabase":
+        from services.clients import get_supabase_connection
+        return SupabaseRateLimiter(capacity, refill_per_second, get_supabase_connection())
+    raise ValueError(f"Unknown rate limit backend: {backend}")
+
+@st.cache_resource
+def get_rate_limiter():
+    """
+    Daily analysis limiter shared by every session in the process.
+    The bucket holds ANALYSIS_DAILY_LIMIT analyses and refills over 24 hours.
+    """
+    try:
+        return build_rate_limiter(
+            RATE_LIMIT_BACKEND,
+            capacity=ANALYSIS_DAILY_LIMIT,
+            refill_per_second=ANALYSIS_DAILY_LIMIT / 86400,
+            path=RATE_LIMIT_PATH
+        )
+    except sqlite3.Error as e:
+        logger.error(f"Failed to open rate limit store, using memory: {str(e)}")
+        return MemoryRateLimiter(ANALYSIS_DAILY_LIMIT, ANALYSIS_DAILY_LIMIT / 86400)
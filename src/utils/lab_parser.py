@@ -0,0 +1,188 @@
+import re
+from array import array
+
+# Canonical analyte keys and the names they commonly appear under in reports
+ANALYTE_ALIASES = {
+    "hemoglobin": ["hemoglobin", "haemoglobin", "hb", "hgb"],
+    "wbc": ["white blood cells", "white blood cell count", "wbc", "wbc count",
+            "total leucocyte count", "total leukocyte count", "tlc", "leukocytes"],
+    "rbc": ["red blood cells", "red blood cell count", "rbc", "rbc count", "erythrocytes"],
+    "platelet": ["platelets", "platelet count", "plt"],
+    "hematocrit": ["hematocrit", "haematocrit", "hct", "pcv", "packed cell volume"],
+    "mcv": ["mcv", "mean corpuscular volume"],
+    "mch": ["mch", "mean corpuscular hemoglobin"],
+    "mchc": ["mchc", "mean corpuscular hemoglobin concentration"],
+    "glucose": ["glucose", "glucose (fasting)", "fasting glucose", "fasting blood sugar",
+                "fbs", "blood sugar", "glucose fasting"],
+    "hba1c": ["hba1c", "glycated hemoglobin", "glycosylated hemoglobin"],
+    "creatinine": ["creatinine", "serum creatinine"],
+    "bun": ["bun", "blood urea nitrogen"],
+    "urea": ["urea", "blood urea"],
+    "sodium": ["sodium", "na"],
+    "potassium": ["potassium", "k"],
+    "chloride": ["chloride", "cl"],
+    "calcium": ["calcium", "ca"],
+    "cholesterol": ["total cholesterol", "cholesterol", "cholesterol total"],
+    "hdl": ["hdl cholesterol", "hdl", "hdl-c"],
+    "ldl": ["ldl cholesterol", "ldl", "ldl-c"],
+    "triglycerides": ["triglycerides", "tg"],
+    "alt": ["alt", "sgpt", "alanine aminotransferase"],
+    "ast": ["ast", "sgot", "aspartate aminotransferase"],
+    "alp": ["alkaline phosphatase", "alp"],
+    "bilirubin": ["total bilirubin", "bilirubin", "bilirubin total"],
+    "tsh": ["tsh", "thyroid stimulating hormone"],
+    "t3": ["t3", "total t3", "free t3"],
+    "t4": ["t4", "total t4", "free t4"],
+    "vitamin_d": ["vitamin d", "25-oh vitamin d", "vitamin d3"],
+    "vitamin_b12": ["vitamin b12", "b12"],
+    "iron": ["iron", "serum iron"],
+    "ferritin": ["ferritin", "serum ferritin"],
+    "uric_acid": ["uric acid", "serum uric acid"],
+    "amylase": ["amylase"],
+    "lipase": ["lipase"],
+}
+
+ANALYTE_INDEX = {
+    alias: canonical
+    for canonical, aliases in ANALYTE_ALIASES.items()
+    for alias in aliases
+}
+
+_NUMBER = r"\d[\d,]*(?:\.\d+)?"
+
+LAB_LINE_PATTERN = re.compile(
+    r"^\s*(?P<name>[A-Za-z][A-Za-z0-9 ()/,.\-]*?)\s*[:\-]?\s+"
+    r"(?P<value>[<>]?\s*" + _NUMBER + r")\s*"
+    r"(?P<unit>%|\d+[\^*]\d+/[^\s()\[\]]+|[^\s\d()\[\]:<>][^\s()\[\]]*)?\s*"
+    r"(?:[(\[]?\s*(?:reference|ref\.?|normal|range|bio\.? ref\.? interval)?\s*(?:range)?\s*:?\s*"
+    r"(?P<range>(?:[<>]=?\s*" + _NUMBER + r"|" + _NUMBER + r"\s*-\s*" + _NUMBER + r")\s*%?)"
+    r"\s*[)\]]?)?"
+    # Abnormal flag as printed by the lab (or by LabTable.to_compact_text)
+    r"(?:\s+\(?(?P<flag>high|low|[HL]|[↑↓])\)?)?\s*$",
+    re.IGNORECASE
+)
+
+# Names of report metadata lines that look like "label: number"
+NON_ANALYTE_PATTERN = re.compile(
+    r"\b(?:page|age|date|id|no|number|phone|mobile|year|years|time|pin)\b",
+    re.IGNORECASE
+)
+
+def canonical_analyte(name):
+    """Map a report analyte name onto its canonical key."""
+    key = re.sub(r"\s+", " ", name.strip().lower())
+    if key in ANALYTE_INDEX:
+        return ANALYTE_INDEX[key]
+    # Drop qualifiers such as "(Fasting)" before falling back to a slug
+    base = re.sub(r"\s*\(.*?\)", "", key).strip()
+    if base in ANALYTE_INDEX:
+        return ANALYTE_INDEX[base]
+    return re.sub(r"[^a-z0-9]+", "_", base).strip("_")
+
+def _to_float(number):
+    return float(number.replace(",", "").lstrip("<>").strip())
+
+def _printed_flag(flag):
+    """Normalize a flag printed in the report to 'H', 'L' or ''."""
+    if not flag:
+        return ""
+    return "H" if flag[0] in "Hh↑" else "L"
+
+class LabTable:
+    """
+    Columnar table of parsed lab results.
+    Values are stored in a float array alongside parallel name, unit, range
+    and flag columns, with an index from canonical analyte key to row.
+    Flags are only those printed in the report; they are never derived from
+    the range, whose bounds labs don't print consistently.
+    """
+
+    __slots__ = ("names", "analytes", "values", "units", "ranges", "flags", "index")
+
+    def __init__(self):
+        self.names = []
+        self.analytes = []
+        self.values = array("d")
+        self.units = []
+        self.ranges = []
+        self.flags = []
+        self.index = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, analyte):
+        return analyte in self.index
+
+    def append(self, name, value, unit="", ref_range="", flag=""):
+        """Add a row; returns False if the analyte is already in the table."""
+        analyte = canonical_analyte(name)
+        if analyte in self.index:
+            # Keep the first occurrence, repeated page headers often duplicate rows
+            return False
+        self.index[analyte] = len(self.names)
+        self.names.append(name)
+        self.analytes.append(analyte)
+        self.values.append(value)
+        self.units.append(unit)
+        self.ranges.append(ref_range)
+        self.flags.append(flag)
+        return True
+
+    def get(self, analyte):
+        """Return (name, value, unit, range, flag) for a canonical analyte or None."""
+        row = self.index.get(analyte)
+        if row is None:
+            return None
+        return (self.names[row], self.values[row], self.units[row],
+                self.ranges[row], self.flags[row])
+
+    def rows(self):
+        return zip(self.names, self.values, self.units, self.ranges, self.flags)
+
+    def format_row(self, row):
+        """One short line for a row, e.g. "Hemoglobin: 13.5 g/dL [12.0-15.5]"."""
+        name, value, unit, ref_range, flag = (
+            self.names[row], self.values[row], self.units[row], self.ranges[row], self.flags[row]
+        )
+        line = f"{name}: {value:g}"
+        if unit:
+            line += f" {unit}" if unit != "%" else unit
+        if ref_range:
+            line += f" [{ref_range}]"
+        if flag:
+            line += f" {flag}"
+        return line
+
+    def to_compact_text(self):
+        """Serialize as one short line per analyte for the model prompt."""
+        return "\n".join(self.format_row(row) for row in range(len(self)))
+
+def parse_lab_line(line):
+    """Parse a single report line into (name, value, unit, range, flag) or None."""
+    match = LAB_LINE_PATTERN.match(line)
+    if not match:
+        return None
+    try:
+        value = _to_float(match.group("value"))
+    except ValueError:
+        return None
+    name = match.group("name").strip(" -:")
+    if not name or NON_ANALYTE_PATTERN.search(name):
+        return None
+    unit = (match.group("unit") or "").strip()
+    ref_range = re.sub(r"\s+", "", match.group("range") or "")
+    flag = match.group("flag")
+    if not flag and not ref_range and unit.lower() in ("h", "l", "high", "low"):
+        # "WBC 12.1 H": without a range the printed flag lands in the unit column
+        unit, flag = "", unit
+    return name, value, unit, ref_range, _printed_flag(flag)
+
+def parse_lab_report(text):
+    """Extract analyte rows from report text into a LabTable."""
+    table = LabTable()
+    for line in text.splitlines():
+        parsed = parse_lab_line(line)
+        if parsed:
+            table.append(*parsed)
+    return table
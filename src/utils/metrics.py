@@ -0,0 +1,244 @@
+import atexit
+import bisect
+import functools
+import logging
+import os
+import threading
+import time
+import streamlit as st
+from config.app_config import (
+    METRICS_BUCKETS, METRICS_ENABLED, METRICS_EXPORT, METRICS_FILE,
+    METRICS_FILE_INTERVAL_SECONDS, METRICS_HOST, METRICS_PORT
+)
+
+logger = logging.getLogger(__name__)
+
+SPAN_METRIC = "hia_span_duration_seconds"
+TOKEN_METRIC = "hia_llm_tokens_total"
+
+HELP = {
+    SPAN_METRIC: "Duration of instrumented operations in seconds.",
+    TOKEN_METRIC: "LLM tokens reported by completion usage.",
+}
+
+class _Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, bucket_count):
+        self.counts = [0] * bucket_count
+        self.sum = 0.0
+        self.count = 0
+
+class MetricsRegistry:
+    """
+    Process-wide histograms and counters, keyed by metric name and label
+    set, rendered in the Prometheus text exposition format.
+    """
+
+    def __init__(self, buckets=METRICS_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, value, labels):
+        key = (name, tuple(sorted(labels.items())))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(len(self.buckets) + 1)
+            histogram.counts[index] += 1
+            histogram.sum += value
+            histogram.count += 1
+
+    def increment(self, name, value, labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def render(self):
+        """Every metric in the Prometheus text format."""
+        with self._lock:
+            histograms = {key: (list(h.counts), h.sum, h.count) for key, h in self._histograms.items()}
+            counters = dict(self._counters)
+
+        lines = []
+        for name in sorted({name for name, _ in histograms}):
+            lines += [f"# HELP {name} {HELP.get(name, name)}", f"# TYPE {name} histogram"]
+            for (metric, labels), (counts, total, count) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{_labels(labels, le=_number(bound))} {cumulative}")
+                lines.append(f"{name}_bucket{_labels(labels, le='+Inf')} {count}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(total)}")
+                lines.append(f"{name}_count{_labels(labels)} {count}")
+        for name in sorted({name for name, _ in counters}):
+            lines += [f"# HELP {name} {HELP.get(name, name)}", f"# TYPE {name} counter"]
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+# A module-level registry rather than a cache_resource getter: spans are
+# recorded from worker threads and the batch CLI, outside any script run
+REGISTRY = MetricsRegistry()
+_enabled = METRICS_ENABLED
+
+def enable(enabled=True):
+    """Turn recording on or off for the process, e.g. for benchmarks."""
+    global _enabled
+    _enabled = enabled
+
+def is_enabled():
+    return _enabled
+
+class Span:
+    """Times a block into the span histogram; labels can be added while it runs."""
+
+    __slots__ = ("name", "labels", "started")
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+
+    def set(self, **labels):
+        self.labels.update(labels)
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        elapsed = time.perf_counter() - self.started
+        if "outcome" not in self.labels:
+            # Streamlit's rerun and stop signals are BaseExceptions, not failures
+            failed = exc_type is not None and issubclass(exc_type, Exception)
+            self.labels["outcome"] = "error" if failed else "ok"
+        REGISTRY.observe(SPAN_METRIC, elapsed, {"span": self.name, **self.labels})
+        return False
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **labels):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+_NOOP_SPAN = _NoopSpan()
+
+def span(name, **labels):
+    """
+    Context manager timing a block as span `name`. The outcome label is
+    "error" when the block raises, unless set explicitly. While metrics
+    are disabled this returns a shared no-op object.
+    """
+    if not _enabled:
+        return _NOOP_SPAN
+    return Span(name, labels)
+
+def timed(name):
+    """Decorator timing every call of a function as span `name`."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with Span(name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def record_token_usage(model, usage):
+    """Count the prompt and completion tokens of a completion's usage."""
+    if not _enabled or usage is None:
+        return
+    for kind in ("prompt", "completion"):
+        tokens = getattr(usage, f"{kind}_tokens", None)
+        if tokens:
+            REGISTRY.increment(TOKEN_METRIC, tokens, {"model": model, "kind": kind})
+
+def serve_metrics(host=METRICS_HOST, port=METRICS_PORT):
+    """Serve GET /metrics from a daemon thread. Returns the server."""
+    # Only loaded when the endpoint is enabled
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = REGISTRY.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info(f"Serving metrics on http://{host}:{server.server_port}/metrics")
+    return server
+
+def write_metrics(path=METRICS_FILE):
+    """Atomically write the metrics to a file, e.g. for a textfile collector."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temporary = f"{path}.tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        f.write(REGISTRY.render())
+    os.replace(temporary, path)
+
+def _write_periodically(path, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            write_metrics(path)
+        except OSError as e:
+            logger.error(f"Failed to write metrics: {str(e)}")
+
+@st.cache_resource
+def start_metrics_export():
+    """Start the configured metrics exporter once per process, if enabled."""
+    if not _enabled:
+        return None
+    if METRICS_EXPORT == "file":
+        threading.Thread(
+            target=_write_periodically, args=(METRICS_FILE, METRICS_FILE_INTERVAL_SECONDS),
+            name="metrics-file", daemon=True
+        ).start()
+        atexit.register(write_metrics, METRICS_FILE)
+        return METRICS_FILE
+    try:
+        return serve_metrics()
+    except OSError as e:
+        logger.error(f"Failed to start metrics endpoint: {str(e)}")
+        return None
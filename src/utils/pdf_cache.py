@@ -0,0 +1,101 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class PDFTextCache:
+    """
+    Bounded LRU cache of extracted PDF text keyed by a hash of the file bytes.
+    Entries are evicted least-recently-used first once the stored text
+    exceeds the configured size budget.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.parse_seconds = 0.0
+        self.seconds_saved = 0.0
+
+    @staticmethod
+    def make_key(file_bytes):
+        """Return the cache key for raw PDF bytes."""
+        return hashlib.sha256(file_bytes).hexdigest()
+
+    @staticmethod
+    def _entry_size(text):
+        return len(text.encode("utf-8")) if text else 0
+
+    def get(self, key):
+        """Return the cached (is_valid, text) pair or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.seconds_saved += entry["parse_seconds"]
+            return entry["is_valid"], entry["text"]
+
+    def put(self, key, is_valid, text, parse_seconds=0.0):
+        """Store an extraction result, evicting old entries to stay in budget."""
+        size = self._entry_size(text)
+        with self._lock:
+            self.parse_seconds += parse_seconds
+            if size > self.max_bytes:
+                return
+            if key in self._entries:
+                self._size -= self._entries.pop(key)["size"]
+            self._entries[key] = {
+                "is_valid": is_valid,
+                "text": text,
+                "size": size,
+                "parse_seconds": parse_seconds
+            }
+            self._size += size
+            while self._size > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= evicted["size"]
+                self.evictions += 1
+
+    def get_or_extract(self, file_bytes, extract):
+        """
+        Return the cached result for file_bytes, calling extract() on a miss.
+        extract must return an (is_valid, text_or_error) pair.
+        """
+        key = self.make_key(file_bytes)
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        started = time.perf_counter()
+        is_valid, text = extract()
+        self.put(key, is_valid, text, time.perf_counter() - started)
+        return is_valid, text
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        """Return hit/miss counters and the parse time saved by cache hits."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "size_bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "parse_seconds": self.parse_seconds,
+                "seconds_saved": self.seconds_saved
+            }
@@ -1,32 +1,176 @@
-import pdfplumber
+import io
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import streamlit as st
-from config.app_config import MAX_PDF_PAGES
+from config.app_config import (
+    MAX_PDF_PAGES, PDF_CACHE_MAX_MB, PDF_EXTRACT_START_METHOD, PDF_EXTRACT_WORKERS,
+    PDF_PARALLEL_MIN_PAGES, PDF_STREAM_PAGES
+)
+from utils.metrics import span
+from utils.pdf_cache import PDFTextCache
+from utils.pdf_pages import PAGE_BREAK, extract_page_range, extract_pages, iter_page_text
 from utils.validators import validate_pdf_file, validate_pdf_content
 
-def extract_text_from_pdf(pdf_file):
+logger = logging.getLogger(__name__)
+
+SCANNED_PDF_ERROR = "Could not extract text from PDF. Please ensure it's not a scanned document."
+
+@st.cache_resource
+def get_pdf_cache():
+    """Process-wide cache of extracted PDF text, shared across reruns."""
+    return PDFTextCache(max_bytes=PDF_CACHE_MAX_MB * 1024 * 1024)
+
+def build_pdf_pool(workers=None, start_method=PDF_EXTRACT_START_METHOD):
+    """
+    Create a process pool for page extraction, or None if it can't start.
+    Workers are spawned rather than forked, so they never inherit the
+    threads and locks of the running Streamlit server, and only import
+    utils.pdf_pages.
+    """
+    workers = workers or PDF_EXTRACT_WORKERS or os.cpu_count() or 1
+    try:
+        return ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context(start_method)
+        )
+    except (OSError, ValueError) as e:
+        logger.warning(f"PDF extraction pool unavailable, extracting serially: {str(e)}")
+        return None
+
+@st.cache_resource
+def get_pdf_pool():
+    """Page extraction process pool shared by every session in the process."""
+    return build_pdf_pool()
+
+def extract_text_from_pdf(pdf_file, workers=None):
     """Extract and validate text from PDF file."""
+    _, result = _extract_and_validate(pdf_file, workers)
+    return result
+
+def extract_text_from_pdf_cached(pdf_file, workers=None):
+    """
+    Extract and validate text from PDF file, reusing the result of a previous
+    extraction of the same file contents.
+    """
+    is_valid, error = validate_pdf_file(pdf_file)
+    if not is_valid:
+        return error
+
+    cache = get_pdf_cache()
+    with span("pdf_extract_cached"):
+        _, result = cache.get_or_extract(
+            pdf_file.getvalue(),
+            lambda: _extract_and_validate(pdf_file, workers)
+        )
+    logger.debug("PDF cache stats: %s", cache.stats())
+    return result
+
+def _extract_and_validate(pdf_file, workers=None):
+    """Return (is_valid, text) on success or (False, error message) on failure."""
     try:
         # Validate file first
         is_valid, error = validate_pdf_file(pdf_file)
         if not is_valid:
-            return error
-
-        text = ""
-        with pdfplumber.open(pdf_file) as pdf:
-            if len(pdf.pages) > MAX_PDF_PAGES:
-                return f"PDF exceeds maximum page limit of {MAX_PDF_PAGES}"
-                
-            for page in pdf.pages:
-                extracted = page.extract_text()
-                if not extracted:
-                    return "Could not extract text from PDF. Please ensure it's not a scanned document."
-                text += extracted + "\n"
-        
-        # Validate extracted content
-        is_valid, error = validate_pdf_content(text)
+            return False, error
+
+        return extract_text_from_bytes(pdf_file.getvalue(), workers)
+    except Exception as e:
+        return False, f"Error extracting text from PDF: {str(e)}"
+
+def extract_text_from_bytes(pdf_bytes, workers=None):
+    """
+    Extract and validate text from raw PDF bytes.
+    Returns (is_valid, text) on success or (False, error message) on failure.
+    """
+    with span("pdf_extract") as timer:
+        is_valid, result = _extract_text(pdf_bytes, workers)
         if not is_valid:
-            return error
-            
-        return text
+            timer.set(outcome="invalid")
+        return is_valid, result
+
+def _extract_text(pdf_bytes, workers):
+    # pdfplumber (and pdfminer) only load once a PDF is actually parsed
+    import pdfplumber
+    try:
+        with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+            page_count = len(pdf.pages)
+            if page_count > MAX_PDF_PAGES:
+                return False, f"PDF exceeds maximum page limit of {MAX_PDF_PAGES}"
+
+            # Stream the leading pages: a page without text fails the upload
+            # whatever follows, so scanned documents are rejected before the
+            # rest is parsed. Medical terms may only appear after a cover
+            # letter, consent form or invoice, so the content check below
+            # always sees every page.
+            pages = []
+            for extracted in iter_page_text(pdf.pages[:PDF_STREAM_PAGES]):
+                if not extracted:
+                    return False, SCANNED_PDF_ERROR
+                pages.append(extracted)
+
+            start = len(pages)
+            workers = _resolve_workers(workers, page_count - start)
+            if workers <= 1:
+                pages.extend(extract_pages(pdf.pages[start:]))
+
+        if workers > 1:
+            pages.extend(_extract_pages_parallel(pdf_bytes, start, page_count, workers))
+
+        return validate_pages(page_count, pages)
     except Exception as e:
-        return f"Error extracting text from PDF: {str(e)}"
+        return False, f"Error extracting text from PDF: {str(e)}"
+
+def validate_pages(page_count, pages):
+    """
+    Join extracted page texts and validate them, e.g. the result of
+    pdf_pages.extract_document run in a worker process.
+    Returns (is_valid, text) on success or (False, error message) on failure.
+    """
+    if page_count > MAX_PDF_PAGES:
+        return False, f"PDF exceeds maximum page limit of {MAX_PDF_PAGES}"
+    if any(not page for page in pages):
+        return False, SCANNED_PDF_ERROR
+    text = PAGE_BREAK.join(page + "\n" for page in pages)
+
+    # Validate extracted content
+    is_valid, error = validate_pdf_content(text)
+    if not is_valid:
+        return False, error
+    return True, text
+
+def _resolve_workers(workers, page_count):
+    """Pick the worker count, falling back to serial for small documents."""
+    if page_count < PDF_PARALLEL_MIN_PAGES:
+        return 1
+    if workers is None:
+        workers = PDF_EXTRACT_WORKERS or os.cpu_count() or 1
+    return max(1, min(workers, page_count))
+
+def _extract_pages_parallel(pdf_bytes, first_page, end_page, workers):
+    """Split pages [first_page, end_page) into contiguous slices and extract them in parallel."""
+    step, extra = divmod(end_page - first_page, workers)
+    bounds = []
+    start = first_page
+    for i in range(workers):
+        stop = start + step + (1 if i < extra else 0)
+        bounds.append((start, stop))
+        start = stop
+
+    pool = get_pdf_pool()
+    if pool is not None:
+        try:
+            futures = [
+                pool.submit(extract_page_range, pdf_bytes, start, stop)
+                for start, stop in bounds
+            ]
+            pages = []
+            for future in futures:
+                pages.extend(future.result())
+            return pages
+        except (BrokenProcessPool, OSError, RuntimeError) as e:
+            # Start a fresh pool on the next upload instead of reusing a broken one
+            logger.warning(f"PDF extraction pool failed, extracting serially: {str(e)}")
+            get_pdf_pool.clear()
+    return extract_page_range(pdf_bytes, first_page, end_page)
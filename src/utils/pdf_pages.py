@@ -0,0 +1,39 @@
+import io
+
+# Entry points for the extraction worker processes. Spawned workers import
+# this module only, so it must not pull in Streamlit or the app config.
+
+# Separates pages in extracted text, so repeated headers and footers can be
+# told apart from repeated values. str.splitlines() treats it as a line break.
+PAGE_BREAK = "\f"
+
+def iter_page_text(pages):
+    """Yield the extracted text of each page, one page at a time."""
+    for page in pages:
+        yield page.extract_text()
+
+def extract_pages(pages):
+    """Extract text page by page, stopping at the first page without text."""
+    texts = []
+    for extracted in iter_page_text(pages):
+        texts.append(extracted)
+        if not extracted:
+            break
+    return texts
+
+def extract_document(pdf_bytes, max_pages):
+    """
+    Worker entry point: return (page count, page texts) of a whole PDF.
+    Documents over max_pages are not parsed and return no pages.
+    """
+    import pdfplumber
+    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        if len(pdf.pages) > max_pages:
+            return len(pdf.pages), []
+        return len(pdf.pages), extract_pages(pdf.pages)
+
+def extract_page_range(pdf_bytes, start, stop):
+    """Worker entry point: open the PDF and extract pages [start, stop)."""
+    import pdfplumber
+    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        return extract_pages(pdf.pages[start:stop])
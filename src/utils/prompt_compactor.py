@@ -0,0 +1,131 @@
+import re
+from collections import Counter
+from config.app_config import LAB_TABLE_MIN_ROWS, PAGE_FURNITURE_LINES
+from utils.lab_parser import LabTable, parse_lab_line
+from utils.pdf_pages import PAGE_BREAK
+
+# Roughly matches how BPE tokenizers split text: word pieces, numbers and
+# individual punctuation marks
+_TOKEN_PATTERN = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+_WHITESPACE = re.compile(r"[ \t\u00a0]+")
+
+TRUNCATION_MARKER = "[report truncated]"
+
+# Page furniture that carries no clinical content
+BOILERPLATE_PATTERN = re.compile(
+    r"^(?:page\s*\d+(?:\s*(?:of|/)\s*\d+)?"
+    r"|[-*=\s]*end of (?:the )?report[-*=\s]*"
+    r"|(?:this is an? )?(?:computer|electronically|system)[ -]generated (?:report|document)\.?"
+    r"|printed (?:on|at)\b.*)$",
+    re.IGNORECASE
+)
+
+def estimate_tokens(text):
+    """Estimate the model token count of text without a remote tokenizer."""
+    if not text:
+        return 0
+    tokens = 0
+    for piece in _TOKEN_PATTERN.findall(text):
+        # Long words and numbers are split into several tokens
+        tokens += 1 + (len(piece) - 1) // 4 if piece[0].isalpha() else 1 + (len(piece) - 1) // 3
+    return tokens
+
+def normalize_lines(text):
+    """Collapse runs of whitespace and return the non-empty lines."""
+    lines = []
+    for line in text.splitlines():
+        line = _WHITESPACE.sub(" ", line).strip()
+        if line:
+            lines.append(line)
+    return lines
+
+def strip_page_furniture(pages, depth=PAGE_FURNITURE_LINES):
+    """
+    Drop page headers and footers: the runs of whole lines at the top or
+    bottom of a page that also sit at the same position on at least half
+    of the pages (and at least two). The first page keeps its copy. Lines
+    repeated anywhere else, such as a second "Negative" result, are kept.
+    Returns the lines in order.
+    """
+    pages = [page for page in pages if page]
+    if len(pages) < 2:
+        return [line for page in pages for line in page]
+
+    # (position, line) slots near the page edges; top rows count from 0,
+    # bottom rows from -1
+    slots = Counter()
+    for page in pages:
+        edge = min(depth, len(page))
+        slots.update({(position, page[position]) for position in (*range(edge), *range(-edge, 0))})
+    threshold = max(2, (len(pages) + 1) // 2)
+
+    def run_length(page, positions):
+        length = 0
+        for position in positions:
+            line = page[position]
+            # Page numbers differ per page but don't end a header or footer
+            if slots[(position, line)] < threshold and not BOILERPLATE_PATTERN.match(line):
+                break
+            length += 1
+        return length
+
+    lines = list(pages[0])
+    for page in pages[1:]:
+        edge = min(depth, len(page))
+        header = run_length(page, range(edge))
+        footer = run_length(page, range(-1, -edge - 1, -1))
+        lines += page[header:max(header, len(page) - footer)]
+    return lines
+
+def compact_report_text(text):
+    """
+    Reduce raw report text to what the model needs. When enough analytes
+    are recognised, lab value rows are rewritten in the short table form in
+    place. Every other line (qualitative results, impressions, notes) is
+    kept as written; only page headers, footers and furniture are dropped.
+    """
+    pages = [normalize_lines(page) for page in text.split(PAGE_BREAK)]
+    lines = [
+        line for line in strip_page_furniture(pages)
+        if not BOILERPLATE_PATTERN.match(line)
+    ]
+    table = LabTable()
+    compacted = []
+    for line in lines:
+        parsed = parse_lab_line(line)
+        if parsed and table.append(*parsed):
+            compacted.append(table.format_row(len(table) - 1))
+        else:
+            compacted.append(line)
+    if len(table) >= LAB_TABLE_MIN_ROWS:
+        return "\n".join(compacted)
+    return "\n".join(lines)
+
+def serialize_report_data(data):
+    """Serialize analysis input as plain labelled lines instead of a dict repr."""
+    if not isinstance(data, dict):
+        return str(data)
+    lines = []
+    for key, label in (("patient_name", "Patient"), ("age", "Age"), ("gender", "Gender")):
+        value = data.get(key)
+        if value not in (None, ""):
+            lines.append(f"{label}: {value}")
+    lines.append("Report:")
+    lines.append(str(data.get("report", "")))
+    return "\n".join(lines)
+
+def fit_to_budget(text, budget):
+    """Drop trailing lines until the estimated token count fits the budget."""
+    if budget is None or estimate_tokens(text) <= budget:
+        return text
+    budget -= estimate_tokens(TRUNCATION_MARKER) + 1
+    kept = []
+    used = 0
+    for line in text.split("\n"):
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget:
+            break
+        kept.append(line)
+        used += cost
+    kept.append(TRUNCATION_MARKER)
+    return "\n".join(kept)
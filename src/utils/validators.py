@@ -1,5 +1,6 @@
 import re
 from config.app_config import MAX_UPLOAD_SIZE_MB
+from utils.metrics import span
 
 def validate_password(password):
     """Validate password meets security requirements."""
@@ -51,24 +52,33 @@ def validate_pdf_file(file):
         
     return True, None
 
+# Common medical report indicators
+MEDICAL_TERMS = [
+    'blood', 'test', 'report', 'laboratory', 'lab', 'patient', 'specimen',
+    'reference range', 'analysis', 'results', 'medical', 'diagnostic',
+    'hemoglobin', 'wbc', 'rbc', 'platelet', 'glucose', 'creatinine'
+]
+MIN_MEDICAL_TERM_MATCHES = 3
+NOT_MEDICAL_REPORT_ERROR = "The uploaded file doesn't appear to be a medical report. Please upload a valid medical report."
+
 def validate_pdf_content(text):
     """Validate if the PDF content appears to be a medical report."""
-    # Common medical report indicators
-    medical_terms = [
-        'blood', 'test', 'report', 'laboratory', 'lab', 'patient', 'specimen',
-        'reference range', 'analysis', 'results', 'medical', 'diagnostic',
-        'hemoglobin', 'wbc', 'rbc', 'platelet', 'glucose', 'creatinine'
-    ]
-    
+    with span("validate_pdf_content") as timer:
+        is_valid, error = _validate_pdf_content(text)
+        if not is_valid:
+            timer.set(outcome="invalid")
+        return is_valid, error
+
+def _validate_pdf_content(text):
     # Validate minimum text length
     if len(text.strip()) < 50:
         return False, "Extracted text is too short. Please ensure the PDF contains valid text."
     
     # Check for medical terms
     text_lower = text.lower()
-    term_matches = sum(1 for term in medical_terms if term in text_lower)
-    
-    if term_matches < 3:
-        return False, "The uploaded file doesn't appear to be a medical report. Please upload a valid medical report."
+    term_matches = sum(1 for term in MEDICAL_TERMS if term in text_lower)
+
+    if term_matches < MIN_MEDICAL_TERM_MATCHES:
+        return False, NOT_MEDICAL_REPORT_ERROR
     
-    return True, None
\ No newline at end of file
+    return True, None
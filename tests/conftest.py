@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Modules import each other relative to src/, like `streamlit run src/main.py`
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
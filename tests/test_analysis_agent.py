@@ -0,0 +1,42 @@
+from agents.analysis_agent import AnalysisAgent
+from agents.knowledge_base import MemoryKnowledgeBase
+from services.rate_limiter import MemoryRateLimiter
+
+REPORT = "\n".join([
+    "Hemoglobin 10.1 g/dL 12.0-15.5 L",
+    "WBC 6.1 10^3/uL 4.0-11.0",
+    "Platelets 250 10^3/uL 150-450",
+])
+
+class RecordingModelManager:
+    def __init__(self, content):
+        self.content = content
+        self.prompts = []
+
+    def generate_analysis(self, data, system_prompt, stream=False):
+        self.prompts.append(system_prompt)
+        return {"success": True, "content": self.content, "model_used": "fake/model"}
+
+def build_agent(model_manager):
+    # Skips __init__, which reads session_state and the shared resources
+    agent = AnalysisAgent.__new__(AnalysisAgent)
+    agent.model_manager = model_manager
+    agent.async_model_manager = None
+    agent.rate_limiter = MemoryRateLimiter(10, 10 / 86400)
+    agent.knowledge_base = MemoryKnowledgeBase()
+    agent.models_used = {}
+    return agent
+
+def test_second_analysis_prompt_contains_learned_context():
+    model_manager = RecordingModelManager("Hemoglobin is low, suggesting mild anemia.")
+    agent = build_agent(model_manager)
+    data = {"patient_name": "Jane Doe", "age": 42, "gender": "Female", "report": REPORT}
+
+    for _ in range(2):
+        result = agent.analyze_report(data, "You are a medical assistant.", rate_limit_key="analysis:u1")
+        assert result["success"]
+
+    first, second = model_manager.prompts
+    assert "Relevant Learning From Previous Analyses" not in first
+    assert "Relevant Learning From Previous Analyses" in second
+    assert "Hemoglobin is low, suggesting mild anemia." in second
@@ -0,0 +1,30 @@
+import sqlite3
+from agents.knowledge_base import SQLiteKnowledgeBase
+
+REPORT = "\n".join([
+    "Hemoglobin 10.1 g/dL 12.0-15.5 L",
+    "WBC 6.1 10^3/uL 4.0-11.0",
+    "Platelets 250 10^3/uL 150-450",
+])
+ANALYSIS = "Hemoglobin is low.\nWBC is normal.\nPlatelets are normal."
+
+def test_flush_keeps_insights_while_the_database_is_locked(tmp_path):
+    path = str(tmp_path / "knowledge.sqlite3")
+    knowledge_base = SQLiteKnowledgeBase(path, flush_seconds=0)
+    knowledge_base._writer.execute("PRAGMA busy_timeout = 50")
+    data = {"age": 42, "gender": "Female", "report": REPORT}
+
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    try:
+        assert knowledge_base.learn(data, ANALYSIS) == 3
+        knowledge_base.flush()
+        assert len(knowledge_base._pending) == 3
+        assert not knowledge_base._writer.in_transaction
+    finally:
+        other.execute("ROLLBACK")
+        other.close()
+
+    knowledge_base.flush()
+    assert not knowledge_base._pending
+    assert len(knowledge_base) == 3
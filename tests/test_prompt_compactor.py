@@ -0,0 +1,25 @@
+from utils.pdf_pages import PAGE_BREAK
+from utils.prompt_compactor import compact_report_text
+
+HEADER = ["City Lab Diagnostics", "Patient: Jane Doe ID 1234"]
+
+def join_pages(*pages):
+    return PAGE_BREAK.join("\n".join(page) + "\n" for page in pages)
+
+def test_repeated_result_values_are_kept():
+    report = join_pages(
+        ["URINALYSIS", "Protein", "Negative", "Glucose", "Negative", "Ketones", "Positive"]
+    )
+    assert compact_report_text(report).splitlines() == [
+        "URINALYSIS", "Protein", "Negative", "Glucose", "Negative", "Ketones", "Positive"
+    ]
+
+def test_page_headers_and_footers_are_dropped_after_the_first_page():
+    report = join_pages(
+        HEADER + ["Protein", "Negative", "Glucose", "Negative"] + ["Page 1 of 2", "Confidential"],
+        HEADER + ["Ketones", "Negative", "Impression: Negative"] + ["Page 2 of 2", "Confidential"],
+    )
+    assert compact_report_text(report).splitlines() == HEADER + [
+        "Protein", "Negative", "Glucose", "Negative", "Confidential",
+        "Ketones", "Negative", "Impression: Negative",
+    ]